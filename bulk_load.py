@@ -0,0 +1,169 @@
+#! /usr/bin/env python3
+
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import config as cfg
+import database as db
+import schema
+
+logger = logging.getLogger(__name__)
+
+
+def load_rows(df, chunk_rows):
+    """
+    Yield the rows of a dataframe with its index first, as tuples of python values,
+    an iterator of chunk_rows rows at a time. The values are converted a column at a time.
+    NaN is left as is, SQLite stores a NaN parameter as NULL.
+    """
+
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start : start + chunk_rows]
+        columns = [chunk.index.tolist()]
+        columns += [chunk[col].tolist() for col in chunk.columns]
+
+        yield zip(*columns)
+
+
+def load_table(df, tablename=schema.ASSETS, db_name="database.db", chunk_rows=None):
+    """
+    Rebuild the assets table from a cleaned dataframe indexed by ROWID.
+    The rows are inserted into a new table in one transaction with synchronous=OFF, with
+    an executemany per chunk_rows rows (default sqlite: load_chunk_rows). A second
+    transaction drops the live table, renames the new table in its place and builds the
+    indexes. Until then readers see the previous table, and a failed load leaves it as it was.
+    Returns the number of rows loaded, or None on error.
+    """
+
+    if chunk_rows is None:
+        chunk_rows = db.get_connection_settings(cfg.get_config())["load_chunk_rows"]
+
+    load_name = f"{tablename}_load"
+    conn = None
+
+    try:
+        start = time.perf_counter()
+        df = schema.unique_guids(df)
+        cols = ", ".join(f'"{col}"' for col in ["ROWID"] + list(df.columns))
+        sql = f"""INSERT INTO "{load_name}" ({cols}) VALUES ({", ".join("?" * (len(df.columns) + 1))})"""
+
+        conn = db.connect(db_name)
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("BEGIN")
+        conn.execute(f"""DROP TABLE IF EXISTS "{load_name}\"""")
+        conn.execute(schema.assets_ddl(load_name))
+        for rows in load_rows(df, chunk_rows):
+            conn.executemany(sql, rows)
+        conn.commit()
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"""DROP TABLE IF EXISTS "{tablename}\"""")
+        conn.execute(f"""ALTER TABLE "{load_name}" RENAME TO "{tablename}\"""")
+        schema.create_indexes(conn, tablename)
+        conn.commit()
+
+        elapsed = time.perf_counter() - start
+        rate = int(len(df) / elapsed) if elapsed > 0 else len(df)
+        load_msg = f"{tablename} rebuilt with the bulk loader, rows: {len(df)}, elapsed: {elapsed:.1f}s, {rate} rows/sec"
+        logger.info(load_msg)
+        return len(df)
+
+    except Exception as e:
+        load_err_msg = f"Error on the bulk load of the db table: {tablename}, the table is unchanged."
+        logger.exception(load_err_msg)
+
+    finally:
+        if conn is not None:
+            reset_connection(conn, db_name)
+
+
+def reset_connection(conn, db_name):
+    """
+    Roll back what is left of a load and put the shared connection of the thread back
+    to synchronous=NORMAL. A connection that cannot be reset is closed, the next
+    connect() opens a new one.
+    """
+
+    try:
+        conn.close()
+        conn.execute("PRAGMA synchronous=NORMAL")
+    except Exception as e:
+        reset_err_msg = f"Error on resetting the connection to {db_name} after the bulk load, the connection is closed."
+        logger.exception(reset_err_msg)
+        db.disconnect(db_name)
+
+
+def benchmark_frame(rows):
+    """
+    A synthetic cleaned dataframe of the assets table, with a distinct value in each cell.
+    """
+
+    data = {}
+
+    for col, col_type in schema.ASSETS_COLUMNS[1:]:
+        if col_type.startswith("REAL"):
+            data[col] = np.arange(rows) * 1.5
+        elif col_type.startswith("INTEGER"):
+            data[col] = np.arange(rows) % 2
+        else:
+            data[col] = [f"{col}_{i}" for i in range(rows)]
+
+    return pd.DataFrame(data, index=pd.RangeIndex(rows, name="ROWID"))
+
+
+def benchmark(df):
+    """
+    Replace the table of a scratch DB, opened the same as database.db, with the rows of a
+    cleaned dataframe: with df.to_sql(if_exists="replace"), the load used before, and with
+    load_table(). Reports the rows/sec of each, the table is loaded once before it is timed.
+    """
+
+    results = []
+
+    for label in ["to_sql", "bulk_load"]:
+        db_name = f"bench_{label}.db"
+        path = os.path.join(db.db_path, db_name)
+
+        for run in range(2):
+            start = time.perf_counter()
+            if label == "to_sql":
+                df.to_sql(schema.ASSETS, db.connect(db_name), if_exists="replace")
+            else:
+                load_table(df, db_name=db_name)
+            elapsed = time.perf_counter() - start
+
+        db.disconnect(db_name)
+
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+        rate = int(len(df) / elapsed) if elapsed > 0 else len(df)
+        bench_msg = (
+            f"Load benchmark - {label}: {len(df)} rows, {elapsed:.1f}s, {rate} rows/sec"
+        )
+        logger.info(bench_msg)
+        print(bench_msg)
+        results.append((label, rate))
+
+    return results
+
+
+if __name__ == "__main__":
+    # python bulk_load.py [<cleaned pipeline file>]
+    # Compare the rows/sec of the to_sql load and the bulk loader, on the rows of a cleaned
+    # pipeline file or on 200000 generated rows.
+    if len(sys.argv) > 1:
+        import intermediate as im
+
+        df = im.read_frame(sys.argv[1]).set_index("ROWID")
+    else:
+        df = benchmark_frame(200000)
+
+    benchmark(df)
@@ -0,0 +1,312 @@
+#! /usr/bin/env python3
+
+import logging
+import random
+import re
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# Name tokens that classify an asset, in the alternation order of the regexes they replace.
+# A name is split once on its separators, and each token is resolved through lookup tables
+# keyed by its first two characters. Names with non-ASCII characters use the regexes,
+# which case-fold some of them differently from str.upper().
+VIDEO_CHECKS = [
+    (["VM", "EM", "UHD"], True),
+    (["SMLS", "TXTLS", "TXTD", "CTC"], True),
+    (["PATCH", "MXF", "MOV"], True),
+    (["XDCAM", "DNXHD", "DNX"], False),
+    (
+        [
+            "DV100",
+            "IMX50",
+            "CEM",
+            "CVM",
+            "SVM",
+            "PGS",
+            "DOLBY",
+            "PROMOSELECTS",
+            "CLEANCOVERS",
+            "CREDITPATCH",
+            "DELETEDSCENES",
+        ],
+        False,
+    ),
+]
+ARCHIVE_TOKENS = {
+    "AVP",
+    "PPRO",
+    "FCP",
+    "PTS",
+    "GRFX",
+    "GFX",
+    "WAV",
+    "WAVS",
+    "SPLITS",
+    "GFXPACKAGE",
+    "GRAPHICS",
+}
+CODEC_TOKENS = ["UHD", "XAVC", "PRORES", "XDCAM", "DNX", "IMX50", "DV100"]
+
+VIDEO_PATTERNS = [
+    r"(?<![0-9]|[A-Z])(?<=[-_])(VM|EM|UHD)(?=(-|_|[1-5])?)(?![A-Z])",
+    r"(?<![0-9]|[A-Z])(?<=[-_])(SMLS|TXTLS|TXTD|CTC)(?=(-|_|[1-5])?)(?![A-Z])",
+    r"(?<=[_-])(PATCH|MXF|MOV)(?=(-|_|[1-5])?)(?![A-Z])",
+    r"(?<![0-9A-Z])(?<=(-|_))(XDCAM|DNX(HD)?)(?=(-|_|[1-5]|HD)?)",
+    # these video files will be filtered out, not used in the migration
+    r"(?<![0-9A-Z])(?<=(-|_))(DV100|IMX50|CEM|CVM|SVM|PGS|DOLBY|PROMOSELECTS|CLEANCOVERS|CREDITPATCH|DELETEDSCENES)(?=(-|_|[1-5])?)",
+]
+ARCHIVE_PATTERN = r"((?<![0-9A-Z])|(?<=(-|_)))(AVP|PPRO|FCP|PTS|AVP|GRFX|GFX|WAV|WAVS|SPLITS|GFXPACKAGE|GRAPHICS)(?=(-|_)?)(?![0-9A-Z])"
+DOCUMENT_PATTERN = r"((?<![0-9]|[A-Za-z])|(?<=(-|_)))(Outgoing[-_]?QC)(?=(-|_)?)"
+CODEC_PATTERN = r"(((?<![A-Z])|(?<=(-|_)))(UHD|XAVC|UHD|PRORES|XDCAM|DNX|IMX50|DV100)(?=(-|_|HQ|HD)?))"
+FRAMERATE_PATTERN = re.compile(
+    r"(?<![0-9]|[A-Z])(23|25|29|59)\.?((98|976|97|94)(?=[IP]?))?|(?<=(-|_))(NTSC|PAL)(?=(-|_)?)|(?<=(-|_))(24P|720P)(?=(-|_)?)"
+)
+
+LETTERS = re.compile(r"[A-Z]+")
+NON_ALNUM = str.maketrans({chr(i): " " for i in range(128) if not chr(i).isalnum()})
+
+
+def prefix_table(checks):
+    """
+    Map the first two characters of each check token to its (check, token, whole) entries,
+    in the order of the checks and of their tokens.
+    """
+
+    table = {}
+
+    for i, (tokens, whole) in enumerate(checks):
+        for token in tokens:
+            table.setdefault(token[:2], []).append((i, token, whole))
+
+    return table
+
+
+VIDEO_TABLE = prefix_table(VIDEO_CHECKS)
+CODEC_TABLE = prefix_table([(CODEC_TOKENS, False)])
+
+
+def video_checks(cleaned_name):
+    """
+    Return the match of each of the 5 video checks in a cleaned name (or None).
+    A check matches the start of a token that follows a "-" or "_" separator, and the
+    first 3 checks only a token start that is not followed by a letter.
+    """
+
+    if not cleaned_name.isascii():
+        return tuple(
+            match.group(0) if match is not None else None
+            for match in regex_video_checks(cleaned_name)
+        )
+
+    checks = [None] * len(VIDEO_CHECKS)
+
+    for token in cleaned_name.replace("-", "_").split("_")[1:]:
+        upper = token.upper()
+
+        for i, entry, whole in VIDEO_TABLE.get(upper[:2], ()):
+            if (
+                checks[i] is None
+                and upper.startswith(entry)
+                and (
+                    whole is not True
+                    or len(token) == len(entry)
+                    or not token[len(entry)].isalpha()
+                )
+            ):
+                checks[i] = token[: len(entry)]
+
+    return tuple(checks)
+
+
+def archive_check(cleaned_name):
+    """
+    Return the first alphanumeric run of a cleaned name that is an archive token, or None.
+    """
+
+    if not cleaned_name.isascii():
+        match = re.search(ARCHIVE_PATTERN, cleaned_name, re.IGNORECASE)
+        return match.group(0) if match is not None else None
+
+    runs = cleaned_name.upper().translate(NON_ALNUM).split()
+
+    if ARCHIVE_TOKENS.isdisjoint(runs):
+        return None
+
+    for i, run in enumerate(runs):
+        if run in ARCHIVE_TOKENS:
+            return cleaned_name.translate(NON_ALNUM).split()[i]
+
+
+def document_check(cleaned_name):
+    """
+    Return True if a cleaned name matches the Outgoing QC document pattern.
+    """
+
+    if cleaned_name.isascii() and "OUTGOING" not in cleaned_name.upper():
+        return False
+
+    return re.search(DOCUMENT_PATTERN, cleaned_name, re.IGNORECASE) is not None
+
+
+def codec_check(name):
+    """
+    Return the first codec token that starts a run of letters in a name, or None.
+    """
+
+    if not name.isascii():
+        match = re.search(CODEC_PATTERN, name, re.IGNORECASE)
+        return match.group(0) if match is not None else None
+
+    upper = name.upper()
+
+    for run in LETTERS.finditer(upper):
+        start = run.start()
+        for i, entry, whole in CODEC_TABLE.get(upper[start : start + 2], ()):
+            if upper.startswith(entry, start):
+                return name[start : start + len(entry)]
+
+    return None
+
+
+def framerate_check(name):
+    """
+    Return the framerate token of a name after its 6 character traffic code, or None.
+    """
+
+    match = FRAMERATE_PATTERN.search(name[6:])
+
+    return match.group(0) if match is not None else None
+
+
+def regex_video_checks(cleaned_name):
+    """
+    The regex video checks replaced by video_checks(), returns the 5 matches (or None).
+    """
+
+    return tuple(
+        re.search(pattern, cleaned_name, re.IGNORECASE) for pattern in VIDEO_PATTERNS
+    )
+
+
+def regex_classify(name):
+    """
+    Classify a name with the regexes, the reference for compare().
+    """
+
+    video = tuple(
+        match.group(0) if match is not None else None
+        for match in regex_video_checks(name)
+    )
+    archive = re.search(ARCHIVE_PATTERN, name, re.IGNORECASE)
+    document = re.search(DOCUMENT_PATTERN, name, re.IGNORECASE)
+    codec = re.search(CODEC_PATTERN, name, re.IGNORECASE)
+
+    return (
+        video,
+        archive.group(0) if archive is not None else None,
+        document is not None,
+        codec.group(0) if codec is not None else None,
+    )
+
+
+def token_classify(name):
+    return (
+        video_checks(name),
+        archive_check(name),
+        document_check(name),
+        codec_check(name),
+    )
+
+
+def corpus(count, seed=1):
+    """
+    Generate asset names from the classifier tokens, other tokens and separators,
+    including lowercase, digit suffixes, "&" replaced by "and" and non-ASCII characters.
+    """
+
+    rand = random.Random(seed)
+    tokens = (
+        [token for tokens, whole in VIDEO_CHECKS for token in tokens]
+        + sorted(ARCHIVE_TOKENS)
+        + CODEC_TOKENS
+        + ["OUTGOING", "QC", "OUTGOINGQC", "HD", "HQ", "TITLE", "X", "and", "É", "ı"]
+        + [f"{rand.randint(0, 999999):06d}" for i in range(5)]
+    )
+    suffixes = ["", "", "", "1", "5", "9", "X", "x", "HD", "P", ".MOV"]
+    separators = ["_", "_", "-", "", " ", ".", "__", "&"]
+    names = []
+
+    for i in range(count):
+        parts = []
+        for j in range(rand.randint(1, 6)):
+            parts.append(rand.choice(separators))
+            parts.append(rand.choice(tokens) + rand.choice(suffixes))
+        name = "".join(parts)
+        if rand.random() < 0.5:
+            name = name.upper()
+        names.append(name.replace("&", "and"))
+
+    return names
+
+
+def compare(names):
+    """
+    Classify each name with the token lookups and with the regexes.
+    Returns the names where the results differ.
+    """
+
+    mismatches = [
+        name for name in names if token_classify(name) != regex_classify(name)
+    ]
+
+    compare_msg = f"Classifier - names: {len(names)}, mismatches: {len(mismatches)}"
+    logger.info(compare_msg)
+    print(compare_msg)
+
+    return mismatches
+
+
+def benchmark(names):
+    """
+    Report the names per second classified with the regexes and with the token lookups.
+    """
+
+    results = []
+
+    for label, classify in [("regex", regex_classify), ("token", token_classify)]:
+        start = time.perf_counter()
+        for name in names:
+            classify(name)
+        elapsed = time.perf_counter() - start
+
+        rate = int(len(names) / elapsed) if elapsed > 0 else len(names)
+        bench_msg = f"Classifier benchmark - {label}: {rate} names/sec"
+        logger.info(bench_msg)
+        print(bench_msg)
+        results.append((label, rate))
+
+    return results
+
+
+if __name__ == "__main__":
+    # python classify.py [<pipeline file>]
+    # Check the token classifier against the regexes on a generated corpus, or on the
+    # NAME column of a pipeline file, then report the names/sec of each.
+    if len(sys.argv) > 1:
+        import intermediate as im
+
+        names = [
+            str(name).upper()
+            for name in im.read_frame(sys.argv[1], columns=["NAME"])["NAME"]
+        ]
+    else:
+        names = corpus(200000)
+
+    mismatches = compare(names)
+
+    for name in mismatches[:20]:
+        print(f"  {name}: {token_classify(name)} != {regex_classify(name)}")
+
+    benchmark(names)
@@ -5,14 +5,16 @@ from turtle import clear
 
 import yaml
 
+# config.yaml is read from the directory the program is started in, the other
+# modules change the working directory.
+CONFIG_PATH = os.path.abspath("./config.yaml")
+
 
 def get_config():
     """
     Setup configuration and credentials
     """
-    path = "./config.yaml"
-
-    with open(path, "rt") as f:
+    with open(CONFIG_PATH, "rt") as f:
         config = yaml.safe_load(f.read())
 
     return config
@@ -27,3 +29,12 @@ def ensure_dirs():
             os.makedirs(dir)
 
     return
+
+
+def get_setting(config, section, key, default=None):
+    """
+    Return an optional setting from config.yaml, or the default when the
+    section or key is not defined.
+    """
+    section_cfg = config.get(section) or {}
+    return section_cfg.get(key, default)
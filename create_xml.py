@@ -6,6 +6,7 @@ from xml.dom import minidom
 
 import config as cfg
 import database as db
+import schema
 
 logger = logging.getLogger(__name__)
 
@@ -24,124 +25,133 @@ def create_xml(xml_total):
     logger.info(xml_1_msg)
 
     try:
-        conn = db.connect()
-        cur = conn.cursor()
-        sql = """SELECT * FROM assets WHERE xml_created = 0"""
+        rows = db.iter_rows(
+            "assets",
+            [
+                "ROWID",
+                "GUID",
+                "NAME",
+                "DATATAPEID",
+                "TIMECODEIN",
+                "TITLETYPE",
+                "FRAMERATE",
+                "CODEC",
+                "V_WIDTH",
+                "V_HEIGHT",
+                "TRAFFIC_CODE",
+                "DURATION_MS",
+                "CONTENT_TYPE",
+                "FILENAME",
+                "OC_COMPONENT_NAME",
+            ],
+            where=schema.PENDING_XML,
+        )
 
         xml_count = 0
 
-        for row in cur.execute(sql).fetchall():
-
-            if xml_count >= int(xml_total):
-                break
-
-            else:
-                ROWID = row[0]
-                GUID = row[1]
-                NAME = row[2]
-                FILESIZE = row[3]
-                DATATAPEID = row[4]
-                OBJECTNM = row[5]
-                CONTENTLENGTH = row[6]
-                SOURCECREATEDT = row[7]
-                CREATEDT = row[8]
-                LASTMDYDT = row[9]
-                TIMECODEIN = row[10]
-                TIMECODEOUT = row[11]
-                ONAIRID = row[12]
-                RURI = row[13]
-                TITLETYPE = row[14]
-                FRAMERATE = row[15]
-                CODEC = row[16]
-                V_WIDTH = row[17]
-                V_HEIGHT = row[18]
-                TRAFFIC_CODE = row[19]
-                DURATION_MS = row[20]
-                XML_CREATED = row[21]
-                PROXY_COPIED = row[22]
-                CONTENT_TYPE = row[23]
-                FILENAME = row[24]
-                OC_COMPONENT_NAME = row[32]
-
-                if (
-                    DATATAPEID != "unallocated"
-                    and DATATAPEID != "NULL"
-                    and OC_COMPONENT_NAME != "NULL"
-                ):
-
-                    filename = FILENAME.replace(".hr.", ".")
-                    gorilla_path = OC_COMPONENT_NAME.replace("\\", r"/")
-                    traffic_code = str(TRAFFIC_CODE).strip('="')
-
-                    guid = GUID
-                    name = NAME
-                    datatapeid = DATATAPEID
-                    timecodein = TIMECODEIN
-                    folderpath = gorilla_path
-                    title_type = TITLETYPE
-                    framerate = FRAMERATE
-                    codec = CODEC
-                    v_width = V_WIDTH
-                    v_height = V_HEIGHT
-                    duration = DURATION_MS
-                    content_type = CONTENT_TYPE
-
-                    conn.close()
-                    os.chdir(xml_checkin)
-                    xml_doc = str(guid) + ".xml"
-
-                    with open(xml_doc, mode="w", encoding="utf-8-sig") as xdoc:
-
-                        xml_body = f"\
-                        <Titles>\
-                        <Title><!-- title type video -->\
-                        <key1>{guid}</key1>\
-                        <itemcode>{guid}</itemcode>\
-                        <title>{name}</title>\
-                        <NGC_NGCITitle>{name}</NGC_NGCITitle>\
-                        <NGC_NGCIFilename>{filename}</NGC_NGCIFilename>\
-                        <NGC_DivaTapeID>{datatapeid}</NGC_DivaTapeID>\
-                        <NGC_FolderPath>{folderpath}</NGC_FolderPath>\
-                        <StartOfMaterial>{timecodein}</StartOfMaterial>\
-                        <NGC_NGCITrafficCode>{traffic_code}</NGC_NGCITrafficCode>\
-                        <titletype>{title_type}</titletype>\
-                        <NGC_ContentType>{content_type}</NGC_ContentType>\
-                        <AMFieldFromParsing_FrameRate>{framerate}</AMFieldFromParsing_FrameRate>\
-                        <AMFieldFromParsing_Codec>{codec}</AMFieldFromParsing_Codec>\
-                        <AMFieldFromParsing_Width>{v_width}</AMFieldFromParsing_Width>\
-                        <AMFieldFromParsing_Hight>{v_height}</AMFieldFromParsing_Hight>\
-                        <duration>{duration}</duration>\
-                        \
-                        <MediaInfos>\
-                        <MediaInfo>\
-                        <mediaFormatId>100002</mediaFormatId>\
-                        <mediaStorageName>G_DIVA</mediaStorageName>\
-                        <mediaStorageId>161</mediaStorageId>\
-                        <mediaFileName>{guid}</mediaFileName>\
-                        <mediaProcessStatus>Online</mediaProcessStatus>\
-                        </MediaInfo>\
-                        </MediaInfos>\
-                        </Title>\
-                        </Titles>"
-
-                        xmlstr = minidom.parseString(xml_body).toprettyxml(indent="   ")
-
-                        xdoc.write(xmlstr)
-                        xdoc.close()
-
-                    os.chdir(root_path)
-                    update = db.update_column("assets", "xml_created", 1, ROWID)
-                    xmlcreate_msg = f"\n\
-                                    RowID: {str(ROWID)}\n\
-                                    xml_count: {xml_count}\n\
-                                    xml_doc:  {str(xml_doc)}\n"
-                    logger.info(xmlcreate_msg)
-                    xml_count += 1
+        with db.BulkUpdate("assets") as updates:
+            for row in rows:
+
+                if xml_count >= int(xml_total):
+                    break
 
                 else:
-                    xml_pass_msg = f"XML Creation skipped on {ROWID} for asset {GUID}. DATETAPEID = {DATATAPEID}"
-                    logger.debug(xml_pass_msg)
-                    pass
+                    ROWID = row.ROWID
+                    GUID = row.GUID
+                    NAME = row.NAME
+                    DATATAPEID = row.DATATAPEID
+                    TIMECODEIN = row.TIMECODEIN
+                    TITLETYPE = row.TITLETYPE
+                    FRAMERATE = row.FRAMERATE
+                    CODEC = row.CODEC
+                    V_WIDTH = row.V_WIDTH
+                    V_HEIGHT = row.V_HEIGHT
+                    TRAFFIC_CODE = row.TRAFFIC_CODE
+                    DURATION_MS = row.DURATION_MS
+                    CONTENT_TYPE = row.CONTENT_TYPE
+                    FILENAME = row.FILENAME
+                    OC_COMPONENT_NAME = row.OC_COMPONENT_NAME
+
+                    if (
+                        DATATAPEID != "unallocated"
+                        and DATATAPEID != "NULL"
+                        and OC_COMPONENT_NAME != "NULL"
+                    ):
+
+                        filename = FILENAME.replace(".hr.", ".")
+                        gorilla_path = OC_COMPONENT_NAME.replace("\\", r"/")
+                        traffic_code = str(TRAFFIC_CODE).strip('="')
+
+                        guid = GUID
+                        name = NAME
+                        datatapeid = DATATAPEID
+                        timecodein = TIMECODEIN
+                        folderpath = gorilla_path
+                        title_type = TITLETYPE
+                        framerate = FRAMERATE
+                        codec = CODEC
+                        v_width = V_WIDTH
+                        v_height = V_HEIGHT
+                        duration = DURATION_MS
+                        content_type = CONTENT_TYPE
+
+                        os.chdir(xml_checkin)
+                        xml_doc = str(guid) + ".xml"
+
+                        with open(xml_doc, mode="w", encoding="utf-8-sig") as xdoc:
+
+                            xml_body = f"\
+                            <Titles>\
+                            <Title><!-- title type video -->\
+                            <key1>{guid}</key1>\
+                            <itemcode>{guid}</itemcode>\
+                            <title>{name}</title>\
+                            <NGC_NGCITitle>{name}</NGC_NGCITitle>\
+                            <NGC_NGCIFilename>{filename}</NGC_NGCIFilename>\
+                            <NGC_DivaTapeID>{datatapeid}</NGC_DivaTapeID>\
+                            <NGC_FolderPath>{folderpath}</NGC_FolderPath>\
+                            <StartOfMaterial>{timecodein}</StartOfMaterial>\
+                            <NGC_NGCITrafficCode>{traffic_code}</NGC_NGCITrafficCode>\
+                            <titletype>{title_type}</titletype>\
+                            <NGC_ContentType>{content_type}</NGC_ContentType>\
+                            <AMFieldFromParsing_FrameRate>{framerate}</AMFieldFromParsing_FrameRate>\
+                            <AMFieldFromParsing_Codec>{codec}</AMFieldFromParsing_Codec>\
+                            <AMFieldFromParsing_Width>{v_width}</AMFieldFromParsing_Width>\
+                            <AMFieldFromParsing_Hight>{v_height}</AMFieldFromParsing_Hight>\
+                            <duration>{duration}</duration>\
+                            \
+                            <MediaInfos>\
+                            <MediaInfo>\
+                            <mediaFormatId>100002</mediaFormatId>\
+                            <mediaStorageName>G_DIVA</mediaStorageName>\
+                            <mediaStorageId>161</mediaStorageId>\
+                            <mediaFileName>{guid}</mediaFileName>\
+                            <mediaProcessStatus>Online</mediaProcessStatus>\
+                            </MediaInfo>\
+                            </MediaInfos>\
+                            </Title>\
+                            </Titles>"
+
+                            xmlstr = minidom.parseString(xml_body).toprettyxml(
+                                indent="   "
+                            )
+
+                            xdoc.write(xmlstr)
+                            xdoc.close()
+
+                        os.chdir(root_path)
+                        updates.add(ROWID, "xml_created", 1)
+                        xmlcreate_msg = f"\n\
+                                        RowID: {str(ROWID)}\n\
+                                        xml_count: {xml_count}\n\
+                                        xml_doc:  {str(xml_doc)}\n"
+                        logger.info(xmlcreate_msg)
+                        xml_count += 1
+
+                    else:
+                        xml_pass_msg = f"XML Creation skipped on {ROWID} for asset {GUID}. DATETAPEID = {DATATAPEID}"
+                        logger.debug(xml_pass_msg)
+                        pass
 
         os.chdir(root_path)
         xml_2_msg = f"GORILLA-DIVA XML CREATION COMPLETED"
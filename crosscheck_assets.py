@@ -100,42 +100,50 @@ def crosscheck_db(tablename):
 
     try:
         xml_list, proxy_list = get_checkedin_assets()
-        rows = db.fetchall(tablename)
-        for row in rows:
-            xmlname = row[1] + ".xml_DONE"
-            if row[4] == "NULL":
-                pass
-            elif xmlname in xml_list and row[21] == 0:
-                db.update_column(tablename, "XML_CREATED", 1, row[0])
-                xml_update_msg = (
-                    row[1] + "  xml status updated in the db. XML_CREATED = 1"
-                )
-                logger.info(xml_update_msg)
-            else:
-                pass
-                # db.update_column(tablename, 'XML_CREATED', 0, row[0])
-                # xml_update_msg = row[1] + "  xml status updated in the db. XML_CREATED = 0"
-                # logger.debug(xml_update_msg)
-
-            proxyname = row[1] + ".mov"
-
-            if proxyname in proxy_list and row[22] == 0:
-                db.update_column(tablename, "PROXY_COPIED", 1, row[0])
-                proxy_update_msg = row[1] + "  proxy status updated. PROXY_COPIED = 1"
-                logger.info(proxy_update_msg)
-            elif row[14] == "archive" and row[22] == 0:
-                db.update_column(tablename, "PROXY_COPIED", 3, row[0])
-                proxy_update_msg = (
-                    row[1] + "  title type is "
-                    "archive"
-                    ", proxy status updated. PROXY_COPIED = 3"
-                )
-                logger.info(proxy_update_msg)
-            else:
-                pass
-                # db.update_column(tablename, 'PROXY_COPIED', 0, row[0])
-                # proxy_update_msg = row[1] + "  proxy status updated in the db. PROXY_COPIED = 0"
-                # logger.debug(proxy_update_msg)
+        xml_names = set(xml_list)
+        proxy_names = set(proxy_list)
+        rows = db.iter_rows(
+            tablename,
+            ["ROWID", "GUID", "DATATAPEID", "TITLETYPE", "XML_CREATED", "PROXY_COPIED"],
+        )
+        with db.BulkUpdate(tablename) as updates:
+            for row in rows:
+                xmlname = row.GUID + ".xml_DONE"
+                if row.DATATAPEID == "NULL":
+                    pass
+                elif xmlname in xml_names and row.XML_CREATED == 0:
+                    updates.add(row.ROWID, "XML_CREATED", 1)
+                    xml_update_msg = (
+                        row.GUID + "  xml status updated in the db. XML_CREATED = 1"
+                    )
+                    logger.info(xml_update_msg)
+                else:
+                    pass
+                    # db.update_column(tablename, 'XML_CREATED', 0, row.ROWID)
+                    # xml_update_msg = row.GUID + "  xml status updated in the db. XML_CREATED = 0"
+                    # logger.debug(xml_update_msg)
+
+                proxyname = row.GUID + ".mov"
+
+                if proxyname in proxy_names and row.PROXY_COPIED == 0:
+                    updates.add(row.ROWID, "PROXY_COPIED", 1)
+                    proxy_update_msg = (
+                        row.GUID + "  proxy status updated. PROXY_COPIED = 1"
+                    )
+                    logger.info(proxy_update_msg)
+                elif row.TITLETYPE == "archive" and row.PROXY_COPIED == 0:
+                    updates.add(row.ROWID, "PROXY_COPIED", 3)
+                    proxy_update_msg = (
+                        row.GUID + "  title type is "
+                        "archive"
+                        ", proxy status updated. PROXY_COPIED = 3"
+                    )
+                    logger.info(proxy_update_msg)
+                else:
+                    pass
+                    # db.update_column(tablename, 'PROXY_COPIED', 0, row.ROWID)
+                    # proxy_update_msg = row.GUID + "  proxy status updated in the db. PROXY_COPIED = 0"
+                    # logger.debug(proxy_update_msg)
 
         crosscheck_db_end_msg = f"DB-CROSSCHECK COMPLETE"
         logger.info(crosscheck_db_end_msg)
@@ -143,7 +151,7 @@ def crosscheck_db(tablename):
     except Exception as e:
         cc_excp_msg = f"\n\
         Exception raised on the asset db-crosscheck.\n\
-        Index:  {row['ROWID']}\n\
+        Index:  {row.ROWID}\n\
         Error Message:  {str(e)} \n"
         logger.exception(cc_excp_msg)
 
@@ -159,102 +167,111 @@ def crosscheck_assets(tablename):
 
     try:
         xml_list, proxy_list = get_checkedin_assets()
+        statuses = db.fetchall_status(tablename)
+        with db.BulkUpdate(tablename) as updates:
+            xmltocheck = len(xml_list)
+
+            xml_check_msg = (
+                f"Total number of XML files to crosscheck against DB:  {xmltocheck}"
+            )
+            logger.info(xml_check_msg)
+
+            xml_update_count = 0
+            xml_not_found_count = 0
+
+            for xml in xml_list:
+                xml_name_msg = f"Checking XML: {xml}"
+                logger.info(xml_name_msg)
+                guid = xml[:-9]
+                status = statuses.get(guid)
+                xml_status = status[:2] if status is not None else None
+                print(f"XML Status: {str(xml_status)}")
+                xml_status_msg = f"XML Status: {str(xml_status)}"
+                logger.info(xml_status_msg)
 
-        xmltocheck = len(xml_list)
-
-        xml_check_msg = (
-            f"Total number of XML files to crosscheck against DB:  {xmltocheck}"
-        )
-        logger.info(xml_check_msg)
-
-        xml_update_count = 0
-        xml_not_found_count = 0
-
-        for xml in xml_list:
-            xml_name_msg = f"Checking XML: {xml}"
-            logger.info(xml_name_msg)
-            guid = xml[:-9]
-            xml_status = db.fetchone_xml(guid)
-            print(f"XML Status: {str(xml_status)}")
-            xml_status_msg = f"XML Status: {str(xml_status)}"
-            logger.info(xml_status_msg)
-
-            if xml_status is None:
-                none_msg = f"{guid} was not found in the DB.\n\
-                xml_list filename: {xml}"
-                xml_not_found_count += 1
-                logger.info(none_msg)
-                continue
-
-            elif xml_status is not None and xml_status[1] == 1:
-                xml_pass_msg = f"{guid} xml_status already = 1 "
-                logger.debug(xml_pass_msg)
-
-            elif xml_status is not None and xml_status[1] == 0:
-                index = xml_status[0]
-                db.update_column(tablename, "XML_CREATED", 1, index)
-                xml_status_msg = f" \n\
+                if xml_status is None:
+                    none_msg = f"{guid} was not found in the DB.\n\
+                    xml_list filename: {xml}"
+                    xml_not_found_count += 1
+                    logger.info(none_msg)
+                    continue
+
+                elif xml_status is not None and xml_status[1] == 1:
+                    xml_pass_msg = f"{guid} xml_status already = 1 "
+                    logger.debug(xml_pass_msg)
+
+                elif xml_status is not None and xml_status[1] == 0:
+                    index = xml_status[0]
+                    updates.add(index, "XML_CREATED", 1)
+                    statuses[guid] = (index, 1, status[2])
+                    xml_status_msg = f" \n\
+                                                DB updated on crosscheck - \n\
+                                                rowid: {index}, \n\
+                                                guid: {guid} \n\
+                                                xml_created: 1 \n"
+                    logger.info(xml_status_msg)
+                    xml_update_count += 1
+
+                else:
+                    pass_msg = f"No conditions satisfied for: {xml}"
+                    logger.info(pass_msg)
+                    xml_update_count += 1
+                    continue
+
+            updates.flush()
+
+            xml_count_msg = (
+                f"Total Count for the xml status update = {xml_update_count}"
+            )
+            xml_not_found_count = (
+                f"Total Count for the xml not found in db = {xml_not_found_count}"
+            )
+            logger.info(xml_count_msg)
+            logger.info(xml_not_found_count)
+
+            proxytocheck = len(proxy_list)
+
+            proxy_check_msg = (
+                f"Total number of proxy files to crosscheck against DB:  {proxytocheck}"
+            )
+            logger.info(proxy_check_msg)
+
+            proxy_update_count = 0
+            proxy_not_found_count = 0
+
+            for proxy in proxy_list:
+                guid = proxy[:-4]
+                status = statuses.get(guid)
+                proxy_status = (status[0], status[2]) if status is not None else None
+
+                if proxy_status is None:
+                    none_msg = f"{guid} was not found in the DB.\n\
+                                proxy_list filename: {proxy}"
+                    proxy_not_found_count += 1
+                    logger.info(none_msg)
+                    continue
+
+                elif proxy_status is not None and proxy_status[1] == 1:
+                    proxy_pass_msg = f"{guid} proxy_status already = 1"
+                    logger.debug(proxy_pass_msg)
+
+                elif proxy_status is not None and proxy_status[1] == 0:
+                    index = proxy_status[0]
+                    updates.add(index, "PROXY_COPIED", 1)
+                    statuses[guid] = (index, status[1], 1)
+                    proxy_status_msg = f" \n\
                                             DB updated on crosscheck - \n\
                                             rowid: {index}, \n\
                                             guid: {guid} \n\
-                                            xml_created: 1 \n"
-                logger.info(xml_status_msg)
-                xml_update_count += 1
-
-            else:
-                pass_msg = f"No conditions satisfied for: {xml}"
-                logger.info(pass_msg)
-                xml_update_count += 1
-                continue
-
-        xml_count_msg = f"Total Count for the xml status update = {xml_update_count}"
-        xml_not_found_count = (
-            f"Total Count for the xml not found in db = {xml_not_found_count}"
-        )
-        logger.info(xml_count_msg)
-        logger.info(xml_not_found_count)
-
-        proxytocheck = len(proxy_list)
-
-        proxy_check_msg = (
-            f"Total number of proxy files to crosscheck against DB:  {proxytocheck}"
-        )
-        logger.info(proxy_check_msg)
-
-        proxy_update_count = 0
-        proxy_not_found_count = 0
-
-        for proxy in proxy_list:
-            guid = proxy[:-4]
-            proxy_status = db.fetchone_proxy(guid)
-
-            if proxy_status is None:
-                none_msg = f"{guid} was not found in the DB.\n\
-                            proxy_list filename: {proxy}"
-                proxy_not_found_count += 1
-                logger.info(none_msg)
-                continue
-
-            elif proxy_status is not None and proxy_status[1] == 1:
-                proxy_pass_msg = f"{guid} proxy_status already = 1"
-                logger.debug(proxy_pass_msg)
-
-            elif proxy_status is not None and proxy_status[1] == 0:
-                index = proxy_status[0]
-                db.update_column(tablename, "PROXY_COPIED", 1, index)
-                proxy_status_msg = f" \n\
-                                        DB updated on crosscheck - \n\
-                                        rowid: {index}, \n\
-                                        guid: {guid} \n\
-                                        proxy_copied: 1 \n"
-                logger.info(proxy_status_msg)
-                proxy_update_count += 1
-
-            else:
-                pass_msg = f"No conditions satisfied for: {xml}"
-                logger.info(pass_msg)
-                xml_update_count += 1
-                continue
+                                            proxy_copied: 1 \n"
+                    logger.info(proxy_status_msg)
+                    proxy_update_count += 1
+
+                else:
+                    pass_msg = f"No conditions satisfied for: {xml}"
+                    logger.info(pass_msg)
+                    xml_update_count += 1
+                    continue
 
         proxy_update_msg = (
             f"Total number of files with proxy status updated:  {proxy_update_count}"
@@ -3,22 +3,62 @@
 import logging
 import os
 import re
+import zlib
 
+import numpy as np
 import pandas as pd
 
+import bulk_load as bl
+import classify as cl
 import config as cfg
 import database as db
+import intermediate as im
 import get_mediainfo as gmi
+import name_cache as nc
+import parallel
 
 logger = logging.getLogger(__name__)
 
-
-def csv_clean(date, parsed_csv=None):
+# CONTENT_TYPE of the archive tokens that are not used as is.
+ARCHIVE_TYPES = {
+    "SPLITS": "WAV",
+    "WAVS": "WAV",
+    "GFX": "GRFX",
+    "GFXPACKAGE": "GRFX",
+    "GRAPHICS": "GRFX",
+}
+CREATION_DATE_TABLE = {ord(i): None for i in "- :"}
+# The fields of a video row set from its mediainfo, in the order of get_mediainfo.
+MEDIAINFO_COLUMNS = [
+    "FRAMERATE",
+    "CODEC",
+    "V_WIDTH",
+    "V_HEIGHT",
+    "DURATION_MS",
+    "FILENAME",
+]
+# The fields set by the clean, carried over from the assets table for an unchanged row.
+CLEANED_COLUMNS = [
+    "NAME",
+    "TITLETYPE",
+    "FRAMERATE",
+    "CODEC",
+    "V_WIDTH",
+    "V_HEIGHT",
+    "TRAFFIC_CODE",
+    "DURATION_MS",
+    "CONTENT_TYPE",
+    "FILENAME",
+]
+
+
+def csv_clean(date, parsed_csv=None, delta=False):
     """
     Cleaning the merged data follows mulitple steps:
         - put the merged CSV into a pandas dataframe
+        - drop the rows that are not in both DBs, and log the count for each _merge value
         - insert new fields into the dataframe (columns 13 to 23)
-        - iterate over all rows in the dataframe
+        - clean the rows a column at a time, only the video rows are cleaned row by row
         - clean each filename to remove illegal character: &
         - parse the Traffic Code from the cleaned name and validate the value
         - parse and clean the METAXML field if it is not NULL
@@ -31,271 +71,50 @@ def csv_clean(date, parsed_csv=None):
         - drop the METAXML field from the dataframe, export a new CSV,
             then take cleaned dataframe data and create a DB
             with tablename "assets"
+        - with delta=True the rows are an incremental batch, and are upserted
+            into the existing "assets" table instead of replacing it
+    Returns the cleaned file and the tablename, or None if the rows were not loaded.
     """
 
     config = cfg.get_config()
 
     root_path = config["paths"]["root_path"]
-    db_path = config["paths"]["db_path"]
     csv_path = config["paths"]["csv_path"]
 
     os.chdir(csv_path)
 
     if parsed_csv is None:
-        parsed_csv = date + "_" + "gor_diva_merged_parsed.csv"
+        parsed_csv = im.stage_file(date, "gor_diva_merged_parsed", config)
     else:
         parsed_csv = parsed_csv
 
-    clean_csv = date + "_" + "gor_diva_merged_cleaned.csv"
+    clean_csv = im.stage_file(date, "gor_diva_merged_cleaned", config)
 
     clean_1_msg = f"START GORILLA-DIVA DB CLEAN"
     logger.info(clean_1_msg)
 
     try:
-        pd_reader = pd.read_csv(parsed_csv, header=0)
+        pd_reader = im.read_frame(parsed_csv, header=0)
         df = pd.DataFrame(pd_reader)
-        df.index.name = "ROWID"
-        df = df.astype({"METAXML": str})  # set the field to type str
-
-        df.insert(13, "TITLETYPE", "NULL", allow_duplicates=True)
-        df.insert(14, "FRAMERATE", "NULL", allow_duplicates=True)
-        df.insert(15, "CODEC", "NULL", allow_duplicates=True)
-        df.insert(16, "V_WIDTH", "NULL", allow_duplicates=True)
-        df.insert(17, "V_HEIGHT", "NULL", allow_duplicates=True)
-        df.insert(18, "TRAFFIC_CODE", "NULL", allow_duplicates=True)
-        df.insert(19, "DURATION_MS", "NULL", allow_duplicates=True)
-        df.insert(20, "XML_CREATED", 0, allow_duplicates=True)
-        df.insert(21, "PROXY_COPIED", 0, allow_duplicates=True)
-        df.insert(22, "CONTENT_TYPE", "NULL", allow_duplicates=True)
-        df.insert(23, "FILENAME", "NULL", allow_duplicates=True)
-
-        df.to_csv(clean_csv)
-
-        for index, row in df.iterrows():
-
-            name = str(row["NAME"]).upper()
-            cleaned_name = clean_name(name)
-            df.at[index, "NAME"] = cleaned_name
-
-            name_clean_msg = f"Index: {str(index)}  cleaned filename: {cleaned_name}"
-            logger.info(name_clean_msg)
-
-            traffic_code = get_traffic_code(cleaned_name)
-            df.at[index, "TRAFFIC_CODE"] = traffic_code
-
-            df_row = df.loc[index]
-
-            if row["_merge"] != "both":
-                df.drop(index=index, inplace=True)
-                continue
-            else:
-                pass
-
-            if pd.isnull(df_row["METAXML"]) is not True:
-                l_metaxml = df_row["METAXML"]
-                r_metaxml = r"{}".format(l_metaxml)
-                metaxml = clean_metaxml(r_metaxml, cleaned_name)
-                df.at[index, "METAXML"] = metaxml
-            else:
-                df.at[index, "METAXML"] = "NULL"
-                metaxml = df.at[index, "METAXML"]
-
-            video_check_1 = re.search(
-                r"(?<![0-9]|[A-Z])(?<=[-_])(VM|EM|UHD)(?=(-|_|[1-5])?)(?![A-Z])",
-                cleaned_name,
-                re.IGNORECASE,
-            )
-            video_check_2 = re.search(
-                r"(?<![0-9]|[A-Z])(?<=[-_])(SMLS|TXTLS|TXTD|CTC)(?=(-|_|[1-5])?)(?![A-Z])",
-                cleaned_name,
-                re.IGNORECASE,
-            )
-            video_check_3 = re.search(
-                r"(?<=[_-])(PATCH|MXF|MOV)(?=(-|_|[1-5])?)(?![A-Z])",
-                cleaned_name,
-                re.IGNORECASE,
-            )
-            video_check_4 = re.search(
-                r"(?<![0-9A-Z])(?<=(-|_))(XDCAM|DNX(HD)?)(?=(-|_|[1-5]|HD)?)",
-                cleaned_name,
-                re.IGNORECASE,
-            )
-
-            # these video files will be filtered out, not used in the migration
-            video_check_5 = re.search(
-                r"(?<![0-9A-Z])(?<=(-|_))(DV100|IMX50|CEM|CVM|SVM|PGS|DOLBY|PROMOSELECTS|CLEANCOVERS|CREDITPATCH|DELETEDSCENES)(?=(-|_|[1-5])?)",
-                cleaned_name,
-                re.IGNORECASE,
-            )
+        fingerprints = row_fingerprints(df) if incremental_clean(config) else None
+        df = clean_frame(df, fingerprints=fingerprints)
+        im.write_frame(df, clean_csv, index=True)
 
-            vcheck_list = []
-
-            if (
-                video_check_1,
-                video_check_2,
-                video_check_3,
-                video_check_4,
-                video_check_5,
-            ) != (
-                None,
-                None,
-                None,
-                None,
-                None,
-            ):
-                if video_check_1 is not None:
-                    vcheck1 = video_check_1.group(0)
-                    vcheck_list.append(vcheck1)
-
-                if video_check_2 is not None:
-                    vcheck2 = video_check_2.group(0)
-                    vcheck_list.append(vcheck2)
-
-                if video_check_3 is not None:
-                    vcheck3 = video_check_3.group(0)
-                    vcheck_list.append(vcheck3)
-
-                if video_check_4 is not None:
-                    vcheck4 = video_check_4.group(0)
-                    vcheck_list.append(vcheck4)
-                content_type_v = ",".join(vcheck_list)
-
-                if video_check_5 is not None:
-                    vcheck5 = video_check_5.group(0)
-                    if vcheck5 in [
-                        "PROMOSELECTS",
-                        "CLEANCOVERS",
-                        "CREDITPATCH",
-                        "DELETEDSCENES",
-                    ]:
-                        vcheck5_abrv = abbreviate(vcheck5)
-                        vcheck_list.append(vcheck5_abrv)
-                    else:
-                        vcheck_list.append(vcheck5)
-                content_type_v = ",".join(vcheck_list)
-
-            else:
-                content_type_v = None
-
-            archive_pattern = r"((?<![0-9A-Z])|(?<=(-|_)))(AVP|PPRO|FCP|PTS|AVP|GRFX|GFX|WAV|WAVS|SPLITS|GFXPACKAGE|GRAPHICS)(?=(-|_)?)(?![0-9A-Z])"
-            archive_check = re.search(archive_pattern, cleaned_name, re.IGNORECASE)
-
-            if archive_check is not None:
-                if archive_check.group(0) == "SPLITS":
-                    content_type_a = "WAV"
-                elif archive_check.group(0) == "WAVS":
-                    content_type_a = "WAV"
-                elif archive_check.group(0) in ["GFX", "GFXPACKAGE", "GRAPHICS"]:
-                    content_type_a = "GRFX"
-                else:
-                    content_type_a = archive_check.group(0)
-
-            else:
-                content_type_a = None
-
-            content_type_d = None
-            doc_pattern = r"((?<![0-9]|[A-Za-z])|(?<=(-|_)))(Outgoing[-_]?QC)(?=(-|_)?)"
-            document_check = re.search(doc_pattern, cleaned_name, re.IGNORECASE)
-
-            if (
-                document_check is not None
-                and content_type_v is None
-                and content_type_a is None
-            ):
-                df.at[index, "TITLETYPE"] = "document"
-                df.at[index, "CONTENT_TYPE"] = "DOCX"
-                df.at[index, "FILENAME"] = f"{cleaned_name}.docx"
-
-                print("")
-                print(f"{cleaned_name} TITLE TYPE: document, CONTENT TYPE: docx")
-                print("")
-
-            if (
-                content_type_v is not None
-                and archive_check is None
-                and content_type_d is None
-            ):
-                df.at[index, "TITLETYPE"] = "video"
-                mediainfo = gmi.get_mediainfo(df_row, metaxml)
-
-                print("")
-                print("MEDIA-INFO:   " + str(mediainfo))
-                print("")
-
-                df.at[index, "CONTENT_TYPE"] = content_type_v
-                df.at[index, "FRAMERATE"] = mediainfo[0]
-                df.at[index, "CODEC"] = mediainfo[1]
-                df.at[index, "V_WIDTH"] = mediainfo[2]
-                df.at[index, "V_HEIGHT"] = mediainfo[3]
-                df.at[index, "DURATION_MS"] = mediainfo[4]
-                df.at[index, "FILENAME"] = mediainfo[5]
-
-            elif (
-                archive_check is not None
-                and content_type_v is None
-                and content_type_d is None
-            ):
-                title_type = get_title_type(content_type_a)
-                date = df.at[index, "SOURCECREATEDT"]
-                creation_date = format_creation_date(date)
-                df.at[index, "TITLETYPE"] = title_type
-                df.at[index, "CONTENT_TYPE"] = content_type_a
-                df.at[index, "PROXY_COPIED"] = 3
-                df.at[index, "FILENAME"] = f"{cleaned_name}_{creation_date}.zip"
-                mediainfo = [
-                    "NULL",
-                    "NULL",
-                    "NULL",
-                    "NULL",
-                    "NULL",
-                    "NULL",
-                ]
-
-            elif (
-                content_type_v is not None
-                and archive_check is not None
-                and content_type_d is None
-            ):
-                title_type = get_title_type(content_type_a)
-                date = df.at[index, "SOURCECREATEDT"]
-                creation_date = format_creation_date(date)
-                df.at[index, "TITLETYPE"] = title_type
-                df.at[index, "CONTENT_TYPE"] = f"{content_type_a}, {content_type_v}"
-                df.at[index, "PROXY_COPIED"] = 3
-                df.at[index, "FILENAME"] = f"{cleaned_name}_{creation_date}.zip"
-                mediainfo = [
-                    "NULL",
-                    "NULL",
-                    "NULL",
-                    "NULL",
-                    "NULL",
-                    "NULL",
-                ]
-
-            else:
-                clean_2_msg = f"TITLETYPE for {name} is NULL. "
-                logger.info(clean_2_msg)
-                df.at[index, "CONTENT_TYPE"] = "NULL"
-                df.at[index, "TITLETYPE"] = "NULL"
-                mediainfo = [
-                    "NULL",
-                    "NULL",
-                    "NULL",
-                    "NULL",
-                    "NULL",
-                    "NULL",
-                ]
-                df.at[index, "FILENAME"] = df.at[index, "NAME"]
-
-        df.drop("METAXML", axis=1, inplace=True)
-        df.to_csv(clean_csv)
-        os.chdir(db_path)
-
-        conn = db.connect()
         tablename = "assets"
-        db.create_table("database.db", tablename, df)
 
-        clean_3_msg = f"GORILLA-DIVA DB CLEAN COMPLETE, NEW DB TABLE CREATED"
+        if load_frame(df, tablename, delta) is None:
+            load_err_msg = f"GORILLA-DIVA DB CLEAN STOPPED, the cleaned rows were not loaded into {tablename}: {clean_csv}"
+            logger.error(load_err_msg)
+            os.chdir(root_path)
+            return
+
+        if fingerprints is not None:
+            store_fingerprints(df, fingerprints, delta)
+
+        if delta is True:
+            clean_3_msg = f"GORILLA-DIVA DB CLEAN COMPLETE, {len(df)} ROWS UPSERTED INTO {tablename}"
+        else:
+            clean_3_msg = f"GORILLA-DIVA DB CLEAN COMPLETE, NEW DB TABLE CREATED"
         logger.info(clean_3_msg)
 
         os.chdir(root_path)
@@ -305,11 +124,343 @@ def csv_clean(date, parsed_csv=None):
         db_clean_excp_msg = f"\n\
         Exception raised on the Gor-Diva DB Clean.\n\
         Error Message:  {str(e)} \n\
-        Index Count: {index}\n\
         "
         logger.exception(db_clean_excp_msg)
 
 
+def clean_frame(df, settings=None, fingerprints=None):
+    """
+    Add the new fields to the parsed dataframe, and clean and classify each row
+    (see csv_clean). Returns the cleaned dataframe, without the METAXML field.
+    The rows that are not in both DBs are dropped first (see filter_merged), and METAXML
+    is only kept for the video rows.
+    The columns are cleaned in the main process, with the name cache. With pipeline: workers
+    the video rows are cleaned in chunks in a process pool.
+    With the fingerprints of the rows (see row_fingerprints), the rows unchanged since
+    the last clean are carried over from the assets table instead of cleaned again.
+    """
+
+    if settings is None:
+        settings = parallel.get_parallel_settings(cfg.get_config())
+
+    df = df.reset_index(drop=True)
+    df.index.name = "ROWID"
+    df = filter_merged(df)
+
+    df.insert(13, "TITLETYPE", "NULL", allow_duplicates=True)
+    df.insert(14, "FRAMERATE", "NULL", allow_duplicates=True)
+    df.insert(15, "CODEC", "NULL", allow_duplicates=True)
+    df.insert(16, "V_WIDTH", "NULL", allow_duplicates=True)
+    df.insert(17, "V_HEIGHT", "NULL", allow_duplicates=True)
+    df.insert(18, "TRAFFIC_CODE", "NULL", allow_duplicates=True)
+    df.insert(19, "DURATION_MS", "NULL", allow_duplicates=True)
+    df.insert(20, "XML_CREATED", 0, allow_duplicates=True)
+    df.insert(21, "PROXY_COPIED", 0, allow_duplicates=True)
+    df.insert(22, "CONTENT_TYPE", "NULL", allow_duplicates=True)
+    df.insert(23, "FILENAME", "NULL", allow_duplicates=True)
+
+    metaxml = df.pop("METAXML")
+    carried = None
+
+    if fingerprints is not None:
+        carried = carry_over(df, fingerprints)
+        df = df.drop(carried.index)
+        incremental_msg = f"Incremental clean - unchanged rows: {len(carried)}, rows to clean: {len(df)}"
+        logger.info(incremental_msg)
+
+    df = clean_rows(df)
+    video = df["TITLETYPE"] == "video"
+
+    if video.any():
+        videos = df.loc[video].assign(
+            METAXML=metaxml[video[video].index].astype(str)  # set the field to type str
+        )
+        del metaxml
+        videos = parallel.map_chunks(clean_video_rows, videos, settings)
+        for col in MEDIAINFO_COLUMNS:
+            df.loc[video, col] = videos[col]
+
+    nc.finish()
+
+    if carried is not None:
+        df = pd.concat([df, carried]).sort_index()
+
+    return df
+
+
+def filter_merged(df):
+    """
+    Keep the rows found in both DBs, and log the count of the rows dropped for each
+    _merge value.
+    """
+
+    both = df["_merge"] == "both"
+    dropped = df.loc[~both, "_merge"].fillna("NULL").value_counts()
+
+    filter_msg = f"Rows to clean: {both.sum()}, dropped - only in Gorilla: {dropped.get('left_only', 0)}, only in DIVA: {dropped.get('right_only', 0)}, other _merge value: {dropped.drop(['left_only', 'right_only'], errors='ignore').sum()}"
+    logger.info(filter_msg)
+
+    if both.all():
+        return df
+
+    return df.loc[both].copy()
+
+
+def incremental_clean(config=None):
+    """
+    pipeline: incremental_clean only cleans the rows that changed since the last clean.
+    """
+
+    if config is None:
+        config = cfg.get_config()
+
+    return cfg.get_setting(config, "pipeline", "incremental_clean", False) is True
+
+
+def clean_version():
+    """
+    A checksum of the clean modules, the rows cleaned by another version are cleaned again.
+    """
+
+    crc = 0
+
+    for path in [__file__, cl.__file__, gmi.__file__]:
+        with open(path, "rb") as f:
+            crc = zlib.crc32(f.read(), crc)
+
+    return f"{crc:08x}"
+
+
+def row_fingerprints(df):
+    """
+    Return the fingerprint of each parsed row by position, a hash of every raw field
+    of the row, METAXML included.
+    """
+
+    hashes = pd.util.hash_pandas_object(df.reset_index(drop=True), index=False)
+
+    return hashes.map("{:016x}".format)
+
+
+def carry_over(df, fingerprints):
+    """
+    Return the rows whose fingerprint is the one stored at the last clean,
+    with the cleaned fields of their GUID in the assets table. A GUID found more than
+    once, or not in the table, is cleaned again.
+    """
+
+    previous = db.get_clean_fingerprints(clean_version()) or {}
+
+    unchanged = ~df["GUID"].duplicated(keep=False) & (
+        df["GUID"].map(previous) == fingerprints[df.index]
+    )
+
+    assets = None
+
+    if unchanged.any():
+        assets = db.select_columns("assets", ["GUID"] + CLEANED_COLUMNS)
+
+    if assets is None:
+        return df.iloc[0:0]
+
+    assets = assets.drop_duplicates(subset="GUID").set_index("GUID")
+    carried = df.loc[unchanged & df["GUID"].isin(assets.index)].copy()
+
+    for col in CLEANED_COLUMNS:
+        carried[col] = carried["GUID"].map(assets[col])
+
+    carried["XML_CREATED"] = 0
+    carried["PROXY_COPIED"] = np.where(carried["TITLETYPE"] == "archive", 3, 0)
+
+    return carried
+
+
+def store_fingerprints(df, fingerprints, delta=False):
+    """
+    Store the fingerprints of the cleaned rows once they are loaded into the assets table.
+    A full clean replaces the stored fingerprints, a delta batch is added to them.
+    """
+
+    rows = list(zip(df["GUID"], fingerprints[df.index]))
+    db.set_clean_fingerprints(rows, clean_version(), replace=delta is not True)
+
+
+def clean_rows(df):
+    """
+    Clean and classify the rows of the parsed dataframe a column at a time.
+    The name fields are read from the name cache.
+    """
+
+    index = None
+
+    try:
+        names = df["NAME"].astype(str).str.upper()
+        ampersand = names.str.contains("&", regex=False)
+        names[ampersand] = names[ampersand].map(clean_name)
+        df["NAME"] = names
+
+        codes = names.str.extract(r"^([^_-]*)", expand=False)
+        codes = codes.where(~names.str.startswith("0"), names.str[:6])
+        df["TRAFFIC_CODE"] = '="' + codes + '"'
+
+        name_cache = nc.get_cache()
+        fields = [name_cache.get(name) for name in names]
+
+        checks = pd.DataFrame(
+            [name_fields["video"] for name_fields in fields],
+            index=df.index,
+            columns=range(5),
+            dtype=object,
+        )
+        checks[4] = checks[4].map(lambda vcheck5: abbreviate(vcheck5) or vcheck5)
+        content_type_v = checks[0]
+
+        for i in range(1, 5):
+            content_type_v = content_type_v.where(
+                checks[i].isna(),
+                np.where(
+                    content_type_v.isna(), checks[i], content_type_v + "," + checks[i]
+                ),
+            )
+
+        content_type_a = pd.Series(
+            [name_fields["archive"] for name_fields in fields],
+            index=df.index,
+            dtype=object,
+        )
+        content_type_a = content_type_a.map(
+            lambda check: ARCHIVE_TYPES.get(check, check)
+        )
+
+        video = content_type_v.notna() & content_type_a.isna()
+        archive = content_type_a.notna()
+
+        if archive.any():
+            dates = df.loc[archive, "SOURCECREATEDT"]
+            not_str = ~dates.map(lambda date: isinstance(date, str))
+            if not_str.any():
+                index = not_str.idxmax()
+                format_creation_date(dates[index])
+
+        creation_dates = df["SOURCECREATEDT"].where(archive, "").astype(str)
+        archive_filenames = (
+            names + "_" + creation_dates.str.translate(CREATION_DATE_TABLE) + ".zip"
+        )
+        title_types = {
+            content_type: get_title_type(content_type)
+            for content_type in content_type_a[archive].unique()
+        }
+
+        df["TITLETYPE"] = np.select(
+            [video, archive], ["video", content_type_a.map(title_types)], "NULL"
+        )
+        df["CONTENT_TYPE"] = np.select(
+            [video, archive & content_type_v.isna(), archive],
+            [content_type_v, content_type_a, content_type_a + ", " + content_type_v],
+            "NULL",
+        )
+        df["PROXY_COPIED"] = np.where(archive, 3, df["PROXY_COPIED"])
+        df["FILENAME"] = np.select([archive], [archive_filenames], names)
+
+        clean_count_msg = f"Rows cleaned: {len(df)}, video: {video.sum()}, archive: {archive.sum()}, NULL: {len(df) - video.sum() - archive.sum()}"
+        logger.info(clean_count_msg)
+
+    except Exception:
+        clean_index_msg = f"Gor-Diva DB Clean failed at Index: {index}"
+        logger.error(clean_index_msg)
+        raise
+
+    return df
+
+
+def clean_video_rows(df):
+    """
+    Clean the video rows of a chunk row by row, to read their METAXML (see clean_video_row).
+    Returns the chunk.
+    """
+
+    index = None
+
+    try:
+        for index in df.index:
+            clean_video_row(df, index)
+
+    except Exception:
+        clean_index_msg = f"Gor-Diva DB Clean failed at Index: {index}"
+        logger.error(clean_index_msg)
+        raise
+
+    return df
+
+
+def clean_video_row(df, index):
+    """
+    Parse the METAXML of a video row, and set its mediainfo fields.
+    """
+
+    df_row = df.loc[index]
+    cleaned_name = df_row["NAME"]
+
+    if pd.isnull(df_row["METAXML"]) is not True:
+        r_metaxml = r"{}".format(df_row["METAXML"])
+        metaxml = clean_metaxml(r_metaxml, cleaned_name)
+    else:
+        metaxml = "NULL"
+
+    mediainfo = gmi.get_mediainfo(df_row, metaxml)
+
+    print("")
+    print("MEDIA-INFO:   " + str(mediainfo))
+    print("")
+
+    df.at[index, "FRAMERATE"] = mediainfo[0]
+    df.at[index, "CODEC"] = mediainfo[1]
+    df.at[index, "V_WIDTH"] = mediainfo[2]
+    df.at[index, "V_HEIGHT"] = mediainfo[3]
+    df.at[index, "DURATION_MS"] = mediainfo[4]
+    df.at[index, "FILENAME"] = mediainfo[5]
+
+
+def load_frame(df, tablename, delta=False):
+    """
+    Load the cleaned dataframe into the DB table, rebuilding the table with the bulk
+    loader, or upserting the rows of an incremental batch with delta=True.
+    Returns the number of rows loaded, or None if the load failed.
+    """
+
+    if delta is True:
+        return db.upsert_table(tablename, df)
+
+    return bl.load_table(df, tablename)
+
+
+def video_checks(cleaned_name):
+    """
+    Run the video checks against a cleaned name, returns the 5 matched tokens (or None).
+    """
+    return cl.video_checks(cleaned_name)
+
+
+def get_archive_check(cleaned_name):
+    """
+    Run the archive check against a cleaned name, returns the matched token (or None).
+    """
+    return cl.archive_check(cleaned_name)
+
+
+def is_video(name):
+    """
+    Return True if csv_clean will classify the name as a video, and read its METAXML.
+    """
+
+    cleaned_name = clean_name(str(name).upper())
+
+    return (
+        any(check is not None for check in video_checks(cleaned_name))
+        and get_archive_check(cleaned_name) is None
+    )
+
+
 def get_title_type(content_type_a):
     """
     Check content_type for specific tags, and apply a title_type based on those tags.
@@ -350,7 +501,7 @@ def format_creation_date(date):
     """
     Remove non-integer characters from the date string.
     """
-    creation_date = date.translate({ord(i): None for i in "- :"})
+    creation_date = date.translate(CREATION_DATE_TABLE)
     return creation_date
 
 
@@ -359,7 +510,10 @@ def clean_metaxml(r_metaxml, name):
     Replace '&'  and '\\' characters in the metaxml field.
     """
 
-    xml_search = re.search(r"[<FileName>].*&.*[</FileName>]", r_metaxml)
+    if "&" in r_metaxml:
+        xml_search = re.search(r"[<FileName>].*&.*[</FileName>]", r_metaxml)
+    else:
+        xml_search = None
 
     if xml_search is not None:
         bad_xml = xml_search.group(0)
@@ -9,114 +9,139 @@ import pandas as pd
 import yaml
 
 import config as cfg
+import intermediate as im
+import parallel
 
 logger = logging.getLogger(__name__)
 
-
-def db_parse(date, merged_csv):
+# Name tokens of the file types kept by the parse, and the tokens that exclude a name.
+# The same definitions build the em_check regex and the Oracle pushdown filter (sql_name_filter).
+KEEP_TOKENS = [
+    "VM",
+    "EM",
+    "AVP",
+    "PPRO",
+    "FCP",
+    "PTS",
+    "GRFX",
+    "GFX",
+    "UHD",
+    "XDCAM",
+    "XDCAMHD",
+    "WAV",
+    "WAVS",
+]
+EXCLUDE_TOKENS = ["PGS", "SVM", "SDM", "CEM", "PROMO"]
+SEPARATOR = "[-_]"
+
+EM_PATTERN = (
+    rf"^(?!.*(?:{'|'.join(EXCLUDE_TOKENS)}))"
+    rf"{SEPARATOR}*(?:{'|'.join(KEEP_TOKENS)}){SEPARATOR}*$"
+)
+QC_PATTERN = r"(?<=-|_)OUTGOING(?=[QC]?|-|_)"
+
+
+def keep_name(name):
     """
-    Loop through the gor-diva merged csv and parse out rows for specific file types.
-    write out the rows to a pandas df, then save to a new csv.
+    Return True if an upper case asset name passes the em_check and qc_check regexes.
     """
 
-    config = cfg.get_config()
+    em_check = re.search(EM_PATTERN, name)
+    qc_check = re.search(QC_PATTERN, name)
 
-    root_path = config["paths"]["root_path"]
-    csv_path = config["paths"]["csv_path"]
+    return em_check is not None and qc_check is None
 
-    os.chdir(csv_path)
 
-    parsed_csv = date + "_" + "gor_diva_merged_parsed.csv"
+def sql_name_filter(column):
+    """
+    Return the Oracle predicates that select the same names as keep_name().
+    Oracle regexes have no lookarounds, so the exclusion lookahead and the OUTGOING
+    lookbehind are separate NOT REGEXP_LIKE predicates.
+    The patterns only use the POSIX ERE subset of oracle_standin.ERE_SYNTAX. The pushdown
+    accepts two differences from keep_name():
+        $ only matches at the end of the name in Oracle, Python's $ also matches before a
+        trailing newline, so a kept name that ends in a newline is not exported.
+        Oracle UPPER() and Python str.upper() can fold non-ASCII characters differently.
+    """
 
-    index_count = 0
-    parsed_count = 0
+    keep = f"^{SEPARATOR}*({'|'.join(KEEP_TOKENS)}){SEPARATOR}*$"
+    exclude = "|".join(EXCLUDE_TOKENS)
 
-    try:
-        with open(merged_csv, mode="r", encoding="utf-8-sig") as m_csv, open(
-            parsed_csv, "w+", newline=""
-        ) as p_csv:
+    return [
+        f"AND REGEXP_LIKE(UPPER({column}), '{keep}')",
+        f"AND NOT REGEXP_LIKE(UPPER({column}), '{exclude}')",
+        f"AND NOT REGEXP_LIKE(UPPER({column}), '{SEPARATOR}OUTGOING')",
+    ]
 
-            parse_1_msg = f"START GORILLA-DIVA DB PARSE"
-            logger.info(parse_1_msg)
-            print(parse_1_msg)
 
-            pd_reader = pd.read_csv(m_csv, header=0)
-            df = pd.DataFrame(pd_reader)
-
-            for index, row in df.iterrows():
+def keep_names(names):
+    """
+    Return a boolean series of the upper case names that pass the em_check and
+    qc_check regexes, the same result as keep_name() on each name.
+    """
 
-                name = str(row["NAME"]).upper()
-                print(str(index_count) + "    " + name)
+    return names.str.contains(EM_PATTERN, regex=True) & ~names.str.contains(
+        QC_PATTERN, regex=True
+    )
 
-                """
-                index_count value set to 200K, arbitrary number, the value should 
-                be set higher as the DB grows.
 
-                """
-                """
-                1)  ^: This asserts the start of the string, ensuring that the pattern matches from the beginning.
+def parse_frame(df, settings=None):
+    """
+    Return the rows of the merged dataframe with the names kept by the parse.
+    The regexes run over the whole NAME column at once, or with pipeline: workers
+    over chunks of the column in a process pool.
+    """
 
-                2)  (?!.*(PGS|SVM|SDM)): This is a negative lookahead assertion (?!...) which ensures that the string does not contain the substrings "PGS", "SVM", or "SDM" anywhere. If any of these substrings are found, the match fails.
+    if settings is None:
+        settings = parallel.get_parallel_settings(cfg.get_config())
 
-                3)  ((?<![A-Z])|(?<=(-|_))): This part is a capturing group ( ... ) containing two alternatives joined by a logical OR |.
+    names = df["NAME"].astype(str).str.upper()
+    keep = parallel.map_chunks(keep_names, names, settings)
 
-                4)  (?<![A-Z]): This is a negative lookbehind assertion (?<!...) which ensures that the match is not preceded by an uppercase letter.
+    if logger.isEnabledFor(logging.DEBUG):
+        for name in names[~keep]:
+            parse_2_msg = f"{name} removed from the dataset"
+            logger.debug(parse_2_msg)
 
-                5)  (?<=(-|_)): This is a positive lookbehind assertion (?<=...) which ensures that the match is preceded by a hyphen or underscore.
+    parse_count_msg = (
+        f"Names parsed: {len(df)}, kept: {keep.sum()}, removed: {(~keep).sum()}"
+    )
+    logger.info(parse_count_msg)
 
-                6)  VM|EM|AVP|PPRO|FCP|PTS|GRFX|GFX|UHD|XDCAM|XDCAMHD|WAV|WAVS: This is a capturing group containing a list of options separated by the pipe |. It matches one of the specified options: "VM", "EM", "AVP", "PPRO", "FCP", "PTS", "GRFX", "GFX", "UHD", "XDCAM", "XDCAMHD", "WAV", or "WAVS".
+    return df.loc[keep]
 
-                7)  (?=(-|_|[1-5])?): This is a positive lookahead assertion (?=...) which ensures that the match is followed by an optional hyphen, underscore, or a digit between 1 and 5.
 
-                8)  (?![A-Z]): This is a negative lookahead assertion (?!...) which ensures that the match is not followed by an uppercase letter.
-                --------------------------------------
-                the regex pattern ensures that:
+def db_parse(date, merged_csv):
+    """
+    Parse out the rows of the gor-diva merged csv for specific file types,
+    and write them to a new csv in one write.
+    """
 
-                The string does not contain "PGS", "SVM", or "SDM".
-                The matched substring starts either not with a digit or an uppercase letter, or with a hyphen or underscore.
-                The matched substring is one of the specified options.
-                The matched substring is optionally followed by a hyphen, underscore, or a digit between 1 and 5.
-                The matched substring is not followed by an uppercase letter.
-                """
+    config = cfg.get_config()
 
-                if index_count <= 200000:
+    root_path = config["paths"]["root_path"]
+    csv_path = config["paths"]["csv_path"]
 
-                    # em_check = re.search(
-                    #     r"((?<![0-9]|[A-Z])|(?<=(-|_)))(VM|EM|AVP|PPRO|FCP|PTS|GRFX|GFX|UHD|XDCAM|XDCAMHD)(?=(-|_|[1-5])?)(?![A-Z])",
-                    #     name,
-                    # )
-                    em_check = re.search(
-                        r"^(?!.*(?:PGS|SVM|SDM|CEM|PROMO))[-_]*(VM|EM|AVP|PPRO|FCP|PTS|GRFX|GFX|UHD|XDCAM|XDCAMHD|WAV|WAVS)[-_]*$",
-                        name,
-                    )
+    os.chdir(csv_path)
 
-                    qc_check = re.search(r"(?<=-|_)OUTGOING(?=[QC]?|-|_)", name)
+    parsed_csv = im.stage_file(date, "gor_diva_merged_parsed", config)
 
-                    if em_check is not None and qc_check is None and parsed_count == 0:
-                        dft = pd.DataFrame(row).transpose()
-                        dft.to_csv(p_csv, mode="a", index=False, header=True)
-                        parsed_count += 1
-                    elif (
-                        em_check is not None and qc_check is None and parsed_count != 0
-                    ):
-                        dft = pd.DataFrame(row).transpose()
-                        dft.to_csv(p_csv, mode="a", index=False, header=False)
-                        parsed_count += 1
-                    else:
-                        parse_2_msg = f"{name} removed from the dataset"
-                        logger.info(parse_2_msg)
-                        pass
+    try:
+        parse_1_msg = f"START GORILLA-DIVA DB PARSE"
+        logger.info(parse_1_msg)
+        print(parse_1_msg)
 
-                    index_count += 1
+        pd_reader = im.read_frame(merged_csv, header=0, encoding="utf-8-sig")
+        df = pd.DataFrame(pd_reader)
+        parsed_df = parse_frame(df)
 
-            m_csv.close()
-            p_csv.close()
+        im.write_frame(parsed_df, parsed_csv)
 
-            os.chdir(root_path)
+        os.chdir(root_path)
 
-            parse_3_msg = f"GORILLA-DIVA DB PARSE COMPLETE"
-            logger.info(parse_3_msg)
-            print(parse_3_msg)
+        parse_3_msg = f"GORILLA-DIVA DB PARSE COMPLETE"
+        logger.info(parse_3_msg)
+        print(parse_3_msg)
 
         return parsed_csv
 
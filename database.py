@@ -3,32 +3,143 @@
 import logging
 import os
 import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime
 
 import pandas as pd
 
 import config as cfg
+import schema
 
 logger = logging.getLogger(__name__)
 config = cfg.get_config()
 
-db_path = config["paths"]["db_path"]
+db_path = os.path.abspath(config["paths"]["db_path"])
+
+# The open connections of each thread, keyed by DB file (see connect).
+connections = threading.local()
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    A connection kept open for the life of its thread. close() only rolls back
+    an uncommitted transaction, the same as closing the connection would.
+    """
+
+    def close(self):
+        self.rollback()
+
+    def release(self):
+        sqlite3.Connection.close(self)
+
+
+def get_connection_settings(config):
+    """
+    Read the optional sqlite settings of the DB connections.
+        cache_mb:  page cache of each connection (default 64)
+        mmap_mb:   memory mapped reads of the DB file (default 256, 0 turns them off)
+        update_chunk_rows:  updates per executemany of update_columns (default 10000)
+        load_chunk_rows:  rows per executemany of the bulk loader (default 50000)
+        fetch_batch_rows:  rows per fetchmany of iter_rows (default 1000)
+    """
+
+    settings = {
+        "cache_mb": int(cfg.get_setting(config, "sqlite", "cache_mb", 64)),
+        "mmap_mb": int(cfg.get_setting(config, "sqlite", "mmap_mb", 256)),
+        "update_chunk_rows": int(
+            cfg.get_setting(config, "sqlite", "update_chunk_rows", 10000)
+        ),
+        "load_chunk_rows": int(
+            cfg.get_setting(config, "sqlite", "load_chunk_rows", 50000)
+        ),
+        "fetch_batch_rows": int(
+            cfg.get_setting(config, "sqlite", "fetch_batch_rows", 1000)
+        ),
+    }
+
+    return settings
+
+
+def open_connection(path):
+    """
+    Open a DB file with WAL journaling, readers do not block the writer and a commit
+    only syncs the WAL at checkpoints (synchronous=NORMAL). The schema of the DB is
+    migrated to the current version on open.
+    """
+
+    settings = get_connection_settings(config)
+    conn = sqlite3.connect(path, factory=PooledConnection)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA cache_size=-{settings['cache_mb'] * 1024}")
+    conn.execute(f"PRAGMA mmap_size={settings['mmap_mb'] * 1024 * 1024}")
+    schema.migrate(conn)
+
+    return conn
 
 
 def connect(db_name="database.db"):
-    """Create a database connection."""
+    """
+    Return the connection of this thread to a DB file in db_path, opened on first use.
+    A process started from a fork opens its own connections.
+    """
     try:
-        os.chdir(db_path)
-        conn = sqlite3.connect("database.db")
+        path = os.path.join(db_path, db_name)
+
+        if getattr(connections, "pid", None) != os.getpid():
+            connections.pool = {}
+            connections.pid = os.getpid()
+
+        conn = connections.pool.get(path)
+
+        if conn is None:
+            conn = open_connection(path)
+            connections.pool[path] = conn
     except Exception as e:
-        conn_err_msg = f"Error on connection to database.db"
+        conn_err_msg = f"Error on connection to {db_name}"
         logger.exception(conn_err_msg)
     return conn
 
 
+def disconnect(db_name="database.db"):
+    """
+    Close the connection of this thread to a DB file, before the file is removed.
+    """
+    conn = getattr(connections, "pool", {}).pop(os.path.join(db_path, db_name), None)
+
+    if conn is not None:
+        conn.release()
+
+
+def checkpoint(db_name="database.db"):
+    """
+    Copy the pages of the WAL into the DB file, before the file is copied.
+    """
+    try:
+        conn = connect(db_name)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+    except Exception as e:
+        checkpoint_err_msg = f"Error on the WAL checkpoint of {db_name}"
+        logger.exception(checkpoint_err_msg)
+
+
 def create_table(db_name, tablename, df):
+    """
+    Replace a table with the rows of a dataframe. The assets table is created from
+    its declared schema (see schema.py), then the rows are appended.
+    """
     try:
-        conn = sqlite3.connect(db_name)
-        df.to_sql(tablename, con=connect(), if_exists="replace")
+        conn = connect(db_name)
+        if tablename == schema.ASSETS:
+            df = schema.unique_guids(df)
+            with conn:
+                schema.create_assets(conn, tablename)
+            df.to_sql(tablename, conn, if_exists="append")
+        else:
+            df.to_sql(tablename, con=conn, if_exists="replace")
     except Exception as e:
         cr_table_err_msg = f"Error on creating new db table: {tablename}"
         logger.exception(cr_table_err_msg)
@@ -45,6 +156,63 @@ def update_table(tablename, df):
         logger.exception(upd_table_err_msg)
 
 
+def upsert_table(tablename, df):
+    """
+    Replace the rows of an incremental batch in the table, keyed on GUID.
+    Rows that already exist keep their ROWID, XML_CREATED and PROXY_COPIED values,
+    new rows are appended after the highest existing ROWID. The rows are deleted and
+    inserted in one transaction, a failed upsert leaves the table as it was.
+    Returns the number of rows upserted, or None on error.
+    """
+    try:
+        conn = connect()
+        existing = pd.read_sql(
+            f"""SELECT ROWID, GUID, XML_CREATED, PROXY_COPIED FROM {tablename}""",
+            conn,
+        ).drop_duplicates(subset="GUID")
+
+        df = (
+            schema.unique_guids(df)
+            .reset_index(drop=True)
+            .merge(existing, on="GUID", how="left", suffixes=("", "_DB"))
+        )
+
+        new_rows = df["ROWID"].isnull()
+        next_rowid = int(existing["ROWID"].max()) + 1 if len(existing) != 0 else 0
+        df.loc[new_rows, "ROWID"] = range(next_rowid, next_rowid + new_rows.sum())
+        df.loc[~new_rows, "XML_CREATED"] = df.loc[~new_rows, "XML_CREATED_DB"]
+        df.loc[~new_rows, "PROXY_COPIED"] = df.loc[~new_rows, "PROXY_COPIED_DB"]
+        df = df.astype({"ROWID": int, "XML_CREATED": int, "PROXY_COPIED": int})
+        df = df[[col for col in columns(tablename) if col in df.columns]]
+
+        cols = ", ".join(f'"{col}"' for col in df.columns)
+        sql = f"""INSERT INTO {tablename} ({cols}) VALUES ({", ".join("?" * len(df.columns))})"""
+        # NaN is left as is, SQLite stores a NaN parameter as NULL.
+        rows = zip(*[df[col].tolist() for col in df.columns])
+
+        with conn:
+            conn.executemany(
+                f"""DELETE FROM {tablename} WHERE GUID = ?""",
+                [(guid,) for guid in df["GUID"]],
+            )
+            conn.executemany(sql, rows)
+
+        upsert_msg = f"{tablename} upsert complete. Updated rows: {(~new_rows).sum()}, New rows: {new_rows.sum()}"
+        logger.info(upsert_msg)
+        return len(df)
+    except Exception as e:
+        upsert_err_msg = f"Error on the upsert into the db table: {tablename}, the table is unchanged."
+        logger.exception(upsert_err_msg)
+
+
+def columns(tablename):
+    conn = connect()
+    cur = conn.cursor()
+    col_names = [col[1] for col in cur.execute(f"""PRAGMA table_info({tablename})""")]
+    conn.close()
+    return col_names
+
+
 def select_row(index):
     try:
         conn = connect()
@@ -154,20 +322,108 @@ def update_row(tablename, index, row):
 
 
 def update_column(tablename, col_name, col_value, index):
+    update_columns(tablename, [(index, col_name, col_value)])
+
+
+def update_columns(tablename, updates, key="rowid", chunk_rows=None):
+    """
+    Apply a sequence of (key value, column, value) updates to a table in one transaction,
+    with a parameterized executemany for each column and chunk of chunk_rows updates
+    (default sqlite: update_chunk_rows). Rows are matched on the key column, rowid or GUID.
+    The column names are checked against the table schema. Returns the number of updates.
+    """
     try:
+        if chunk_rows is None:
+            chunk_rows = get_connection_settings(config)["update_chunk_rows"]
+
+        table_cols = {col.upper(): col for col in columns(tablename)}
+
+        if len(table_cols) == 0:
+            raise ValueError(f"Table not found: {tablename}")
+
+        table_cols.setdefault("ROWID", "rowid")
+        key_col = table_cols.get(key.upper())
+
+        if key_col is None:
+            raise ValueError(f"Unknown key column of {tablename}: {key}")
+
+        col_params = {}
+
+        for key_value, col_name, value in updates:
+            col = table_cols.get(str(col_name).upper())
+            if col is None:
+                raise ValueError(f"Unknown column of {tablename}: {col_name}")
+            col_params.setdefault(col, []).append((value, key_value))
+
         conn = connect()
-        cur = conn.cursor()
-        sql = (
-            f"""UPDATE {tablename} SET {col_name} = {col_value} WHERE rowid = {index}"""
-        )
-        params = (tablename, col_name, col_value, index)
-        cur.execute(sql)
-        conn.commit()
+        count = 0
+
+        with conn:
+            for col, params in col_params.items():
+                sql = f"""UPDATE {tablename} SET "{col}" = ? WHERE "{key_col}" = ?"""
+                for i in range(0, len(params), chunk_rows):
+                    conn.executemany(sql, params[i : i + chunk_rows])
+                count += len(params)
+
         conn.close()
-        return
+        return count
     except Exception as e:
-        upd_row_err_msg = f"Error updating row in {tablename} at index: {index}"
-        logger.exception(upd_row_err_msg)
+        upd_cols_err_msg = f"Error on the bulk update of the db table: {tablename}"
+        logger.exception(upd_cols_err_msg)
+
+
+class BulkUpdate:
+    """
+    Collect (key value, column, value) updates of a table, applied with update_columns()
+    every chunk_rows updates and when the collector is closed. A batch that fails is kept
+    and flush() raises, used as a context manager the updates still queued when the block
+    fails are applied, or logged if they cannot be.
+    """
+
+    def __init__(self, tablename, key="rowid", chunk_rows=None):
+        if chunk_rows is None:
+            chunk_rows = get_connection_settings(config)["update_chunk_rows"]
+
+        self.tablename = tablename
+        self.key = key
+        self.chunk_rows = chunk_rows
+        self.updates = []
+        self.count = 0
+
+    def add(self, key_value, col_name, value):
+        self.updates.append((key_value, col_name, value))
+
+        if len(self.updates) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if len(self.updates) != 0:
+            count = update_columns(
+                self.tablename, self.updates, self.key, self.chunk_rows
+            )
+            if count is None:
+                raise sqlite3.DatabaseError(
+                    f"Bulk update of {self.tablename} failed, {len(self.updates)} updates not applied"
+                )
+            self.count += count
+            self.updates = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+
+        try:
+            self.close()
+        except Exception:
+            pending_msg = f"{len(self.updates)} queued updates of {self.tablename} not applied: {self.updates}"
+            logger.exception(pending_msg)
 
 
 def drop_row(tablename, index, guid):
@@ -188,31 +444,98 @@ def drop_row(tablename, index, guid):
         logger.exception(e)
 
 
-def fetchall(tablename):
+def iter_rows(
+    tablename, col_names=None, where=None, params=(), limit=None, batch_rows=None
+):
+    """
+    Yield the rows of a table as namedtuples of the listed columns (default all), read with
+    fetchmany batch_rows at a time (default sqlite: fetch_batch_rows), so the memory used
+    depends on the batch and not on the table. where is an SQL predicate with ? placeholders
+    for params. The rows are read on a connection of their own, from a snapshot of the table
+    that the updates made while iterating do not change.
+    A column that is not a valid field name is renamed to its position, _merge to _<n>.
+    """
+    try:
+        if batch_rows is None:
+            batch_rows = get_connection_settings(config)["fetch_batch_rows"]
+
+        table_cols = {col.upper(): col for col in columns(tablename)}
+
+        if len(table_cols) == 0:
+            raise ValueError(f"Table not found: {tablename}")
+
+        table_cols.setdefault("ROWID", "rowid")
+
+        if col_names is None:
+            col_names = columns(tablename)
+
+        cols = []
+
+        for col_name in col_names:
+            col = table_cols.get(str(col_name).upper())
+            if col is None:
+                raise ValueError(f"Unknown column of {tablename}: {col_name}")
+            cols.append(col)
+
+        Row = namedtuple(f"{tablename}_row", cols, rename=True)
+        select_cols = ", ".join(f'"{col}"' for col in cols)
+        sql = f"""SELECT {select_cols} FROM {tablename}"""
+        params = tuple(params)
+
+        if where is not None:
+            sql += f""" WHERE {where}"""
+
+        if limit is not None:
+            sql += """ LIMIT ?"""
+            params += (int(limit),)
+
+        conn = open_connection(os.path.join(db_path, "database.db"))
+    except Exception as e:
+        iter_err_msg = f"Error on reading the rows of the db table: {tablename}"
+        logger.exception(iter_err_msg)
+        raise
+
+    try:
+        cur = conn.execute(sql, params)
+        rows = cur.fetchmany(batch_rows)
+        while len(rows) != 0:
+            yield from map(Row._make, rows)
+            rows = cur.fetchmany(batch_rows)
+    finally:
+        conn.release()
+
+
+def select_columns(tablename, col_names):
+    """
+    Return the listed columns of a table as a dataframe, or None if the table does not exist.
+    """
     try:
         conn = connect()
-        cur = conn.cursor()
-        sql = f"""SELECT * FROM {tablename}"""
-        params = (tablename,)
-        rows = cur.execute(sql).fetchall()
+        cols = ", ".join(col_names)
+        df = pd.read_sql(f"""SELECT {cols} FROM {tablename}""", conn)
         conn.close()
-        return rows
+        return df
     except Exception as e:
-        fetchall_err_msg = f"Error on fetching rows for db table: {tablename}"
-        logger.exception(fetchall_err_msg)
+        select_err_msg = f"Error on selecting columns of the db table: {tablename}"
+        logger.exception(select_err_msg)
 
 
-def fetchall_proxy(tablename):
+def fetchall_status(tablename):
+    """
+    Return a dict of GUID to the (rowid, XML_CREATED, PROXY_COPIED) of its first row,
+    the status of every row in one query.
+    """
     try:
         conn = connect()
         cur = conn.cursor()
-        sql = f"""SELECT * FROM {tablename} WHERE (TITLETYPE is 'video' AND PROXY_COPIED = 0)"""
-        params = (tablename,)
-        rows = cur.execute(sql).fetchall()
+        sql = f"""SELECT GUID, rowid, XML_CREATED, PROXY_COPIED FROM {tablename}"""
+        statuses = {}
+        for row in cur.execute(sql):
+            statuses.setdefault(row[0], row[1:])
         conn.close()
-        return rows
+        return statuses
     except Exception as e:
-        fetchall_err_msg = f"Error on fetching rows for db table: {tablename}"
+        fetchall_err_msg = f"Error on fetching the status of the db table: {tablename}"
         logger.exception(fetchall_err_msg)
 
 
@@ -262,6 +585,317 @@ def fetchone_proxy(guid):
         logger.exception(fetchprxy_err_msg)
 
 
+def get_watermark(source):
+    """
+    Return the high-water mark of the last completed export for a source, or None.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """SELECT WATERMARK FROM export_watermarks WHERE SOURCE = ?"""
+        params = (source,)
+        row = cur.execute(sql, params).fetchone()
+        conn.close()
+        if row is None or row[0] is None:
+            return None
+        return datetime.fromisoformat(row[0])
+    except Exception as e:
+        watermark_err_msg = f"Error on fetching the export watermark for: {source}"
+        logger.exception(watermark_err_msg)
+
+
+def get_last_full_export():
+    """
+    Return the date of the oldest completed full export across the sources,
+    or None if a source has never completed a full export.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """SELECT FULL_EXPORT FROM export_watermarks"""
+        full_exports = [row[0] for row in cur.execute(sql).fetchall()]
+        conn.close()
+        if len(full_exports) < 2 or None in full_exports:
+            return None
+        return datetime.fromisoformat(min(full_exports))
+    except Exception as e:
+        full_export_err_msg = f"Error on fetching the last full export date"
+        logger.exception(full_export_err_msg)
+
+
+def set_pending_watermark(source, watermark, full_export):
+    """
+    Store the high-water mark of a finished export. It only becomes the watermark
+    used by the next delta export once commit_watermarks() is called after the DB build.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """INSERT INTO export_watermarks (SOURCE, PENDING_WATERMARK, PENDING_FULL_EXPORT)
+                 VALUES (?, ?, ?)
+                 ON CONFLICT(SOURCE) DO UPDATE SET
+                     PENDING_WATERMARK = excluded.PENDING_WATERMARK,
+                     PENDING_FULL_EXPORT = excluded.PENDING_FULL_EXPORT"""
+        params = (
+            source,
+            str(watermark) if watermark is not None else None,
+            datetime.now().isoformat() if full_export is True else None,
+        )
+        cur.execute(sql, params)
+        conn.commit()
+        conn.close()
+        return
+    except Exception as e:
+        watermark_err_msg = f"Error on storing the export watermark for: {source}"
+        logger.exception(watermark_err_msg)
+
+
+def commit_watermarks():
+    """
+    Promote the pending watermarks once the exported rows are loaded into the DB.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """UPDATE export_watermarks
+                 SET WATERMARK = COALESCE(PENDING_WATERMARK, WATERMARK),
+                     FULL_EXPORT = COALESCE(PENDING_FULL_EXPORT, FULL_EXPORT),
+                     PENDING_WATERMARK = NULL,
+                     PENDING_FULL_EXPORT = NULL"""
+        cur.execute(sql)
+        conn.commit()
+        conn.close()
+        return
+    except Exception as e:
+        watermark_err_msg = f"Error on committing the export watermarks"
+        logger.exception(watermark_err_msg)
+
+
+def get_fingerprint(source):
+    """
+    Return the probe fingerprint and the full export file of the last export
+    loaded into the DB for a source, or None.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """SELECT FINGERPRINT, EXPORT_FILE FROM export_fingerprints WHERE SOURCE = ?"""
+        params = (source,)
+        row = cur.execute(sql, params).fetchone()
+        conn.close()
+        if row is None or row[0] is None:
+            return None
+        return row
+    except Exception as e:
+        fingerprint_err_msg = f"Error on fetching the export fingerprint for: {source}"
+        logger.exception(fingerprint_err_msg)
+
+
+def set_pending_fingerprint(source, fingerprint, export_file):
+    """
+    Store the probe fingerprint of a finished export, export_file is None for a delta export.
+    It becomes the fingerprint compared by the next probe once commit_fingerprints() is called.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """INSERT INTO export_fingerprints (SOURCE, PENDING_FINGERPRINT, PENDING_EXPORT_FILE)
+                 VALUES (?, ?, ?)
+                 ON CONFLICT(SOURCE) DO UPDATE SET
+                     PENDING_FINGERPRINT = excluded.PENDING_FINGERPRINT,
+                     PENDING_EXPORT_FILE = excluded.PENDING_EXPORT_FILE"""
+        params = (source, fingerprint, export_file)
+        cur.execute(sql, params)
+        conn.commit()
+        conn.close()
+        return
+    except Exception as e:
+        fingerprint_err_msg = f"Error on storing the export fingerprint for: {source}"
+        logger.exception(fingerprint_err_msg)
+
+
+def commit_fingerprints():
+    """
+    Promote the pending fingerprints once the exported rows are loaded into the DB.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """UPDATE export_fingerprints
+                 SET FINGERPRINT = PENDING_FINGERPRINT,
+                     EXPORT_FILE = PENDING_EXPORT_FILE,
+                     PENDING_FINGERPRINT = NULL,
+                     PENDING_EXPORT_FILE = NULL
+                 WHERE PENDING_FINGERPRINT IS NOT NULL"""
+        cur.execute(sql)
+        conn.commit()
+        conn.close()
+        return
+    except Exception as e:
+        fingerprint_err_msg = f"Error on committing the export fingerprints"
+        logger.exception(fingerprint_err_msg)
+
+
+def get_checkpoint(source):
+    """
+    Return the checkpoint of an unfinished resumable export for a source, or None.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """SELECT EXPORT_FILE, LAST_KEY, ROWS_WRITTEN, FILE_OFFSET, HIGH_WATER,
+                 QUERY_HASH FROM export_checkpoints WHERE SOURCE = ?"""
+        params = (source,)
+        row = cur.execute(sql, params).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        return {
+            "EXPORT_FILE": row[0],
+            "LAST_KEY": row[1],
+            "ROWS_WRITTEN": row[2],
+            "FILE_OFFSET": row[3],
+            "HIGH_WATER": datetime.fromisoformat(row[4]) if row[4] else None,
+            "QUERY_HASH": row[5],
+        }
+    except Exception as e:
+        checkpoint_err_msg = f"Error on fetching the export checkpoint for: {source}"
+        logger.exception(checkpoint_err_msg)
+
+
+def set_checkpoint(
+    source, export_file, last_key, rows_written, file_offset, high_water, query_hash
+):
+    """
+    Store the position of a resumable export after a page is written to disk.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """INSERT OR REPLACE INTO export_checkpoints
+                 (SOURCE, EXPORT_FILE, LAST_KEY, ROWS_WRITTEN, FILE_OFFSET, HIGH_WATER,
+                 QUERY_HASH)
+                 VALUES (?, ?, ?, ?, ?, ?, ?)"""
+        params = (
+            source,
+            export_file,
+            str(last_key),
+            rows_written,
+            file_offset,
+            str(high_water) if high_water is not None else None,
+            query_hash,
+        )
+        cur.execute(sql, params)
+        conn.commit()
+        conn.close()
+        return
+    except Exception as e:
+        checkpoint_err_msg = f"Error on storing the export checkpoint for: {source}"
+        logger.exception(checkpoint_err_msg)
+
+
+def clear_checkpoint(source):
+    """
+    Remove the checkpoint of a source once its export is complete.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """DELETE FROM export_checkpoints WHERE SOURCE = ?"""
+        params = (source,)
+        cur.execute(sql, params)
+        conn.commit()
+        conn.close()
+        return
+    except Exception as e:
+        checkpoint_err_msg = f"Error on clearing the export checkpoint for: {source}"
+        logger.exception(checkpoint_err_msg)
+
+
+def get_clean_fingerprints(rules):
+    """
+    Return a dict of GUID to the fingerprint of the parsed row last cleaned into
+    the assets table, for the rows cleaned with a version of the clean rules.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """SELECT GUID, FINGERPRINT FROM clean_fingerprints WHERE RULES = ?"""
+        params = (rules,)
+        rows = cur.execute(sql, params).fetchall()
+        conn.close()
+        return dict(rows)
+    except Exception as e:
+        fingerprint_err_msg = f"Error on fetching the clean fingerprints"
+        logger.exception(fingerprint_err_msg)
+
+
+def set_clean_fingerprints(rows, rules, replace=True):
+    """
+    Store the (GUID, FINGERPRINT) rows of the rows loaded into the assets table.
+    With replace=True the fingerprints of the other GUIDs are removed.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        if replace is True:
+            cur.execute("""DELETE FROM clean_fingerprints""")
+        sql = """INSERT OR REPLACE INTO clean_fingerprints (GUID, FINGERPRINT, RULES)
+                 VALUES (?, ?, ?)"""
+        params = [(guid, fingerprint, rules) for guid, fingerprint in rows]
+        cur.executemany(sql, params)
+        conn.commit()
+        conn.close()
+        return
+    except Exception as e:
+        fingerprint_err_msg = f"Error on storing the clean fingerprints"
+        logger.exception(fingerprint_err_msg)
+
+
+def get_name_cache(rules, limit):
+    """
+    Return the (NAME, FIELDS, LAST_USED) rows of the name cache derived with a version
+    of the classify rules, the most recently used first.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """SELECT NAME, FIELDS, LAST_USED FROM name_cache
+                 WHERE RULES = ? ORDER BY LAST_USED DESC LIMIT ?"""
+        params = (rules, limit)
+        rows = cur.execute(sql, params).fetchall()
+        conn.close()
+        return rows
+    except Exception as e:
+        name_cache_err_msg = f"Error on fetching the name cache"
+        logger.exception(name_cache_err_msg)
+
+
+def set_name_cache(rows, rules, limit):
+    """
+    Upsert the (NAME, FIELDS, LAST_USED) rows of the name cache, then remove the rows
+    of other rule versions and keep the limit most recently used names.
+    """
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        sql = """INSERT OR REPLACE INTO name_cache (NAME, FIELDS, RULES, LAST_USED)
+                 VALUES (?, ?, ?, ?)"""
+        params = [(name, fields, rules, last_used) for name, fields, last_used in rows]
+        cur.executemany(sql, params)
+        cur.execute("""DELETE FROM name_cache WHERE RULES != ?""", (rules,))
+        sql = """DELETE FROM name_cache WHERE NAME NOT IN (
+                     SELECT NAME FROM name_cache ORDER BY LAST_USED DESC LIMIT ?
+                 )"""
+        cur.execute(sql, (limit,))
+        conn.commit()
+        conn.close()
+        return
+    except Exception as e:
+        name_cache_err_msg = f"Error on storing the name cache"
+        logger.exception(name_cache_err_msg)
+
+
 if __name__ == "__main__":
     fetchone_guid("00215AD34D20-8000FFFF-FFFF-C2F5-C5E0")
     # fetchone_xml('FC15B4F7AB88-80001000-0000-734F-D554')
@@ -1,6 +1,5 @@
 #! /usr/bin/env python3
 
-import csv
 import logging
 import os
 from time import localtime, strftime
@@ -9,6 +8,9 @@ import cx_Oracle
 import yaml
 
 import config as cfg
+import database as db
+import intermediate as im
+import oracle_export as oe
 
 cx_Oracle.init_oracle_client(lib_dir="/opt/oracle/instantclient_19_8")
 
@@ -59,47 +61,169 @@ fieldnames = [
     "CY_CHECKSUM_TYPE",
 ]
 
+delta_predicate = """AND (dp_archived_objects.ao_date_archive > :watermark
+            OR dp_object_instances.on_last_access_time > :watermark)"""
+
+watermark_columns = ["AO_DATE_ARCHIVE", "ON_LAST_ACCESS_TIME"]
+
+key_column = "dp_archived_objects.ao_object_name"
+
+# Ordered key of the resumable export pages, a column of the export query.
+page_key = "AO_ID"
+
 logger = logging.getLogger(__name__)
 
 
-def buildcsv(date):
+def get_connection(config):
+    """
+    Open a connection to the Diva Oracle DB.
+    """
+    db_user = config["oracle-db-diva"]["user"]
+    db_pass = config["oracle-db-diva"]["pass"]
+    db_url = config["oracle-db-diva"]["url"]
+
+    return cx_Oracle.connect(db_user, db_pass, db_url)
+
+
+def fingerprint(config):
+    """
+    Probe the Diva export query, see oe.probe().
+    """
+
+    return oe.probe(
+        get_connection, config, "DIVA", sql_query, "AO_OBJECT_NAME", watermark_columns
+    )
+
+
+def export_predicates(delta):
+    """
+    Return the extra predicates and bind variables of the export query, and the
+    watermark of a delta export (None for a full export).
+    """
+
+    predicates = []
+    params = {}
+
+    watermark = db.get_watermark("DIVA") if delta is True else None
+
+    if watermark is not None:
+        delta_msg = f"DIVA DELTA EXPORT, rows changed after: {watermark}"
+        logger.info(delta_msg)
+        predicates.append(delta_predicate)
+        params["watermark"] = watermark
+
+    return predicates, params, watermark
+
+
+def export_serial(config, settings, writer, predicates, params, watermark):
+    """
+    Run the export query on a single cursor, and write the batches to writer.
+    Returns the row count and high-water mark.
+    """
+
+    row_count = 0
+    watermark_index = [fieldnames.index(col) for col in watermark_columns]
+    high_water = watermark
+
+    connection = get_connection(config)
+
+    try:
+        cursor = oe.configure_cursor(connection.cursor(), settings)
+        cursor.execute(oe.add_predicates(sql_query, predicates), params)
+
+        for rows in oe.fetch_batches(cursor, "DIVA", settings):
+            writer.write(rows)
+            row_count += len(rows)
+            high_water = oe.max_watermark(rows, watermark_index, high_water)
+
+    finally:
+        connection.close()
+
+    return row_count, high_water
+
+
+def buildframe():
+    """
+    Full export of the Diva DB into a dataframe for the fused pipeline, typed the
+    same as a parquet or arrow export file. Returns None on failure.
+    """
+
+    config = cfg.get_config()
+    settings = oe.get_export_settings(config)
+
+    try:
+        row_count = 0
+
+        export_1_msg = f"START DIVA DB EXPORT (fused)"
+        logger.info(export_1_msg)
+
+        with im.FrameBuilder(fieldnames) as builder:
+            row_count, high_water = export_serial(
+                config, settings, builder, [], {}, None
+            )
+
+        db.set_pending_watermark("DIVA", high_water, full_export=True)
+
+        export_2_msg = f"DIVA DB EXPORT Complete, Rows Exported: {row_count}"
+        logger.info(export_2_msg)
+
+        return builder.frame()
+
+    except Exception as e:
+        db_export_excp_msg = f"\n\
+        Exception raised on the Diva DB Export.\n\
+        Error at DB Row: {row_count}\n\
+        Error Message:  {str(e)} \n\
+        "
+
+        logger.exception(db_export_excp_msg)
+
+
+def buildcsv(date, delta=False):
     """
     Creates a CSV export from the Oracle DB for Diva Archive. Uses the sql_query and fieldnames list to define the required fields.
+    With delta=True only the rows changed since the last watermark are exported,
+    a full export is run when no watermark has been stored yet.
+    With oracle-export: resumable the export is paged by AO_ID with a checkpoint after
+    each page, and an export that stopped partway continues from its checkpoint.
     """
 
     config = cfg.get_config()
 
-    root_path = config["paths"]["root_path"]
     csv_path = config["paths"]["csv_path"]
 
-    db_user = config["oracle-db-diva"]["user"]
-    db_pass = config["oracle-db-diva"]["pass"]
-    db_url = config["oracle-db-diva"]["url"]
-
-    os.chdir(csv_path)
+    settings = oe.get_export_settings(config)
 
     try:
         row_count = 0
-        connection = cx_Oracle.connect(db_user, db_pass, db_url)
-        cursor = connection.cursor()
-        results = cursor.execute(sql_query)
-
-        diva_csv = date + "_" + "diva_db_export.csv"
-        writer = csv.writer(open(diva_csv, "w", newline=""))
+        predicates, params, watermark = export_predicates(delta)
+        watermark_index = [fieldnames.index(col) for col in watermark_columns]
 
+        diva_csv = im.stage_file(date, "diva_db_export", config)
         export_1_msg = f"START DIVA DB EXPORT"
         logger.info(export_1_msg)
 
-        writer.writerow(fieldnames)
+        if oe.resumable(config):
+            diva_csv, row_count, high_water = oe.export_resumable(
+                get_connection,
+                config,
+                settings,
+                "DIVA",
+                oe.add_predicates(sql_query, predicates),
+                params,
+                page_key,
+                diva_csv,
+                fieldnames,
+                watermark_index,
+                watermark,
+            )
+        else:
+            with im.BatchWriter(os.path.join(csv_path, diva_csv), fieldnames) as writer:
+                row_count, high_water = export_serial(
+                    config, settings, writer, predicates, params, watermark
+                )
 
-        for row in results:
-            print("")
-            print(str(row))
-            print("")
-            writer.writerow(row)
-            row_count += 1
-
-        connection.close()
+        db.set_pending_watermark("DIVA", high_water, full_export=watermark is None)
 
         export_2_msg = f"\n\
         ==================================================================\n\
@@ -111,8 +235,6 @@ def buildcsv(date):
 
         logger.info(export_2_msg)
 
-        os.chdir(root_path)
-
         return diva_csv
 
     except Exception as e:
@@ -125,5 +247,54 @@ def buildcsv(date):
         logger.exception(db_export_excp_msg)
 
 
+def append_guids(diva_csv, guids):
+    """
+    Append the rows for a set of GUIDs to an existing export. Used to fetch the
+    Diva side of GUIDs that only changed on the other side in a delta export.
+    """
+
+    config = cfg.get_config()
+    csv_path = config["paths"]["csv_path"]
+    settings = oe.get_export_settings(config)
+
+    if len(guids) == 0:
+        return 0
+
+    row_count = 0
+    connection = None
+
+    try:
+        connection = get_connection(config)
+        cursor = oe.configure_cursor(connection.cursor(), settings)
+
+        with im.BatchWriter(
+            os.path.join(csv_path, diva_csv), fieldnames, append=True
+        ) as writer:
+
+            for rows in oe.fetch_keys(
+                cursor, sql_query, key_column, guids, "DIVA", settings
+            ):
+                writer.write(rows)
+                row_count += len(rows)
+
+        append_msg = f"DIVA DELTA EXPORT, {row_count} rows appended for {len(guids)} GUIDs changed in the other DB"
+        logger.info(append_msg)
+
+        return row_count
+
+    except Exception as e:
+        append_excp_msg = f"\n\
+        Exception raised on the Diva DB delta GUID lookup.\n\
+        Error at DB Row: {row_count}\n\
+        Error Message:  {str(e)} \n\
+        "
+
+        logger.exception(append_excp_msg)
+
+    finally:
+        if connection is not None:
+            connection.close()
+
+
 if __name__ == "__main__":
     buildcsv()
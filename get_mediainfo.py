@@ -2,11 +2,26 @@
 
 import logging
 import os
-import re
+import sys
+import time
 import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+import name_cache as nc
 
 logger = logging.getLogger(__name__)
 
+# The mediainfo fields read from METAXML, and their path below the root element.
+MEDIAINFO_FIELDS = {
+    "codec": ("VideoTrack", "Video", "Format"),
+    "framerate": ("VideoTrack", "Video", "AverageFrameRate"),
+    "v_width": ("VideoTrack", "Video", "Width"),
+    "v_height": ("VideoTrack", "Video", "Height"),
+    "duration": ("DurationInMs",),
+    "filename": ("FileName",),
+}
+FIELD_PATHS = {path: field for field, path in MEDIAINFO_FIELDS.items()}
+
 
 def get_mediainfo(df_row, metaxml):
     """
@@ -21,16 +36,17 @@ def get_mediainfo(df_row, metaxml):
     if df_row["METAXML"] != "nan" and len(metaxml) != 0:
 
         try:
-            parser = ET.XMLParser(encoding="utf-8")
-            tree = ET.ElementTree(ET.fromstring(metaxml, parser=parser))
-            root = tree.getroot()
+            fields = extract_fields(metaxml)
+
+            if fields is None:
+                fields = parse_fields(metaxml)
 
-            codec = root.find("VideoTrack/Video/Format").text
-            framerate = root.find("VideoTrack/Video/AverageFrameRate").text
-            v_width = root.find("VideoTrack/Video/Width").text
-            v_height = root.find("VideoTrack/Video/Height").text
-            duration = root.find("DurationInMs").text
-            filename = root.find("FileName").text
+            codec = fields["codec"]
+            framerate = fields["framerate"]
+            v_width = fields["v_width"]
+            v_height = fields["v_height"]
+            duration = fields["duration"]
+            filename = fields["filename"]
 
             if filename.startswith("NLE."):
                 filename = filename[4:]
@@ -121,19 +137,111 @@ def get_mediainfo(df_row, metaxml):
     return mediainfo
 
 
+def parse_fields(metaxml):
+    """
+    Read the mediainfo fields from the full element tree of METAXML.
+    """
+
+    parser = ET.XMLParser(encoding="utf-8")
+    tree = ET.ElementTree(ET.fromstring(metaxml, parser=parser))
+    root = tree.getroot()
+
+    return {
+        field: root.find("/".join(path)).text
+        for field, path in MEDIAINFO_FIELDS.items()
+    }
+
+
+class FieldScanner:
+    """
+    Collect the text of the mediainfo fields from the expat events of a METAXML document.
+    The handlers are removed once every field is found, expat then only checks the rest
+    of the document is well-formed, without building a tree.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.path = []
+        self.fields = {}
+        self.field = None
+        self.text = None
+        self.unsupported = False
+
+        parser.buffer_text = True
+        parser.ordered_attributes = True
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        parser.CharacterDataHandler = self.data
+        parser.CommentHandler = self.skip
+        parser.ProcessingInstructionHandler = self.skip
+        parser.StartDoctypeDeclHandler = self.skip
+
+    def collect(self):
+        self.fields[self.field] = self.text
+        self.field = None
+
+        if len(self.fields) == len(MEDIAINFO_FIELDS):
+            self.parser.StartElementHandler = None
+            self.parser.EndElementHandler = None
+            self.parser.CharacterDataHandler = None
+            self.parser.CommentHandler = None
+            self.parser.ProcessingInstructionHandler = None
+
+    def start(self, name, attributes):
+        if self.field is not None:
+            self.collect()
+
+        path = self.path
+        path.append(name)
+        field = FIELD_PATHS.get(tuple(path[1:]))
+
+        if field is not None and field not in self.fields:
+            self.field = field
+            self.text = None
+
+    def end(self, name):
+        if self.field is not None:
+            self.collect()
+
+        self.path.pop()
+
+    def data(self, text):
+        if self.field is not None:
+            self.text = text if self.text is None else self.text + text
+
+    def skip(self, *args):
+        self.unsupported = True
+
+
+def extract_fields(metaxml):
+    """
+    Read the mediainfo fields in one pass over METAXML, with the expat parser settings
+    of ET.XMLParser. Returns None when the fields need the full parser: a malformed
+    document, a missing field, or a comment, processing instruction or DOCTYPE before
+    the last field.
+    """
+
+    parser = expat.ParserCreate("utf-8", "}")
+    scanner = FieldScanner(parser)
+
+    try:
+        parser.Parse(metaxml, True)
+    except expat.ExpatError:
+        return None
+
+    if scanner.unsupported or len(scanner.fields) != len(MEDIAINFO_FIELDS):
+        return None
+
+    return scanner.fields
+
+
 def get_codec(df_row):
     """
     Match the codec of a file using the info in the filename.
     """
-    doc_pattern = r"(((?<![A-Z])|(?<=(-|_)))(UHD|XAVC|UHD|PRORES|XDCAM|DNX|IMX50|DV100)(?=(-|_|HQ|HD)?))"
-    codec_match = re.search(
-        doc_pattern,
-        df_row["NAME"],
-        re.IGNORECASE,
-    )
+    codec_value = nc.get_cache().get(df_row["NAME"], count=False)["codec"]
 
-    if codec_match is not None:
-        codec_value = codec_match.group(0)
+    if codec_value is not None:
         if str(codec_value) == "DNXHD":
             codec = "VC-3"
         elif str(codec_value) == "UHD":
@@ -155,12 +263,9 @@ def get_framerate(df_row):
     """
     Match the framerate of a file using the info in the filename.
     """
-    framerate_match = re.search(
-        r"(?<![0-9]|[A-Z])(23|25|29|59)\.?((98|976|97|94)(?=[IP]?))?|(?<=(-|_))(NTSC|PAL)(?=(-|_)?)|(?<=(-|_))(24P|720P)(?=(-|_)?)",
-        df_row["NAME"][6:],
-    )
-    if framerate_match is not None:
-        framerate_value = framerate_match.group(0)
+    framerate_value = nc.get_cache().get(df_row["NAME"], count=False)["framerate"]
+
+    if framerate_value is not None:
         if framerate_value in ["2398", "23976", "2997", "5994"]:
             framerate = framerate_value[0:2] + "." + framerate_value[2:]
         elif framerate_value == "NTSC":
@@ -218,5 +323,99 @@ def est_resolution(df_row, codec_value):
     return v_width, v_height
 
 
+def sample_metaxml(count, seed=1):
+    """
+    Generate METAXML documents in the layout of a MediaInfo export, about 13KB each:
+    a general track, a video track and 8 audio tracks of 25-40 fields.
+    """
+
+    import random
+
+    rand = random.Random(seed)
+    docs = []
+
+    for i in range(count):
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            "<MediaInfo>",
+            f"  <FileName>NLE.{rand.randint(0, 999999):06d}_TITLE_{i}_VM.mov</FileName>",
+            f"  <DurationInMs>{rand.randint(1000, 7200000)}</DurationInMs>",
+            "  <General>",
+        ]
+        lines += [
+            f'    <Field{j} name="f{j}">general value {rand.random()}</Field{j}>'
+            for j in range(40)
+        ]
+        lines += [
+            "  </General>",
+            "  <VideoTrack>",
+            "    <Video>",
+            f"      <Format>{rand.choice(['ProRes', 'AVC', 'XDCAM'])}</Format>",
+            f"      <AverageFrameRate>{rand.choice(['23.976', '25.000', '29.970'])}</AverageFrameRate>",
+            "      <Width>1920</Width>",
+            "      <Height>1080</Height>",
+        ]
+        lines += [f"      <VField{j}>video value {j}</VField{j}>" for j in range(40)]
+        lines += ["    </Video>", "  </VideoTrack>", "  <AudioTrack>"]
+
+        for track in range(8):
+            lines += ["    <Audio>"]
+            lines += [
+                f"      <AField{j}>audio {track} value {j}</AField{j}>"
+                for j in range(25)
+            ]
+            lines += ["    </Audio>"]
+
+        lines += ["  </AudioTrack>", "</MediaInfo>"]
+        docs.append("\n".join(lines))
+
+    return docs
+
+
+def benchmark(docs):
+    """
+    Report the documents per second of the full parser and of extract_fields(),
+    and the number of documents where the two return different fields.
+    """
+
+    results = []
+
+    for label, read_fields in [("parse", parse_fields), ("extract", extract_fields)]:
+        start = time.perf_counter()
+        for metaxml in docs:
+            read_fields(metaxml)
+        elapsed = time.perf_counter() - start
+
+        rate = int(len(docs) / elapsed) if elapsed > 0 else len(docs)
+        bench_msg = f"METAXML benchmark - {label}: {rate} docs/sec"
+        logger.info(bench_msg)
+        print(bench_msg)
+        results.append((label, rate))
+
+    mismatches = 0
+
+    for metaxml in docs:
+        fields = extract_fields(metaxml)
+        if fields is not None and fields != parse_fields(metaxml):
+            mismatches += 1
+
+    compare_msg = f"METAXML benchmark - docs: {len(docs)}, mismatches: {mismatches}"
+    logger.info(compare_msg)
+    print(compare_msg)
+
+    return results
+
+
 if __name__ == "__main__":
-    get_mediainfo()
+    # python get_mediainfo.py [<pipeline file>]
+    # Time the METAXML field extraction on generated MediaInfo documents, or on the
+    # METAXML column of a pipeline file.
+    if len(sys.argv) > 1:
+        import intermediate as im
+
+        docs = im.read_frame(sys.argv[1], columns=["METAXML"])["METAXML"].dropna()
+        docs = [str(metaxml) for metaxml in docs]
+    else:
+        docs = sample_metaxml(2000)
+
+    benchmark(docs)
@@ -6,6 +6,7 @@ import subprocess
 
 import config as cfg
 import database as db
+import schema
 
 # import xml.etree.ElementTree as ET
 
@@ -31,62 +32,62 @@ def get_proxy(proxy_total):
     tmp_checkin = config["paths"]["tmp"]
     root_path = config["paths"]["root_path"]
 
-    rows = db.fetchall_proxy("assets")
+    rows = db.iter_rows(
+        "assets", ["ROWID", "GUID", "PROXY_COPIED"], where=schema.PENDING_PROXY
+    )
 
     proxy_count = 0
 
-    for row in rows:
-        rowid = row[0]
-        guid = str(row[1])
-        proxy_copied = row[22]
-        guid_x = guid.replace("-", "")
-        guid_r = guid_x[24:]
-        proxy_fn = guid + ".mov"
-
-        """
-        Use the parts GUID to generate a list that will be used to build the path to the proxy.
-        """
-        n = 2
-        glist = [guid_r[i : i + n] for i in range(0, len(guid_r), n)]
-
-        proxy_fpath = os.path.join(proxy_path, glist[2], glist[3], guid, proxy_fn)
-
-        if (
-            proxy_count < int(proxy_total)
-            and proxy_copied == 0
-            and os.path.exists(proxy_fpath) is True
-        ):
-
-            try:
-                pcopy = file_copy(proxy_fpath, tmp_checkin)
-
-                if len(pcopy) == 0:
-                    row = db.fetchone_proxy(guid)
-                    db.update_column("assets", "proxy_copied", 1, rowid)
-                    proxy_cp_msg = f"{proxy_fn} was copied to the dalet tmp."
-                    logger.info(proxy_cp_msg)
-                    proxy_count += 1
-                else:
-                    pass
-                    proxy_err_cp_msg = (
-                        f"{proxy_fn} encountered an error on the copy to the dalet tmp."
-                    )
-                    logger.info(proxy_err_cp_msg)
-
-            except Exception as e:
-                proxy_excp_msg = f"\n\
-                Exception raised on the Proxy copy.\n\
-                Error Message:  {str(e)} \n\
-                "
-                logger.exception(proxy_excp_msg)
-                break
-        else:
-            if os.path.exists(proxy_fpath) is not True:
-                proxy_err_msg = f"Proxy path does not exist. \n\
-                {proxy_fpath}"
-                logger.error(proxy_err_msg)
-                db.update_column("assets", "proxy_copied", 2, rowid)
-                continue
+    with db.BulkUpdate("assets") as updates:
+        for row in rows:
+            rowid = row.ROWID
+            guid = str(row.GUID)
+            proxy_copied = row.PROXY_COPIED
+            guid_x = guid.replace("-", "")
+            guid_r = guid_x[24:]
+            proxy_fn = guid + ".mov"
+
+            """
+            Use the parts GUID to generate a list that will be used to build the path to the proxy.
+            """
+            n = 2
+            glist = [guid_r[i : i + n] for i in range(0, len(guid_r), n)]
+
+            proxy_fpath = os.path.join(proxy_path, glist[2], glist[3], guid, proxy_fn)
+
+            if (
+                proxy_count < int(proxy_total)
+                and proxy_copied == 0
+                and os.path.exists(proxy_fpath) is True
+            ):
+
+                try:
+                    pcopy = file_copy(proxy_fpath, tmp_checkin)
+
+                    if len(pcopy) == 0:
+                        updates.add(rowid, "proxy_copied", 1)
+                        proxy_cp_msg = f"{proxy_fn} was copied to the dalet tmp."
+                        logger.info(proxy_cp_msg)
+                        proxy_count += 1
+                    else:
+                        pass
+                        proxy_err_cp_msg = f"{proxy_fn} encountered an error on the copy to the dalet tmp."
+                        logger.info(proxy_err_cp_msg)
+
+                except Exception as e:
+                    proxy_excp_msg = f"\n\
+                    Exception raised on the Proxy copy.\n\
+                    Error Message:  {str(e)} \n\
+                    "
+                    logger.exception(proxy_excp_msg)
+                    break
+            else:
+                if os.path.exists(proxy_fpath) is not True:
+                    proxy_err_msg = f"Proxy path does not exist. \n\
+                    {proxy_fpath}"
+                    logger.error(proxy_err_msg)
+                    updates.add(rowid, "proxy_copied", 2)
+                    continue
 
     os.chdir(root_path)
     proxy_complete_msg = f"PROXY COPY COMPLETE. \n\
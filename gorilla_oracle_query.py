@@ -1,14 +1,20 @@
 #! /usr/bin/env python3
 
-import csv
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from time import localtime, strftime
 
 import cx_Oracle
 import yaml
 
 import config as cfg
+import csv_clean as csv_c
+import csv_parse as csv_p
+import database as db
+import intermediate as im
+import oracle_export as oe
+import oracle_standin as ora_standin
 
 # cx_Oracle.init_oracle_client(
 #     lib_dir="/opt/oracle/instantclient_19_8")
@@ -37,6 +43,38 @@ sql_query = """
        --ROWNUM < 1000
         """
 
+# Phase one of a two-phase export, the same rows without the METAXML CLOB.
+narrow_sql_query = """
+        SELECT
+            essence.guid,
+            essence.name,
+            essence.filesize,
+            essence.datatapeid,
+            essencedetail.objectnm,
+            essencedetail.contentlength,
+            essencedetail.sourcecreatedt,
+            essencedetail.createdt,
+            essencedetail.lastmdydt,
+            essencedetail.timecodein,
+            essencedetail.timecodeout,
+            essencedetail.onairid,
+            filemapping.ruri,
+            NULL AS metaxml
+        FROM ESSENCE
+        INNER JOIN ESSENCEDETAIL ON essence.guid=essencedetail.guid
+        INNER JOIN FILEMAPPING ON filemapping.guid=essence.guid
+        WHERE ESSENCE.ISGARBAGE=0
+        """
+
+# Phase two, METAXML for the GUIDs that survive the merge and parse.
+metaxml_query = """
+        SELECT
+            mediainfo.guid,
+            mediainfo.metaxml
+        FROM MEDIAINFO
+        WHERE mediainfo.metaxml IS NOT NULL
+        """
+
 fieldnames = [
     "GUID",
     "NAME",
@@ -54,45 +92,291 @@ fieldnames = [
     "METAXML",
 ]
 
+delta_predicate = "AND essencedetail.lastmdydt > :watermark"
+
+watermark_columns = ["LASTMDYDT"]
+
+key_column = "essence.guid"
+
+# Ordered key of the resumable export pages, a column of the export query.
+page_key = "GUID"
+
+metaxml_index = fieldnames.index("METAXML")
+
 logger = logging.getLogger(__name__)
 
 
-def buildcsv(date):
+def output_type_handler(cursor, name, default_type, size, precision, scale):
     """
-    Creates a CSV export from the Oracle DB for the Gorilla MAM. Uses the sql_query and fieldnames list to define the required fields.
+    Fetch the METAXML CLOB as a string in the same fetch batch as the rest of the row.
+    Without the handler each row returns a LOB locator, and reading it is another round trip.
     """
+    if default_type == cx_Oracle.DB_TYPE_CLOB:
+        return cursor.var(cx_Oracle.DB_TYPE_LONG, arraysize=cursor.arraysize)
+    if default_type == cx_Oracle.DB_TYPE_NCLOB:
+        return cursor.var(cx_Oracle.DB_TYPE_LONG_NVARCHAR, arraysize=cursor.arraysize)
 
-    config = cfg.get_config()
 
-    root_path = config["paths"]["root_path"]
-    csv_path = config["paths"]["csv_path"]
+def two_phase(config):
+    """
+    oracle-export: two_phase in config.yaml, export without METAXML and fetch it
+    after the parse for the video rows only (attach_metaxml).
+    """
+    return cfg.get_setting(config, "oracle-export", "two_phase", False) is True
+
+
+def export_query(config):
+    if two_phase(config):
+        return narrow_sql_query
+    return sql_query
+
+
+def name_filter(config):
+    """
+    With oracle-export: pushdown_filter in config.yaml, return the csv_parse name filter
+    as predicates on essence.name, so the rows dropped by the parse are not exported.
+    """
+
+    if cfg.get_setting(config, "oracle-export", "pushdown_filter", False) is not True:
+        return []
+
+    return csv_p.sql_name_filter("essence.name")
+
+
+def get_metaxml_limit(config):
+    """
+    oracle-export: metaxml_max_bytes in config.yaml, the largest METAXML document
+    written to the export (default 10MB).
+    """
+    return int(cfg.get_setting(config, "oracle-export", "metaxml_max_bytes", 10485760))
+
+
+def check_metaxml(rows, max_bytes, index=metaxml_index):
+    """
+    Log the GUID and size of each METAXML document over max_bytes, and export the row
+    with an empty METAXML so the document is not written to the export file.
+    index is the position of METAXML in the rows, the GUID is the first column.
+    """
+
+    checked = []
+
+    for row in rows:
+        metaxml = row[index]
+
+        # A character is at most 4 bytes in UTF-8, a shorter document cannot be over the limit.
+        if metaxml is not None and len(metaxml) * 4 > max_bytes:
+            size = len(metaxml.encode("utf-8"))
+
+            if size > max_bytes:
+                oversize_msg = f"METAXML for GUID {row[0]} is {size} bytes, over the metaxml_max_bytes limit of {max_bytes}. METAXML not exported."
+                logger.warning(oversize_msg)
+                row = row[:index] + (None,) + row[index + 1 :]
+
+        checked.append(row)
+
+    return checked
+
+
+def get_connection(config):
+    """
+    Open a connection to the Gorilla Oracle DB, or to the local stand-in if
+    oracle-export: standin_db is set in config.yaml. CLOBs are fetched as strings.
+    """
+    if cfg.get_setting(config, "oracle-export", "standin_db") is not None:
+        connection = ora_standin.connect(config)
+    else:
+        db_user = config["oracle-db-gor"]["user"]
+        db_pass = config["oracle-db-gor"]["pass"]
+        db_url = config["oracle-db-gor"]["url"]
+
+        connection = cx_Oracle.connect(db_user, db_pass, db_url)
+
+    connection.outputtypehandler = output_type_handler
+
+    return connection
+
+
+def get_session_pool(config, size):
+    """
+    Create a session pool with one session per export partition.
+    """
+    if cfg.get_setting(config, "oracle-export", "standin_db") is not None:
+        return ora_standin.session_pool(config)
 
     db_user = config["oracle-db-gor"]["user"]
     db_pass = config["oracle-db-gor"]["pass"]
     db_url = config["oracle-db-gor"]["url"]
 
-    os.chdir(csv_path)
+    return cx_Oracle.SessionPool(
+        user=db_user,
+        password=db_pass,
+        dsn=db_url,
+        min=size,
+        max=size,
+        increment=0,
+        threaded=True,
+    )
+
+
+def fingerprint(config):
+    """
+    Probe the Gorilla export query, see oe.probe().
+    """
+
+    sql = oe.add_predicates(export_query(config), name_filter(config))
+
+    return oe.probe(get_connection, config, "GORILLA", sql, "GUID", watermark_columns)
+
+
+def export_predicates(config, delta):
+    """
+    Return the extra predicates and bind variables of the export query, and the
+    watermark of a delta export (None for a full export).
+    """
+
+    predicates = name_filter(config)
+    params = {}
+
+    if len(predicates) != 0:
+        pushdown_msg = f"GORILLA EXPORT, csv_parse name filter pushed down to the query"
+        logger.info(pushdown_msg)
+
+    watermark = db.get_watermark("GORILLA") if delta is True else None
+
+    if watermark is not None:
+        delta_msg = f"GORILLA DELTA EXPORT, rows changed after: {watermark}"
+        logger.info(delta_msg)
+        predicates.append(delta_predicate)
+        params["watermark"] = watermark
+
+    return predicates, params, watermark
+
+
+def export_serial(config, settings, writer, predicates, params, watermark, max_bytes):
+    """
+    Run the export query on a single cursor, and write the batches to writer.
+    Returns the row count and high-water mark.
+    """
+
+    row_count = 0
+    watermark_index = [fieldnames.index(col) for col in watermark_columns]
+    high_water = watermark
+
+    connection = get_connection(config)
+
+    try:
+        cursor = oe.configure_cursor(connection.cursor(), settings)
+        cursor.execute(oe.add_predicates(export_query(config), predicates), params)
+
+        for rows in oe.fetch_batches(cursor, "GORILLA", settings):
+            rows = check_metaxml(rows, max_bytes)
+            writer.write(rows)
+            row_count += len(rows)
+            high_water = oe.max_watermark(rows, watermark_index, high_water)
+
+    finally:
+        connection.close()
+
+    return row_count, high_water
+
+
+def buildframe():
+    """
+    Full export of the Gorilla DB into a dataframe for the fused pipeline, typed the
+    same as a parquet or arrow export file. Returns None on failure.
+    """
+
+    config = cfg.get_config()
+    settings = oe.get_export_settings(config)
+    max_bytes = get_metaxml_limit(config)
 
     try:
         row_count = 0
-        connection = cx_Oracle.connect(db_user, db_pass, db_url)
-        cursor = connection.cursor()
-        results = cursor.execute(sql_query)
-        gor_csv = date + "_" + "gorilla_db_export.csv"
+        predicates, params, watermark = export_predicates(config, False)
+
+        export_1_msg = f"START GORILLA DB EXPORT (fused)"
+        logger.info(export_1_msg)
+
+        with im.FrameBuilder(fieldnames) as builder:
+            row_count, high_water = export_serial(
+                config, settings, builder, predicates, params, watermark, max_bytes
+            )
+
+        db.set_pending_watermark("GORILLA", high_water, full_export=True)
+
+        export_2_msg = f"GORILLA DB EXPORT Complete, Rows Exported: {row_count}"
+        logger.info(export_2_msg)
+
+        return builder.frame()
+
+    except Exception as e:
+        db_export_excp_msg = f"\n\
+        Exception raised on the Gorilla DB Export.\n\
+        Error at DB Row: {row_count}\n\
+        Error Message:  {str(e)} \n\
+        "
+
+        logger.exception(db_export_excp_msg)
+
+
+def buildcsv(date, delta=False, partitions=None):
+    """
+    Creates a CSV export from the Oracle DB for the Gorilla MAM. Uses the sql_query and fieldnames list to define the required fields.
+    With delta=True only the rows changed since the last watermark are exported,
+    a full export is run when no watermark has been stored yet.
+    With more than one partition (oracle-export: partitions in config.yaml) the query is
+    split into ORA_HASH buckets of the GUID, exported in parallel on a session pool.
+    With oracle-export: resumable the export is paged by GUID with a checkpoint after
+    each page, and an export that stopped partway continues from its checkpoint.
+    """
+
+    config = cfg.get_config()
+
+    csv_path = config["paths"]["csv_path"]
+
+    settings = oe.get_export_settings(config)
+    max_bytes = get_metaxml_limit(config)
 
-        writer = csv.writer(open(gor_csv, "w", newline=""))
+    if partitions is None:
+        partitions = int(cfg.get_setting(config, "oracle-export", "partitions", 1))
+
+    try:
+        row_count = 0
+        predicates, params, watermark = export_predicates(config, delta)
+
+        gor_csv = im.stage_file(date, "gorilla_db_export", config)
 
         export_1_msg = f"START GORILLA DB EXPORT"
         logger.info(export_1_msg)
 
-        writer.writerow(fieldnames)
+        if oe.resumable(config):
+            watermark_index = [fieldnames.index(col) for col in watermark_columns]
+            gor_csv, row_count, high_water = oe.export_resumable(
+                get_connection,
+                config,
+                settings,
+                "GORILLA",
+                oe.add_predicates(export_query(config), predicates),
+                params,
+                page_key,
+                gor_csv,
+                fieldnames,
+                watermark_index,
+                watermark,
+                check_rows=lambda rows: check_metaxml(rows, max_bytes),
+            )
+        elif partitions > 1:
+            row_count, high_water = export_partitions(
+                config, settings, gor_csv, predicates, params, partitions, max_bytes
+            )
+            high_water = watermark if high_water is None else high_water
+        else:
+            with im.BatchWriter(os.path.join(csv_path, gor_csv), fieldnames) as writer:
+                row_count, high_water = export_serial(
+                    config, settings, writer, predicates, params, watermark, max_bytes
+                )
 
-        for row in results:
-            print("")
-            print(str(row))
-            print("")
-            writer.writerow(row)
-            row_count += 1
+        db.set_pending_watermark("GORILLA", high_water, full_export=watermark is None)
 
         export_2_msg = f"\n\
         ==================================================================\n\
@@ -104,10 +388,6 @@ def buildcsv(date):
 
         logger.info(export_2_msg)
 
-        connection.close()
-
-        os.chdir(root_path)
-
         return gor_csv
 
     except Exception as e:
@@ -121,5 +401,231 @@ def buildcsv(date):
         logger.exception(db_export_excp_msg)
 
 
+def export_partitions(
+    config, settings, gor_csv, predicates, params, partitions, max_bytes
+):
+    """
+    Run the export query as N ORA_HASH buckets of the GUID, one worker and pool session
+    per bucket. Each worker writes its own shard file, the shards are then
+    concatenated into the export file. If a worker fails, the shard files are removed
+    and the error is raised. Returns the row count and high-water mark.
+    """
+
+    csv_path = config["paths"]["csv_path"]
+    export_path = os.path.join(csv_path, gor_csv)
+    root, ext = os.path.splitext(export_path)
+    shard_paths = [f"{root}_part{i:02d}{ext}" for i in range(partitions)]
+
+    pool = get_session_pool(config, partitions)
+    query = oe.add_predicates(
+        export_query(config),
+        predicates + [f"AND ORA_HASH(essence.guid, {partitions - 1}) = :bucket"],
+    )
+
+    try:
+        with ThreadPoolExecutor(max_workers=partitions) as executor:
+            futures = [
+                executor.submit(
+                    export_shard,
+                    pool,
+                    settings,
+                    query,
+                    dict(params, bucket=bucket),
+                    shard_paths[bucket],
+                    max_bytes,
+                )
+                for bucket in range(partitions)
+            ]
+            results = [future.result() for future in futures]
+
+        im.concat_files(shard_paths, export_path, fieldnames)
+
+    except Exception:
+        remove_shards(shard_paths + [export_path])
+        raise
+
+    finally:
+        pool.close()
+
+    row_count = sum(result[0] for result in results)
+    high_water = max(
+        (result[1] for result in results if result[1] is not None), default=None
+    )
+
+    partition_msg = f"GORILLA DB EXPORT, {partitions} partitions: {[result[0] for result in results]} rows"
+    logger.info(partition_msg)
+
+    return row_count, high_water
+
+
+def export_shard(pool, settings, query, params, shard_path, max_bytes):
+    """
+    Export one partition of the Gorilla query to a shard file, on a session from the pool.
+    """
+
+    row_count = 0
+    high_water = None
+    source = f"GORILLA PARTITION {params['bucket']}"
+    watermark_index = [fieldnames.index(col) for col in watermark_columns]
+
+    connection = pool.acquire()
+
+    try:
+        connection.outputtypehandler = output_type_handler
+        cursor = oe.configure_cursor(connection.cursor(), settings)
+        cursor.execute(query, params)
+
+        with im.BatchWriter(shard_path, fieldnames, header=False) as writer:
+            for rows in oe.fetch_batches(cursor, source, settings):
+                rows = check_metaxml(rows, max_bytes)
+                writer.write(rows)
+                row_count += len(rows)
+                high_water = oe.max_watermark(rows, watermark_index, high_water)
+
+    finally:
+        pool.release(connection)
+
+    return row_count, high_water
+
+
+def remove_shards(paths):
+    """
+    Remove the files of a failed partitioned export, with their debug CSV copies.
+    """
+
+    for path in paths + [im.csv_copy(path) for path in paths]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def append_guids(gor_csv, guids):
+    """
+    Append the rows for a set of GUIDs to an existing export. Used to fetch the
+    Gorilla side of GUIDs that only changed on the other side in a delta export.
+    """
+
+    config = cfg.get_config()
+    csv_path = config["paths"]["csv_path"]
+    settings = oe.get_export_settings(config)
+    max_bytes = get_metaxml_limit(config)
+
+    if len(guids) == 0:
+        return 0
+
+    row_count = 0
+    connection = None
+
+    try:
+        connection = get_connection(config)
+        cursor = oe.configure_cursor(connection.cursor(), settings)
+
+        with im.BatchWriter(
+            os.path.join(csv_path, gor_csv), fieldnames, append=True
+        ) as writer:
+
+            for rows in oe.fetch_keys(
+                cursor,
+                oe.add_predicates(export_query(config), name_filter(config)),
+                key_column,
+                guids,
+                "GORILLA",
+                settings,
+            ):
+                rows = check_metaxml(rows, max_bytes)
+                writer.write(rows)
+                row_count += len(rows)
+
+        append_msg = f"GORILLA DELTA EXPORT, {row_count} rows appended for {len(guids)} GUIDs changed in the other DB"
+        logger.info(append_msg)
+
+        return row_count
+
+    except Exception as e:
+        append_excp_msg = f"\n\
+        Exception raised on the Gorilla DB delta GUID lookup.\n\
+        Error at DB Row: {row_count}\n\
+        Error Message:  {str(e)} \n\
+        "
+
+        logger.exception(append_excp_msg)
+
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def fetch_metaxml(guids):
+    """
+    Fetch the METAXML documents for a set of GUIDs in batched IN lookups.
+    Returns a dict of GUID: METAXML.
+    """
+
+    config = cfg.get_config()
+    settings = oe.get_export_settings(config)
+    max_bytes = get_metaxml_limit(config)
+    documents = {}
+
+    connection = get_connection(config)
+
+    try:
+        cursor = oe.configure_cursor(connection.cursor(), settings)
+
+        for rows in oe.fetch_keys(
+            cursor, metaxml_query, "mediainfo.guid", guids, "GORILLA METAXML", settings
+        ):
+            for guid, metaxml in check_metaxml(rows, max_bytes, index=1):
+                documents[guid] = metaxml
+
+    finally:
+        connection.close()
+
+    return documents
+
+
+def add_metaxml(df):
+    """
+    Fetch METAXML for the rows of a parsed dataframe that csv_clean classifies as video
+    (the only rows that read it), and set it in the METAXML column.
+    Returns the number of documents fetched.
+    """
+
+    video = (df["_merge"] == "both") & df["NAME"].map(csv_c.is_video)
+    documents = fetch_metaxml(set(df.loc[video, "GUID"].dropna()))
+
+    df.loc[video, "METAXML"] = df.loc[video, "GUID"].map(documents)
+
+    metaxml_bytes = sum(len(metaxml or "") for metaxml in documents.values())
+    attach_msg = f"GORILLA METAXML fetched for {len(documents)} of {video.sum()} video rows, {len(df)} parsed rows. {metaxml_bytes} characters."
+    logger.info(attach_msg)
+
+    return len(documents)
+
+
+def attach_metaxml(parsed_csv):
+    """
+    Phase two of a two-phase export. Add METAXML to the video rows of the parsed file
+    (see add_metaxml). Returns the number of documents, or None on failure.
+    """
+
+    config = cfg.get_config()
+    csv_path = config["paths"]["csv_path"]
+    parsed_path = os.path.join(csv_path, parsed_csv)
+
+    try:
+        df = im.read_frame(parsed_path, header=0, dtype=str)
+        count = add_metaxml(df)
+        im.write_frame(df, parsed_path)
+
+        return count
+
+    except Exception as e:
+        attach_excp_msg = f"\n\
+        Exception raised on the Gorilla METAXML fetch.\n\
+        Error Message:  {str(e)} \n\
+        "
+
+        logger.exception(attach_excp_msg)
+
+
 if __name__ == "__main__":
     buildcsv()
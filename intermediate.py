@@ -0,0 +1,420 @@
+#! /usr/bin/env python3
+
+import csv
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import config as cfg
+
+logger = logging.getLogger(__name__)
+
+FILE_EXTENSIONS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+# Column types of the columnar formats, every other column is stored as a string.
+FLOAT_COLUMNS = ["FILESIZE", "CONTENTLENGTH", "AO_ID", "AO_OBJECT_SIZE"]
+INT_COLUMNS = ["ROWID", "XML_CREATED", "PROXY_COPIED"]
+
+
+def get_format(config=None):
+    """
+    Return the intermediate file format set with pipeline: intermediate_format
+    in config.yaml: csv (default), parquet or arrow (Arrow IPC).
+    """
+
+    if config is None:
+        config = cfg.get_config()
+
+    fmt = cfg.get_setting(config, "pipeline", "intermediate_format", "csv")
+
+    if fmt not in FILE_EXTENSIONS:
+        raise ValueError(f"Unknown intermediate_format: {fmt}")
+
+    return fmt
+
+
+def debug_csv(config=None):
+    """
+    pipeline: debug_csv writes a CSV copy next to each parquet or arrow file.
+    """
+
+    if config is None:
+        config = cfg.get_config()
+
+    return cfg.get_setting(config, "pipeline", "debug_csv", False) is True
+
+
+def stage_file(date, stage, config=None):
+    """
+    Return the file name of a pipeline stage, with the extension of the intermediate format.
+    """
+    return f"{date}_{stage}{FILE_EXTENSIONS[get_format(config)]}"
+
+
+def file_format(path):
+    """
+    Return the format of a file from its extension, files from older runs are csv.
+    """
+
+    ext = os.path.splitext(str(path))[1]
+
+    for fmt, fmt_ext in FILE_EXTENSIONS.items():
+        if ext == fmt_ext:
+            return fmt
+
+    return "csv"
+
+
+def csv_copy(path):
+    return os.path.splitext(str(path))[0] + ".csv"
+
+
+def import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "pyarrow is required for the parquet and arrow intermediate formats"
+        ) from e
+
+    return pa
+
+
+def arrow_schema(columns):
+    """
+    Build the explicit arrow schema for a list of column names.
+    """
+
+    pa = import_pyarrow()
+    fields = []
+
+    for col in columns:
+        if col in FLOAT_COLUMNS:
+            fields.append(pa.field(col, pa.float64()))
+        elif col in INT_COLUMNS:
+            fields.append(pa.field(col, pa.int64()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+
+    return pa.schema(fields)
+
+
+def to_str(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return str(value)
+
+
+def arrow_array(values, field):
+    """
+    Convert a column of values to the arrow type of the schema field.
+    String columns are converted with str(), the same text the csv writer produces.
+    """
+
+    pa = import_pyarrow()
+
+    if pa.types.is_string(field.type):
+        return pa.array([to_str(value) for value in values], type=field.type)
+
+    numbers = pd.to_numeric(pd.Series(list(values), dtype=object), errors="coerce")
+
+    if pa.types.is_integer(field.type):
+        return pa.array(numbers.astype("Int64"), type=field.type, from_pandas=True)
+
+    return pa.array(numbers.astype(float), type=field.type, from_pandas=True)
+
+
+def rows_to_table(rows, schema):
+    pa = import_pyarrow()
+    columns = list(zip(*rows)) if len(rows) != 0 else [[] for field in schema]
+    arrays = [arrow_array(values, field) for values, field in zip(columns, schema)]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def frame_to_table(df, index=False):
+    pa = import_pyarrow()
+
+    if index is True:
+        df = df.reset_index()
+
+    schema = arrow_schema(df.columns)
+    arrays = [arrow_array(df[field.name], field) for field in schema]
+
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def open_table_writer(path, schema):
+    pa = import_pyarrow()
+
+    if file_format(path) == "parquet":
+        return pa.parquet.ParquetWriter(path, schema)
+
+    return pa.ipc.new_file(path, schema)
+
+
+def read_table(path, columns=None):
+    pa = import_pyarrow()
+
+    if file_format(path) == "parquet":
+        return pa.parquet.read_table(path, columns=columns)
+
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+    if columns is not None:
+        table = table.select(columns)
+
+    return table
+
+
+class BatchWriter:
+    """
+    Write batches of row tuples to an export file in the intermediate format.
+    With append=True the rows are added to an existing file. A parquet or arrow file
+    cannot be appended in place, so it is rewritten with the new rows added at the end.
+    offset truncates an existing csv file to a checkpoint offset before appending.
+    """
+
+    def __init__(self, path, fieldnames, append=False, header=True, offset=None):
+        self.path = str(path)
+        self.fieldnames = fieldnames
+        self.fmt = file_format(self.path)
+        self.debug_writer = None
+
+        if self.fmt == "csv":
+            if offset is not None:
+                with open(self.path, "r+b") as f:
+                    f.truncate(offset)
+            self.file = open(self.path, "a" if append else "w", newline="")
+            self.writer = csv.writer(self.file)
+            if header is True and append is not True:
+                self.writer.writerow(fieldnames)
+            return
+
+        self.schema = arrow_schema(fieldnames)
+        root, ext = os.path.splitext(self.path)
+        self.tmp_path = root + "_tmp" + ext
+        self.writer = open_table_writer(self.tmp_path, self.schema)
+
+        if append is True and os.path.exists(self.path):
+            self.writer.write_table(read_table(self.path))
+
+        if debug_csv():
+            self.debug_writer = BatchWriter(
+                csv_copy(self.path), fieldnames, append, header
+            )
+
+    def write(self, rows):
+        if self.fmt == "csv":
+            self.writer.writerows(rows)
+        else:
+            self.writer.write_table(rows_to_table(rows, self.schema))
+
+        if self.debug_writer is not None:
+            self.debug_writer.write(rows)
+
+    def flush(self):
+        """
+        Flush the rows written so far to disk, returns the file offset (csv only).
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self, discard=False):
+        """
+        Close the file. A parquet or arrow file replaces the previous file, or with
+        discard=True it is removed and the previous file is kept as it was.
+        """
+        if self.fmt == "csv":
+            self.file.close()
+        else:
+            self.writer.close()
+            if discard is True:
+                os.remove(self.tmp_path)
+            else:
+                os.replace(self.tmp_path, self.path)
+
+        if self.debug_writer is not None:
+            self.debug_writer.close(discard)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+
+
+class FrameBuilder:
+    """
+    Collect batches of row tuples into a dataframe, with the same write() and close()
+    as BatchWriter. Used by the fused pipeline instead of an export file.
+    """
+
+    def __init__(self, fieldnames):
+        self.fieldnames = fieldnames
+        self.rows = []
+
+    def write(self, rows):
+        self.rows.extend(rows)
+
+    def close(self):
+        return
+
+    def frame(self):
+        df = pd.DataFrame.from_records(self.rows, columns=self.fieldnames)
+        self.rows = []
+        return typed_frame(df)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def typed_frame(df):
+    """
+    Apply the column types of the columnar formats to a dataframe, the same frame
+    read_frame() returns for a parquet or arrow file.
+    """
+
+    for col in df.columns:
+        if col in FLOAT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+        elif col in INT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        else:
+            df[col] = pd.Series(
+                [to_str(value) for value in df[col]], index=df.index, dtype=object
+            )
+            df[col] = df[col].where(df[col].notna(), np.nan)
+
+    return df
+
+
+def debug_tap(df, date, stage, index=False, **csv_kwargs):
+    """
+    With pipeline: debug_csv, write a stage of the fused pipeline to its csv file.
+    """
+
+    if debug_csv():
+        config = cfg.get_config()
+        path = os.path.join(config["paths"]["csv_path"], f"{date}_{stage}.csv")
+        df.to_csv(path, index=index, **csv_kwargs)
+
+
+def concat_files(paths, dest_path, fieldnames):
+    """
+    Concatenate export shards written without a header into a single export file.
+    """
+
+    if file_format(dest_path) == "csv":
+        with open(dest_path, "w", newline="") as dest:
+            csv.writer(dest).writerow(fieldnames)
+            for path in paths:
+                with open(path, "r", newline="") as shard:
+                    shutil.copyfileobj(shard, dest)
+                os.remove(path)
+        return
+
+    writer = open_table_writer(dest_path, arrow_schema(fieldnames))
+
+    for path in paths:
+        writer.write_table(read_table(path))
+        os.remove(path)
+
+    writer.close()
+
+    if debug_csv():
+        concat_files(
+            [csv_copy(path) for path in paths], csv_copy(dest_path), fieldnames
+        )
+
+
+def read_frame(path, columns=None, **csv_kwargs):
+    """
+    Read a pipeline file into a dataframe, only the listed columns are read.
+    csv_kwargs are passed to pd.read_csv for csv files.
+    Nulls in the string columns of parquet and arrow files are returned as NaN, the same as read_csv.
+    """
+
+    if file_format(path) == "csv":
+        return pd.read_csv(path, usecols=columns, **csv_kwargs)
+
+    df = read_table(path, columns).to_pandas()
+
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+
+    return df
+
+
+def read_columns(path):
+    """
+    Return the column names of a pipeline file without reading its rows.
+    """
+
+    if file_format(path) == "csv":
+        return list(pd.read_csv(path, nrows=0, encoding="utf-8-sig").columns)
+
+    pa = import_pyarrow()
+
+    if file_format(path) == "parquet":
+        return pa.parquet.read_schema(path).names
+
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).schema.names
+
+
+def iter_frames(path, chunk_rows):
+    """
+    Read a pipeline file in dataframes of chunk_rows rows. Every value is read as the
+    text written to a csv file, nulls as None.
+    """
+
+    if file_format(path) == "csv":
+        for chunk in pd.read_csv(
+            path, dtype=str, chunksize=chunk_rows, encoding="utf-8-sig"
+        ):
+            yield chunk.astype(object).where(chunk.notna(), None)
+        return
+
+    pa = import_pyarrow()
+
+    if file_format(path) == "parquet":
+        batches = pa.parquet.ParquetFile(path).iter_batches(batch_size=chunk_rows)
+    else:
+        batches = read_table(path).to_batches(max_chunksize=chunk_rows)
+
+    for batch in batches:
+        df = batch.to_pandas()
+        yield pd.DataFrame(
+            {col: [to_str(value) for value in df[col]] for col in df.columns},
+            dtype=object,
+        )
+
+
+def write_frame(df, path, index=False, **csv_kwargs):
+    """
+    Write a dataframe to a pipeline file. csv_kwargs are passed to df.to_csv for csv files.
+    """
+
+    if file_format(path) == "csv":
+        df.to_csv(path, index=index, **csv_kwargs)
+        return
+
+    table = frame_to_table(df, index)
+    writer = open_table_writer(path, table.schema)
+    writer.write_table(table)
+    writer.close()
+
+    if debug_csv():
+        df.to_csv(csv_copy(path), index=index, **csv_kwargs)
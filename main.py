@@ -3,6 +3,9 @@
 import logging
 import logging.config
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from logging.handlers import TimedRotatingFileHandler
 from time import localtime, strftime
 
@@ -13,10 +16,13 @@ import create_xml as xml_c
 import crosscheck_assets as cca
 import csv_clean as csv_c
 import csv_parse as csv_p
+import database as db
 import diva_oracle_query as d_query
 import get_proxy as gp
 import gorilla_oracle_query as g_query
+import intermediate as im
 import merge_dbs as mdb
+import oracle_export as oe
 import update_db as udb
 import user_input as ui
 
@@ -77,20 +83,10 @@ def main():
     ) = ui.get_user_input()
 
     if getnew_db is True and crosscheck_db is False and crosscheck_assets is False:
-        gor_csv = g_query.buildcsv(date)
-        diva_csv = d_query.buildcsv(date)
-        merged_csv = mdb.pandas_merge(date, diva_csv, gor_csv)
-        parsed_csv = csv_p.db_parse(date, merged_csv)
-        cleaned_csv, tablename = csv_c.csv_clean(date)
-        udb.update_db(date, tablename)
+        build_db(date)
         final_steps(xml_total, proxy_total)
     elif getnew_db is True and crosscheck_db is True and crosscheck_assets is True:
-        gor_csv = g_query.buildcsv(date)
-        diva_csv = d_query.buildcsv(date)
-        merged_csv = mdb.pandas_merge(date, diva_csv, gor_csv)
-        parsed_csv = csv_p.db_parse(date, merged_csv)
-        cleaned_csv, tablename = csv_c.csv_clean(date)
-        udb.update_db(date, tablename)
+        build_db(date)
         cca.crosscheck_db(tablename)
         cca.crosscheck_assets(tablename)
         final_steps(xml_total, proxy_total)
@@ -108,6 +104,252 @@ def main():
         final_steps(xml_total, proxy_total)
 
 
+def export_sources(date, delta=False, reuse=None, fused=False):
+    """
+    Run the Gorilla and DIVA exports at the same time in a thread pool.
+    The two queries hit different Oracle servers and spend most of their time
+    waiting on the network, so the export stage takes about as long as the slower query.
+    reuse maps a source to a previous export file used instead of exporting it again.
+    With fused=True each source is exported into a dataframe instead of a file.
+    Returns (gor_csv, diva_csv), or None if either export failed.
+    """
+
+    if fused is True:
+        sources = {
+            "GORILLA": g_query.buildframe,
+            "DIVA": d_query.buildframe,
+        }
+    else:
+        sources = {
+            "GORILLA": partial(g_query.buildcsv, date, delta),
+            "DIVA": partial(d_query.buildcsv, date, delta),
+        }
+    exports = dict(reuse or {})
+
+    for source, export_file in exports.items():
+        sources.pop(source)
+        reuse_msg = f"{source} unchanged since the last export, reusing: {export_file}"
+        logger.info(reuse_msg)
+
+    export_start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+        futures = {
+            executor.submit(export): source for source, export in sources.items()
+        }
+
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                exports[source] = future.result()
+            except Exception as e:
+                export_excp_msg = f"\n\
+                Exception raised on the {source} DB Export.\n\
+                Error Message:  {str(e)} \n\
+                "
+                logger.exception(export_excp_msg)
+                exports[source] = None
+
+    failed = [source for source, export in exports.items() if export is None]
+
+    if len(failed) != 0:
+        export_fail_msg = (
+            f"DB export failed for: {', '.join(failed)}. The existing DB will be used."
+        )
+        logger.error(export_fail_msg)
+        return None
+
+    export_time_msg = f"GORILLA and DIVA exports completed in {time.perf_counter() - export_start:.1f}s"
+    logger.info(export_time_msg)
+
+    return exports["GORILLA"], exports["DIVA"]
+
+
+def probe_sources(config):
+    """
+    Run the probe query of each source, and compare it with the fingerprint stored
+    from the last export loaded into the DB.
+    Returns the new fingerprints, and the previous export file (or None) of each unchanged source.
+    """
+
+    fingerprints = {
+        "GORILLA": g_query.fingerprint(config),
+        "DIVA": d_query.fingerprint(config),
+    }
+    unchanged = {}
+
+    for source, fingerprint in fingerprints.items():
+        previous = db.get_fingerprint(source)
+
+        if (
+            fingerprint is not None
+            and previous is not None
+            and previous[0] == fingerprint
+        ):
+            unchanged[source] = previous[1]
+
+    return fingerprints, unchanged
+
+
+def complete_delta(gor_csv, diva_csv):
+    """
+    A delta export only holds the rows that changed in each DB. For a GUID that
+    changed on one side only, fetch the rows from the other side so the merge can pair them.
+    """
+
+    config = cfg.get_config()
+    csv_path = config["paths"]["csv_path"]
+
+    gor_guids = oe.read_keys(os.path.join(csv_path, gor_csv), "GUID")
+    diva_guids = oe.read_keys(os.path.join(csv_path, diva_csv), "GUID")
+
+    gor_count = g_query.append_guids(gor_csv, diva_guids - gor_guids)
+    diva_count = d_query.append_guids(diva_csv, gor_guids - diva_guids)
+
+    return gor_count is not None and diva_count is not None
+
+
+def build_db(date):
+    """
+    Export both DBs, then merge, parse and clean the results into the assets table.
+    In delta mode only the changed rows are exported, and the cleaned batch is
+    upserted into the existing table instead of replacing it.
+    In two-phase mode METAXML is fetched after the parse, for the video rows only.
+    With oracle-export: skip_unchanged each source is probed first. If neither changed
+    the existing DB is kept, in a full export an unchanged source reuses its last export file.
+    With pipeline: fused a full export runs in memory, see build_fused.
+    """
+
+    config = cfg.get_config()
+    delta = oe.get_export_mode(config) == "delta"
+    fused = (
+        cfg.get_setting(config, "pipeline", "fused", False) is True
+        and delta is not True
+    )
+    fingerprints = {}
+    reuse = {}
+
+    if cfg.get_setting(config, "oracle-export", "skip_unchanged", False) is True:
+        fingerprints, unchanged = probe_sources(config)
+
+        if len(unchanged) == len(fingerprints):
+            unchanged_msg = f"GORILLA and DIVA unchanged since the last export, the existing DB is used."
+            logger.info(unchanged_msg)
+            return
+
+        if delta is not True and fused is not True:
+            csv_path = config["paths"]["csv_path"]
+            reuse = {
+                source: export_file
+                for source, export_file in unchanged.items()
+                if export_file is not None
+                and os.path.exists(os.path.join(csv_path, export_file))
+            }
+
+    exports = export_sources(date, delta, reuse, fused)
+
+    if exports is None:
+        return
+
+    gor_csv, diva_csv = exports
+
+    for source, export_file in zip(["GORILLA", "DIVA"], exports):
+        if fingerprints.get(source) is not None and source not in reuse:
+            db.set_pending_fingerprint(
+                source,
+                fingerprints[source],
+                None if delta or fused else export_file,
+            )
+
+    if fused is True:
+        if build_fused(date, gor_csv, diva_csv) is True:
+            db.commit_watermarks()
+            db.commit_fingerprints()
+        return
+
+    if delta is True and complete_delta(gor_csv, diva_csv) is not True:
+        return
+
+    merged_csv = mdb.pandas_merge(date, diva_csv, gor_csv)
+    parsed_csv = csv_p.db_parse(date, merged_csv)
+
+    if g_query.two_phase(config) and g_query.attach_metaxml(parsed_csv) is None:
+        return
+
+    clean_result = csv_c.csv_clean(date, delta=delta)
+
+    # None when the rows did not reach the assets table, the watermarks and
+    # fingerprints stay pending and the next run exports the same rows again.
+    if clean_result is None:
+        return
+
+    cleaned_csv, tablename = clean_result
+    udb.update_db(date, tablename)
+    db.commit_watermarks()
+    db.commit_fingerprints()
+
+
+def build_fused(date, gor_df, diva_df):
+    """
+    Merge, parse and clean the exported dataframes in memory, and load the result into
+    the assets table. No intermediate files are written, unless pipeline: debug_csv
+    is set, then each stage is also written to its csv file.
+    Returns True if the DB was updated.
+    """
+
+    config = cfg.get_config()
+    tablename = "assets"
+
+    try:
+        im.debug_tap(gor_df, date, "gorilla_db_export")
+        im.debug_tap(diva_df, date, "diva_db_export")
+
+        merged_df, counts = mdb.merge_frames(gor_df, diva_df)
+        del gor_df, diva_df
+        mdb.log_merge(counts)
+        im.debug_tap(merged_df, date, "gor_diva_merged_export", encoding="utf-8-sig")
+
+        parsed_df = csv_p.parse_frame(merged_df)
+        del merged_df
+
+        if g_query.two_phase(config):
+            g_query.add_metaxml(parsed_df)
+
+        im.debug_tap(parsed_df, date, "gor_diva_merged_parsed")
+
+        fingerprints = None
+
+        if csv_c.incremental_clean(config):
+            fingerprints = csv_c.row_fingerprints(parsed_df)
+
+        clean_df = csv_c.clean_frame(parsed_df, fingerprints=fingerprints)
+        del parsed_df
+        im.debug_tap(clean_df, date, "gor_diva_merged_cleaned", index=True)
+
+        if csv_c.load_frame(clean_df, tablename) is None:
+            load_err_msg = f"GORILLA-DIVA FUSED BUILD STOPPED, the cleaned rows were not loaded into {tablename}"
+            logger.error(load_err_msg)
+            return False
+
+        if fingerprints is not None:
+            csv_c.store_fingerprints(clean_df, fingerprints)
+
+        fused_msg = f"GORILLA-DIVA FUSED BUILD COMPLETE, {len(clean_df)} rows loaded into {tablename}"
+        logger.info(fused_msg)
+
+        udb.update_db(date, tablename, df=clean_df)
+
+        return True
+
+    except Exception as e:
+        fused_excp_msg = f"\n\
+        Exception raised on the Gor-Diva fused build.\n\
+        Error Message:  {str(e)} \n\
+        "
+        logger.exception(fused_excp_msg)
+        return False
+
+
 def final_steps(xml_total, proxy_total):
     if int(xml_total) > 0:
         xml_c.create_xml(xml_total)
@@ -1,20 +1,29 @@
 #! /usr/bin/env python3
 
+import csv
+import heapq
 import logging
 import os
+import tempfile
+from itertools import groupby
 from time import localtime, strftime
 
 import pandas as pd
 
 import config as cfg
+import intermediate as im
 
 logger = logging.getLogger(__name__)
 
+END = object()
+
 
 def pandas_merge(date, diva_csv, gor_csv):
     """
     Creates a merged CSV from Oracle DBs of the Gorilla MAM and DivaArchive.
     The merge is performed by converting the CSVs to pandas dataframes and using a common key.
+    With merge: engine: sorted in config.yaml, the files are instead sort-merged by GUID
+    in chunks that fit merge: memory_mb (see sorted_merge).
     """
 
     config = cfg.get_config()
@@ -27,57 +36,28 @@ def pandas_merge(date, diva_csv, gor_csv):
         gor_source = str(gor_csv)
         div_source = str(diva_csv)
 
-        gor_reader = pd.read_csv(gor_source)
-        div_reader = pd.read_csv(div_source)
-
-        merged_csv = date + "_" + "gor_diva_merged_export.csv"
+        merged_csv = im.stage_file(date, "gor_diva_merged_export", config)
 
         merge_1_msg = f"START GORILLA-DIVA DB MERGE"
         logger.info(merge_1_msg)
 
-        with open(merged_csv, mode="w+", encoding="utf-8-sig") as m_csv:
-
-            merged_df = gor_reader.merge(div_reader, on="GUID")
-
-            merged_df = pd.merge(
-                gor_reader,
-                div_reader,
-                left_on=["GUID"],
-                right_on=["GUID"],
-                how="outer",
-                indicator=True,
-            )
-
-            left_count = merged_df.loc[
-                merged_df._merge == "left_only", "_merge"
-            ].count()
-
-            right_count = merged_df.loc[
-                merged_df._merge == "right_only", "_merge"
-            ].count()
+        if cfg.get_setting(config, "merge", "engine", "pandas") == "sorted":
+            memory_mb = int(cfg.get_setting(config, "merge", "memory_mb", 512))
+            counts = sorted_merge(gor_source, div_source, merged_csv, memory_mb)
+        else:
+            gor_reader = im.read_frame(gor_source)
+            div_reader = im.read_frame(div_source)
 
-            both_count = merged_df.loc[merged_df._merge == "both", "_merge"].count()
+            merged_df, counts = merge_frames(gor_reader, div_reader)
 
-            merged_df.to_csv(m_csv, mode="a", index=False, header=True)
+            im.write_frame(merged_df, merged_csv, encoding="utf-8-sig")
 
-            # m_count = merged_df.shape[0]
-            # merged_dd = merged.drop_duplicates(subset="GUID", inplace=True)
-            # dd_count = merged_dd.shape[0]
-            # merged_dd.to_csv(m_csv, mode='a', index=False, header=True)
+        # m_count = merged_df.shape[0]
+        # merged_dd = merged.drop_duplicates(subset="GUID", inplace=True)
+        # dd_count = merged_dd.shape[0]
+        # merged_dd.to_csv(m_csv, mode='a', index=False, header=True)
 
-        m_csv.close()
-
-        merge_2_msg = f"\n\
-        ==================================================================\n\
-                            Gor-DIVA DB MERGE  Complete \n\
-                    {str(strftime('%A, %d. %B %Y %I:%M%p', localtime()))} \n\
-                    Rows Merged:    {str(both_count)}\n\
-                    Unmerged Gorilla Objects:    {str(left_count)}\n\
-                    Unmerged Diva Objects:    {str(right_count)}\n\
-        ==================================================================\
-        "
-
-        logger.info(merge_2_msg)
+        log_merge(counts)
 
         os.chdir(root_path)
 
@@ -94,5 +74,343 @@ def pandas_merge(date, diva_csv, gor_csv):
         print(db_merge_excp_msg)
 
 
-# if __name__ == '__main__':
-#     pandas_merge()
+def merge_frames(gor_df, div_df):
+    """
+    Outer merge of the Gorilla and Diva dataframes on GUID, with the _merge indicator.
+    Returns the merged dataframe and the row count of each _merge value.
+    """
+
+    merged_df = pd.merge(
+        gor_df,
+        div_df,
+        left_on=["GUID"],
+        right_on=["GUID"],
+        how="outer",
+        indicator=True,
+    )
+
+    counts = {
+        value: merged_df.loc[merged_df._merge == value, "_merge"].count()
+        for value in ["both", "left_only", "right_only"]
+    }
+
+    return merged_df, counts
+
+
+def log_merge(counts):
+    merge_2_msg = f"\n\
+    ==================================================================\n\
+                        Gor-DIVA DB MERGE  Complete \n\
+                {str(strftime('%A, %d. %B %Y %I:%M%p', localtime()))} \n\
+                Rows Merged:    {str(counts['both'])}\n\
+                Unmerged Gorilla Objects:    {str(counts['left_only'])}\n\
+                Unmerged Diva Objects:    {str(counts['right_only'])}\n\
+    ==================================================================\
+    "
+
+    logger.info(merge_2_msg)
+
+
+def sort_key(guid):
+    """
+    Sort order of the merge, the same as the outer merge in pandas: GUIDs in
+    lexicographic order, and null GUIDs last.
+    """
+    return (guid is None, guid or "")
+
+
+def get_chunk_rows(path, memory_bytes):
+    """
+    Estimate the rows of a file that fit in memory_bytes, from the size of a sample of rows.
+    The sort holds about three copies of a chunk (dataframe, row tuples, sorted list).
+    """
+
+    sample = next(im.iter_frames(path, 1000), None)
+
+    if sample is None or len(sample) == 0:
+        return 1000
+
+    row_bytes = sample.memory_usage(deep=True).sum() / len(sample)
+
+    return max(1000, int(memory_bytes / (3 * row_bytes)))
+
+
+def write_run(rows, tmp_dir):
+    """
+    Write a sorted chunk of rows to a temporary run file.
+    """
+
+    run = tempfile.NamedTemporaryFile(
+        "w", dir=tmp_dir, suffix=".csv", newline="", delete=False
+    )
+
+    with run:
+        csv.writer(run).writerows(rows)
+
+    return run.name
+
+
+def read_run(run_path):
+    with open(run_path, "r", newline="") as run:
+        for row in csv.reader(run):
+            yield tuple(value if value != "" else None for value in row)
+
+
+def sorted_rows(path, key, memory_bytes, tmp_dir):
+    """
+    Return the rows of a file sorted by the key column. The file is read in chunks that
+    fit memory_bytes and each chunk is sorted. A file larger than a single chunk is
+    spilled to sorted run files, which are then merged with heapq.merge.
+    The sorts are stable, rows with the same key keep their order in the file.
+    """
+
+    key_index = im.read_columns(path).index(key)
+    chunk_rows = get_chunk_rows(path, memory_bytes)
+    runs = []
+    rows = []
+
+    for chunk in im.iter_frames(path, chunk_rows):
+        if len(rows) != 0:
+            runs.append(write_run(rows, tmp_dir))
+
+        rows = list(chunk.itertuples(index=False, name=None))
+        rows.sort(key=lambda row: sort_key(row[key_index]))
+
+    if len(runs) == 0:
+        return iter(rows)
+
+    runs.append(write_run(rows, tmp_dir))
+
+    sort_msg = f"{path}: {len(runs)} sorted runs of {chunk_rows} rows"
+    logger.info(sort_msg)
+
+    return heapq.merge(
+        *[read_run(run) for run in runs], key=lambda row: sort_key(row[key_index])
+    )
+
+
+def next_group(groups):
+    key, group = next(groups, (END, None))
+    return key, list(group) if group is not None else None
+
+
+def merge_join(left_rows, right_rows, left_key, right_key, left_width, right_keep):
+    """
+    Full outer join of two row iterators sorted by key. Yields the merged rows with the
+    _merge indicator: left columns, right columns without the key, "both",
+    "left_only" or "right_only". Only the rows of one key are held in memory.
+    """
+
+    left_groups = groupby(left_rows, key=lambda row: sort_key(row[left_key]))
+    right_groups = groupby(right_rows, key=lambda row: sort_key(row[right_key]))
+    right_empty = (None,) * len(right_keep)
+
+    left_sort, left_group = next_group(left_groups)
+    right_sort, right_group = next_group(right_groups)
+
+    while left_sort is not END or right_sort is not END:
+        if right_sort is END or (left_sort is not END and left_sort < right_sort):
+            for left_row in left_group:
+                yield left_row + right_empty + ("left_only",)
+            left_sort, left_group = next_group(left_groups)
+
+        elif left_sort is END or right_sort < left_sort:
+            for right_row in right_group:
+                left_row = [None] * left_width
+                left_row[left_key] = right_row[right_key]
+                right_values = tuple(right_row[i] for i in right_keep)
+                yield tuple(left_row) + right_values + ("right_only",)
+            right_sort, right_group = next_group(right_groups)
+
+        else:
+            for left_row in left_group:
+                for right_row in right_group:
+                    right_values = tuple(right_row[i] for i in right_keep)
+                    yield left_row + right_values + ("both",)
+            left_sort, left_group = next_group(left_groups)
+            right_sort, right_group = next_group(right_groups)
+
+
+def sorted_merge(gor_source, div_source, merged_csv, memory_mb, batch_rows=10000):
+    """
+    Merge the Gorilla and Diva exports on GUID without loading them into dataframes.
+    Both files are sorted by GUID in chunks (an external sort when they are larger than
+    the memory budget), then merge-joined in a single pass. The output has the same
+    columns, rows and _merge indicator as the pandas outer merge.
+    Returns the row count of each _merge value.
+    """
+
+    memory_bytes = memory_mb * 1024 * 1024 // 2
+    gor_columns = im.read_columns(gor_source)
+    div_columns = im.read_columns(div_source)
+
+    left_key = gor_columns.index("GUID")
+    right_key = div_columns.index("GUID")
+    right_keep = [i for i, col in enumerate(div_columns) if col != "GUID"]
+
+    fieldnames = gor_columns + [div_columns[i] for i in right_keep] + ["_merge"]
+    counts = {"both": 0, "left_only": 0, "right_only": 0}
+
+    with tempfile.TemporaryDirectory(
+        dir=os.path.dirname(os.path.abspath(merged_csv))
+    ) as tmp_dir:
+        gor_rows = sorted_rows(gor_source, "GUID", memory_bytes, tmp_dir)
+        div_rows = sorted_rows(div_source, "GUID", memory_bytes, tmp_dir)
+
+        with im.BatchWriter(merged_csv, fieldnames) as writer:
+            batch = []
+
+            for row in merge_join(
+                gor_rows, div_rows, left_key, right_key, len(gor_columns), right_keep
+            ):
+                batch.append(row)
+                counts[row[-1]] += 1
+
+                if len(batch) == batch_rows:
+                    writer.write(batch)
+                    batch = []
+
+            writer.write(batch)
+
+    return counts
+
+
+def write_benchmark_files(csv_path, rows, seed=1):
+    """
+    Write synthetic Gorilla and Diva exports with the export columns, about 2KB of
+    METAXML per Gorilla row, and Diva rows for 80% of the GUIDs.
+    """
+
+    import random
+
+    import diva_oracle_query as d_query
+    import gorilla_oracle_query as g_query
+
+    rand = random.Random(seed)
+    gor_path = os.path.join(
+        csv_path, im.stage_file(f"bench{rows}", "gorilla_db_export")
+    )
+    div_path = os.path.join(csv_path, im.stage_file(f"bench{rows}", "diva_db_export"))
+
+    with im.BatchWriter(gor_path, g_query.fieldnames) as gor_writer, im.BatchWriter(
+        div_path, d_query.fieldnames
+    ) as div_writer:
+        for start in range(0, rows, 10000):
+            gor_rows, div_rows = [], []
+
+            for i in range(start, min(start + 10000, rows)):
+                guid = f"{rand.getrandbits(48):012X}-8000FFFF-FFFF-{i:08X}"
+                date = "2020-01-01 12:00:00"
+                code = f"{i:06d}"
+                gor_rows.append(
+                    (
+                        guid,
+                        f"{code}_TITLE_VM",
+                        i,
+                        code,
+                        f"{code}_TITLE_VM",
+                        i,
+                        date,
+                        date,
+                        date,
+                        "00:00:00:00",
+                        "00:00:00:00",
+                        code,
+                        f"mnt/lun02/{guid}",
+                        "x" * 2000,
+                    )
+                )
+
+                if rand.random() < 0.8:
+                    div_rows.append(
+                        (
+                            i,
+                            f"uuid{i}",
+                            guid,
+                            "c",
+                            "TACS-DIVA",
+                            date,
+                            date,
+                            1080481.0,
+                            f"mnt\\lun02\\{guid}",
+                            "N",
+                            "TACS-DIVA",
+                            "G_0",
+                            date,
+                            date,
+                            "3136ac",
+                            date,
+                            "MD5",
+                        )
+                    )
+
+            gor_writer.write(gor_rows)
+            div_writer.write(div_rows)
+
+    return gor_path, div_path
+
+
+def benchmark_run(engine, gor_path, div_path, merged_path, memory_mb, results):
+    import resource
+    import time
+
+    start = time.perf_counter()
+
+    if engine == "sorted":
+        sorted_merge(gor_path, div_path, merged_path, memory_mb)
+    else:
+        merged_df = pd.merge(
+            im.read_frame(gor_path),
+            im.read_frame(div_path),
+            on="GUID",
+            how="outer",
+            indicator=True,
+        )
+        im.write_frame(merged_df, merged_path, encoding="utf-8-sig")
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+    results.put((time.perf_counter() - start, peak_mb))
+
+
+def benchmark(rows, scales, memory_mb):
+    """
+    Merge synthetic exports of rows x scale rows with both engines, each in its own
+    process, and report the elapsed time and the peak memory (max RSS) of the process.
+    """
+
+    import multiprocessing
+
+    config = cfg.get_config()
+    csv_path = config["paths"]["csv_path"]
+    ctx = multiprocessing.get_context("spawn")
+
+    for scale in scales:
+        gor_path, div_path = write_benchmark_files(csv_path, rows * scale)
+        merged_path = os.path.join(csv_path, im.stage_file("bench", "merged"))
+
+        for engine in ["pandas", "sorted"]:
+            results = ctx.Queue()
+            process = ctx.Process(
+                target=benchmark_run,
+                args=(engine, gor_path, div_path, merged_path, memory_mb, results),
+            )
+            process.start()
+            elapsed, peak_mb = results.get()
+            process.join()
+
+            bench_msg = f"merge benchmark - engine: {engine}, rows: {rows * scale}, elapsed: {elapsed:.1f}s, peak memory: {peak_mb}MB"
+            logger.info(bench_msg)
+            print(bench_msg)
+
+        for path in [gor_path, div_path, merged_path]:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    # Compare the pandas and sorted merge engines at 1x, 5x and 10x merge: benchmark_rows.
+    config = cfg.get_config()
+    benchmark(
+        int(cfg.get_setting(config, "merge", "benchmark_rows", 100000)),
+        cfg.get_setting(config, "merge", "benchmark_scales", [1, 5, 10]),
+        int(cfg.get_setting(config, "merge", "memory_mb", 512)),
+    )
@@ -0,0 +1,149 @@
+#! /usr/bin/env python3
+
+import json
+import logging
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+import classify as cl
+import config as cfg
+import database as db
+
+logger = logging.getLogger(__name__)
+
+cache = None
+
+
+def name_fields(name):
+    """
+    Derive the fields of a cleaned asset name: the 5 video checks, the archive check,
+    and the codec and framerate tokens used when a video has no mediainfo.
+    """
+
+    return {
+        "video": cl.video_checks(name),
+        "archive": cl.archive_check(name),
+        "codec": cl.codec_check(name),
+        "framerate": cl.framerate_check(name),
+    }
+
+
+def rules_version():
+    """
+    A checksum of classify.py, the cached fields of an older version of the rules are not used.
+    """
+
+    with open(cl.__file__, "rb") as f:
+        return f"{zlib.crc32(f.read()):08x}"
+
+
+class NameCache:
+    """
+    A bounded LRU cache of name_fields(), keyed by the cleaned name.
+    Each entry keeps the time it was last used, for the DB layer.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.run_time = datetime.now().isoformat(timespec="seconds")
+        self.hits = 0
+        self.misses = 0
+        self.loaded = 0
+
+    def get(self, name, count=True):
+        """
+        Return the fields of a name. count=False lookups are not added to the statistics.
+        """
+
+        entry = self.entries.get(name)
+
+        if entry is None:
+            if count:
+                self.misses += 1
+            fields = name_fields(name)
+            if self.maxsize > 0:
+                self.entries[name] = [fields, self.run_time]
+                if len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+            return fields
+
+        if count:
+            self.hits += 1
+        entry[1] = self.run_time
+        self.entries.move_to_end(name)
+
+        return entry[0]
+
+    def load(self):
+        """
+        Fill the cache with the most recently used entries stored in the DB.
+        """
+
+        rows = db.get_name_cache(rules_version(), self.maxsize) or []
+
+        for name, fields, last_used in reversed(rows):
+            fields = json.loads(fields)
+            fields["video"] = tuple(fields["video"])
+            self.entries[name] = [fields, last_used]
+
+        self.loaded = len(rows)
+
+    def save(self):
+        """
+        Store the cache entries in the DB, the table keeps the maxsize most recent names.
+        """
+
+        rows = [
+            (name, json.dumps(fields), last_used)
+            for name, (fields, last_used) in self.entries.items()
+        ]
+        db.set_name_cache(rows, rules_version(), self.maxsize)
+
+    def stats_msg(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups != 0 else 0
+        return f"Name cache - lookups: {lookups}, hits: {self.hits}, misses: {self.misses}, hit rate: {hit_rate:.1%}, loaded from DB: {self.loaded}, size: {len(self.entries)}"
+
+
+def use_db(config):
+    return cfg.get_setting(config, "pipeline", "name_cache_db", False) is True
+
+
+def get_cache(config=None):
+    """
+    Return the name cache of the process, created on first use with pipeline: name_cache_size
+    entries. With pipeline: name_cache_db it is loaded from the name_cache table of the DB.
+    """
+
+    global cache
+
+    if cache is None:
+        if config is None:
+            config = cfg.get_config()
+
+        cache = NameCache(
+            int(cfg.get_setting(config, "pipeline", "name_cache_size", 100000))
+        )
+
+        if use_db(config):
+            cache.load()
+
+    return cache
+
+
+def finish(config=None):
+    """
+    Log the cache statistics at the end of a clean, and store the cache in the DB
+    with pipeline: name_cache_db.
+    """
+
+    if config is None:
+        config = cfg.get_config()
+
+    name_cache = get_cache(config)
+    logger.info(name_cache.stats_msg())
+
+    if use_db(config):
+        name_cache.save()
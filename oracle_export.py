@@ -0,0 +1,429 @@
+#! /usr/bin/env python3
+
+import logging
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import config as cfg
+import database as db
+import intermediate as im
+
+logger = logging.getLogger(__name__)
+
+
+def get_export_settings(config):
+    """
+    Read the optional oracle-export settings from config.yaml.
+        arraysize:      rows returned by each fetchmany() round trip
+        prefetchrows:   rows pre-fetched by the driver on execute()
+        progress_rows:  log export progress every N rows
+        page_size:      keys per page of a resumable export
+    """
+
+    settings = {
+        "arraysize": int(cfg.get_setting(config, "oracle-export", "arraysize", 5000)),
+        "prefetchrows": int(
+            cfg.get_setting(config, "oracle-export", "prefetchrows", 5001)
+        ),
+        "progress_rows": int(
+            cfg.get_setting(config, "oracle-export", "progress_rows", 100000)
+        ),
+        "page_size": int(cfg.get_setting(config, "oracle-export", "page_size", 50000)),
+    }
+
+    return settings
+
+
+def configure_cursor(cursor, settings):
+    """
+    Apply the arraysize and prefetchrows settings, must be called before execute().
+    """
+    cursor.arraysize = settings["arraysize"]
+    cursor.prefetchrows = settings["prefetchrows"]
+    return cursor
+
+
+def fetch_batches(cursor, source, settings):
+    """
+    Yield the query results in batches of cursor.arraysize rows using fetchmany().
+    Progress is logged every progress_rows rows, and the export rate at the end.
+    """
+
+    row_count = 0
+    progress_rows = settings["progress_rows"]
+    next_progress = progress_rows
+    start = time.perf_counter()
+
+    while True:
+        rows = cursor.fetchmany()
+
+        if not rows:
+            break
+
+        yield rows
+
+        row_count += len(rows)
+
+        if row_count >= next_progress:
+            elapsed = time.perf_counter() - start
+            progress_msg = f"{source} export progress: {row_count} rows, {rows_per_sec(row_count, elapsed)} rows/sec"
+            logger.info(progress_msg)
+            next_progress += progress_rows
+
+    elapsed = time.perf_counter() - start
+    rate_msg = f"{source} export fetched {row_count} rows in {elapsed:.1f}s, {rows_per_sec(row_count, elapsed)} rows/sec"
+    logger.info(rate_msg)
+
+
+def add_predicates(sql, predicates):
+    """
+    Append extra AND predicates to the WHERE clause of an export query.
+    """
+    if len(predicates) == 0:
+        return sql
+    return sql.rstrip() + "\n        " + "\n        ".join(predicates) + "\n        "
+
+
+def fetch_keys(cursor, sql, key_column, keys, source, settings, batch_size=1000):
+    """
+    Yield the rows for a set of keys in batches, using bind variable IN lists
+    of at most batch_size keys (the Oracle limit is 1000).
+    """
+
+    keys = sorted(keys)
+
+    for start in range(0, len(keys), batch_size):
+        binds = {f"k{i}": key for i, key in enumerate(keys[start : start + batch_size])}
+        in_list = ", ".join(f":{name}" for name in binds)
+        query = add_predicates(sql, [f"AND {key_column} IN ({in_list})"])
+        cursor.execute(query, binds)
+
+        for rows in fetch_batches(cursor, source, settings):
+            yield rows
+
+
+def read_keys(export_path, column):
+    """
+    Return the set of values in one column of an export file.
+    """
+
+    keys = im.read_frame(export_path, columns=[column], dtype=str)[column].dropna()
+
+    return set(keys)
+
+
+def resumable(config):
+    """
+    oracle-export: resumable in config.yaml. A checkpoint records the file offset of the
+    export, so the resumable export needs the csv intermediate format.
+    """
+
+    if cfg.get_setting(config, "oracle-export", "resumable", False) is not True:
+        return False
+
+    if im.get_format(config) != "csv":
+        resumable_msg = f"Resumable export requires intermediate_format: csv, running a standard export."
+        logger.warning(resumable_msg)
+        return False
+
+    return True
+
+
+def page_queries(sql, key, first_page):
+    """
+    Build the two queries of a keyset page. The first returns the boundary key of the
+    next page_size keys after :last_key, the second the rows up to the boundary key,
+    so all the rows of a key are always in the same page.
+    """
+
+    after = "" if first_page else f"WHERE {key} > :last_key"
+
+    boundary_sql = f"""SELECT MAX({key}) FROM (
+            SELECT {key} FROM ({sql}) {after}
+            ORDER BY {key} FETCH FIRST :page_size ROWS ONLY)"""
+
+    after = "" if first_page else f"{key} > :last_key AND"
+
+    rows_sql = f"""SELECT * FROM ({sql})
+        WHERE {after} {key} <= :boundary
+        ORDER BY {key}"""
+
+    return boundary_sql, rows_sql
+
+
+def export_resumable(
+    get_connection,
+    config,
+    settings,
+    source,
+    sql,
+    params,
+    key,
+    export_file,
+    fieldnames,
+    watermark_index,
+    watermark,
+    check_rows=None,
+):
+    """
+    Export a query in pages ordered by key, and store a checkpoint after each page
+    (last key, rows written, file offset). If an earlier export of the source stopped
+    partway with the same query and mode, its file is truncated to the checkpoint offset
+    and the export continues after the checkpoint key. A checkpoint of a different query
+    or mode is discarded. check_rows is applied to each batch before it is written.
+    Returns the export file, row count and high-water mark.
+    """
+
+    csv_path = config["paths"]["csv_path"]
+    mode = "full" if watermark is None else "delta"
+    query_hash = export_query_hash(sql, params, mode)
+    checkpoint = db.get_checkpoint(source)
+
+    if checkpoint is not None and checkpoint["QUERY_HASH"] != query_hash:
+        discard_msg = f"{source} EXPORT checkpoint discarded, it was stored by a different export query or mode: {checkpoint['EXPORT_FILE']}, key: {checkpoint['LAST_KEY']}"
+        logger.warning(discard_msg)
+        checkpoint = None
+
+    if checkpoint is not None and os.path.exists(
+        os.path.join(csv_path, checkpoint["EXPORT_FILE"])
+    ):
+        export_file = checkpoint["EXPORT_FILE"]
+        last_key = checkpoint["LAST_KEY"]
+        row_count = checkpoint["ROWS_WRITTEN"]
+        offset = checkpoint["FILE_OFFSET"]
+        high_water = checkpoint["HIGH_WATER"]
+
+        resume_msg = f"{source} EXPORT RESUMED from checkpoint: {export_file}, key: {last_key}, rows: {row_count}"
+        logger.info(resume_msg)
+    else:
+        last_key = None
+        row_count = 0
+        offset = None
+        high_water = watermark
+
+    connection = None
+
+    try:
+        connection = get_connection(config)
+        cursor = configure_cursor(connection.cursor(), settings)
+
+        with im.BatchWriter(
+            os.path.join(csv_path, export_file),
+            fieldnames,
+            append=offset is not None,
+            offset=offset,
+        ) as writer:
+
+            while True:
+                boundary_sql, rows_sql = page_queries(sql, key, last_key is None)
+                page_params = dict(params)
+
+                if last_key is not None:
+                    page_params["last_key"] = last_key
+
+                cursor.execute(
+                    boundary_sql, dict(page_params, page_size=settings["page_size"])
+                )
+                boundary = cursor.fetchone()[0]
+
+                if boundary is None:
+                    break
+
+                cursor.execute(rows_sql, dict(page_params, boundary=boundary))
+                page_rows = 0
+
+                for rows in fetch_batches(cursor, source, settings):
+                    if check_rows is not None:
+                        rows = check_rows(rows)
+                    writer.write(rows)
+                    page_rows += len(rows)
+                    high_water = max_watermark(rows, watermark_index, high_water)
+
+                row_count += page_rows
+                last_key = boundary
+                db.set_checkpoint(
+                    source,
+                    export_file,
+                    last_key,
+                    row_count,
+                    writer.flush(),
+                    high_water,
+                    query_hash,
+                )
+
+                checkpoint_msg = (
+                    f"{source} EXPORT checkpoint, key: {last_key}, rows: {row_count}"
+                )
+                logger.info(checkpoint_msg)
+
+    except Exception:
+        checkpoint_msg = f"{source} EXPORT stopped at key: {last_key}, rows: {row_count}. Run the export again to resume from this checkpoint."
+        logger.error(checkpoint_msg)
+        raise
+
+    finally:
+        if connection is not None:
+            connection.close()
+
+    db.clear_checkpoint(source)
+
+    return export_file, row_count, high_water
+
+
+def export_query_hash(sql, params, mode):
+    """
+    Hash of the export query, its parameters and the export mode (full or delta), stored
+    with each checkpoint. A checkpoint is only resumed by the same export.
+    """
+
+    query = "|".join([mode, sql] + [f"{k}={params[k]}" for k in sorted(params)])
+
+    return f"{zlib.crc32(query.encode('utf-8')):08x}"
+
+
+def max_watermark(rows, indexes, watermark=None):
+    """
+    Return the highest non-null value of the watermark columns in a batch of rows.
+    """
+
+    for row in rows:
+        for i in indexes:
+            value = row[i]
+            if value is not None and (watermark is None or value > watermark):
+                watermark = value
+
+    return watermark
+
+
+def get_export_mode(config):
+    """
+    Return "delta" when delta exports are enabled in config.yaml, unless the last
+    full export of either source is older than full_reconcile_days, then return "full".
+    """
+
+    if cfg.get_setting(config, "oracle-export", "delta", False) is not True:
+        return "full"
+
+    reconcile_days = int(
+        cfg.get_setting(config, "oracle-export", "full_reconcile_days", 7)
+    )
+    last_full = db.get_last_full_export()
+
+    if last_full is None or datetime.now() - last_full >= timedelta(
+        days=reconcile_days
+    ):
+        reconcile_msg = (
+            f"Last full export: {last_full}. Running a full reconciliation export."
+        )
+        logger.info(reconcile_msg)
+        return "full"
+
+    return "delta"
+
+
+def probe(get_connection, config, source, sql, key, date_columns):
+    """
+    Run a cheap aggregate over the export query: the row count, the max of the date
+    columns and the sum of ORA_HASH of the key. Returns a fingerprint of the results and
+    of the query text, so a change to the export settings is also a change. None on failure.
+    """
+
+    dates = ", ".join(f"MAX({col})" for col in date_columns)
+    probe_sql = f"SELECT COUNT(*), {dates}, SUM(ORA_HASH({key})) FROM ({sql})"
+
+    connection = None
+
+    try:
+        start = time.perf_counter()
+        connection = get_connection(config)
+        cursor = connection.cursor()
+        cursor.execute(probe_sql)
+        result = cursor.fetchone()
+
+        query_hash = f"{zlib.crc32(sql.encode('utf-8')):08x}"
+        fingerprint = "|".join(str(value) for value in result) + "|" + query_hash
+
+        probe_msg = (
+            f"{source} probe: {fingerprint} in {time.perf_counter() - start:.1f}s"
+        )
+        logger.info(probe_msg)
+
+        return fingerprint
+
+    except Exception as e:
+        probe_excp_msg = f"\n\
+        Exception raised on the {source} DB probe.\n\
+        Error Message:  {str(e)} \n\
+        "
+        logger.exception(probe_excp_msg)
+
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+def rows_per_sec(row_count, elapsed):
+    if elapsed <= 0:
+        return row_count
+    return int(row_count / elapsed)
+
+
+def benchmark(source, get_connection, sql, arraysizes, max_rows=None):
+    """
+    Run the export query once for each arraysize and report the rows/sec for each setting.
+    Rows are fetched and discarded, so only the driver and network cost is measured.
+    """
+
+    config = cfg.get_config()
+    results = []
+
+    for arraysize in arraysizes:
+        settings = get_export_settings(config)
+        settings["arraysize"] = int(arraysize)
+        settings["prefetchrows"] = int(arraysize) + 1
+
+        connection = get_connection(config)
+
+        try:
+            cursor = configure_cursor(connection.cursor(), settings)
+
+            row_count = 0
+            start = time.perf_counter()
+            cursor.execute(sql)
+
+            for rows in fetch_batches(cursor, source, settings):
+                row_count += len(rows)
+                if max_rows is not None and row_count >= max_rows:
+                    break
+
+            elapsed = time.perf_counter() - start
+            cursor.close()
+
+        finally:
+            connection.close()
+
+        rate = rows_per_sec(row_count, elapsed)
+        bench_msg = f"{source} benchmark - arraysize: {arraysize}, rows: {row_count}, rows/sec: {rate}"
+        logger.info(bench_msg)
+        print(bench_msg)
+        results.append((arraysize, row_count, rate))
+
+    return results
+
+
+if __name__ == "__main__":
+    import diva_oracle_query as d_query
+    import gorilla_oracle_query as g_query
+
+    config = cfg.get_config()
+    arraysizes = cfg.get_setting(
+        config, "oracle-export", "benchmark_arraysizes", [100, 1000, 5000, 10000]
+    )
+    max_rows = cfg.get_setting(config, "oracle-export", "benchmark_rows", 200000)
+
+    benchmark(
+        "GORILLA", g_query.get_connection, g_query.sql_query, arraysizes, max_rows
+    )
+    benchmark("DIVA", d_query.get_connection, d_query.sql_query, arraysizes, max_rows)
@@ -0,0 +1,279 @@
+#! /usr/bin/env python3
+
+import functools
+import logging
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+import zlib
+
+import config as cfg
+
+# A local stand-in for the cx_Oracle connection and SessionPool, backed by an SQLite copy
+# of the Gorilla tables. Set oracle-export: standin_db in config.yaml to point the Gorilla
+# export at the stand-in, so the export modes can be run and timed without Oracle.
+# round_trip_ms adds a delay to every execute and fetch to simulate the network latency.
+
+logger = logging.getLogger(__name__)
+
+
+def ora_hash(value, max_bucket=4294967295):
+    if value is None:
+        return None
+    return zlib.crc32(str(value).encode("utf-8")) % (int(max_bucket) + 1)
+
+
+# The POSIX ERE syntax the stand-in REGEXP_LIKE accepts: letters, digits and "_", alternation,
+# groups, bracket expressions of literal characters, ^, * and $. In this subset a pattern means
+# the same in Oracle and in Python re, once $ only matches at the end of the value.
+ERE_SYNTAX = re.compile(r"\[[A-Za-z0-9_-]+\]|[A-Za-z0-9_|()^*$]")
+
+
+@functools.lru_cache(maxsize=None)
+def ere_pattern(pattern):
+    """
+    Translate an Oracle regex in the supported ERE subset to Python re. Other syntax,
+    such as the Python lookarounds Oracle does not have, raises ValueError.
+    """
+
+    python_pattern = ""
+    pos = 0
+
+    while pos < len(pattern):
+        match = ERE_SYNTAX.match(pattern, pos)
+        if match is None:
+            raise ValueError(f"Regex syntax not supported by the stand-in: {pattern}")
+        python_pattern += r"\Z" if match.group(0) == "$" else match.group(0)
+        pos = match.end()
+
+    return python_pattern
+
+
+def regexp_like(value, pattern, flags=""):
+    if value is None:
+        return None
+    re_flags = re.IGNORECASE if "i" in flags else 0
+    return 1 if re.search(ere_pattern(pattern), str(value), re_flags) is not None else 0
+
+
+class Cursor:
+    def __init__(self, cursor, round_trip):
+        self._cursor = cursor
+        self._round_trip = round_trip
+        self.arraysize = 100
+        self.prefetchrows = 2
+
+    def execute(self, sql, params=None):
+        time.sleep(self._round_trip)
+        sql = re.sub(r"FETCH FIRST (\S+) ROWS ONLY", r"LIMIT \1", sql)
+        self._cursor.execute(sql, params or {})
+        return self
+
+    def fetchone(self):
+        time.sleep(self._round_trip)
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        time.sleep(self._round_trip)
+        return self._cursor.fetchmany(size or self.arraysize)
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany()
+            if not rows:
+                break
+            yield from rows
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    def __init__(self, db_file, round_trip=0):
+        self._conn = sqlite3.connect(
+            db_file, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        self._conn.create_function("ORA_HASH", 1, ora_hash)
+        self._conn.create_function("ORA_HASH", 2, ora_hash)
+        self._conn.create_function("REGEXP_LIKE", 2, regexp_like)
+        self._conn.create_function("REGEXP_LIKE", 3, regexp_like)
+        self._round_trip = round_trip
+        self.outputtypehandler = None
+
+    def cursor(self):
+        return Cursor(self._conn.cursor(), self._round_trip)
+
+    def close(self):
+        self._conn.close()
+
+
+class SessionPool:
+    def __init__(self, db_file, round_trip=0):
+        self._db_file = db_file
+        self._round_trip = round_trip
+
+    def acquire(self):
+        return Connection(self._db_file, self._round_trip)
+
+    def release(self, connection):
+        connection.close()
+
+    def close(self):
+        return
+
+
+def get_round_trip(config):
+    return cfg.get_setting(config, "oracle-export", "round_trip_ms", 0) / 1000
+
+
+def connect(config):
+    db_file = cfg.get_setting(config, "oracle-export", "standin_db")
+    return Connection(db_file, get_round_trip(config))
+
+
+def session_pool(config):
+    db_file = cfg.get_setting(config, "oracle-export", "standin_db")
+    return SessionPool(db_file, get_round_trip(config))
+
+
+def create_gorilla_db(db_file, row_count, seed=1):
+    """
+    Create the Gorilla tables used by the export query and fill them with generated rows.
+    """
+
+    rand = random.Random(seed)
+    tags = ["VM", "EM", "UHD_VM", "AVP", "PPRO", "GFX", "WAVS", "OUTGOING_QC", "PROMO"]
+
+    if os.path.exists(db_file):
+        os.remove(db_file)
+
+    conn = sqlite3.connect(db_file)
+    cur = conn.cursor()
+    cur.executescript("""
+        CREATE TABLE ESSENCE (GUID TEXT PRIMARY KEY, NAME TEXT, FILESIZE INTEGER,
+            DATATAPEID TEXT, ISGARBAGE INTEGER);
+        CREATE TABLE ESSENCEDETAIL (GUID TEXT PRIMARY KEY, OBJECTNM TEXT,
+            CONTENTLENGTH INTEGER, SOURCECREATEDT TIMESTAMP, CREATEDT TIMESTAMP, LASTMDYDT TIMESTAMP,
+            TIMECODEIN TEXT, TIMECODEOUT TEXT, ONAIRID TEXT);
+        CREATE TABLE FILEMAPPING (GUID TEXT PRIMARY KEY, RURI TEXT);
+        CREATE TABLE MEDIAINFO (GUID TEXT PRIMARY KEY, METAXML TEXT);
+        """)
+
+    for start in range(0, row_count, 10000):
+        essence, detail, mapping, mediainfo = [], [], [], []
+
+        for i in range(start, min(start + 10000, row_count)):
+            guid = f"{rand.getrandbits(48):012X}-8000FFFF-FFFF-{i:04X}-{rand.getrandbits(16):04X}"
+            code = f"{rand.randint(0, 999999):06d}"
+            name = rand.choice(
+                [f"{code}_TITLE_{i}_{rand.choice(tags)}"] * 3
+                + [rand.choice(tags), f"_{rand.choice(tags)}-"]
+            )
+            date = f"20{rand.randint(10, 23)}-0{rand.randint(1, 9)}-1{rand.randint(0, 9)} 12:00:00"
+            essence.append((guid, name, rand.randint(1, 10**11), code, 0))
+            detail.append(
+                (
+                    guid,
+                    name,
+                    rand.randint(0, 7200),
+                    date,
+                    date,
+                    date,
+                    "00:00:00:00",
+                    "00:00:00:00",
+                    code,
+                )
+            )
+            mapping.append((guid, f"mnt/lun02/Gorilla/RuriStorage/{guid}"))
+            mediainfo.append(
+                (
+                    guid,
+                    f"<MediaInfo><FileName>NLE.{name}.mov</FileName><DurationInMs>60000</DurationInMs>"
+                    "<VideoTrack><Video><Format>ProRes</Format><AverageFrameRate>29.97</AverageFrameRate>"
+                    "<Width>1920</Width><Height>1080</Height></Video></VideoTrack>"
+                    + "<Padding>"
+                    + "x" * rand.randint(500, 4000)
+                    + "</Padding></MediaInfo>",
+                )
+            )
+
+        cur.executemany("INSERT INTO ESSENCE VALUES (?, ?, ?, ?, ?)", essence)
+        cur.executemany(
+            "INSERT INTO ESSENCEDETAIL VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", detail
+        )
+        cur.executemany("INSERT INTO FILEMAPPING VALUES (?, ?)", mapping)
+        cur.executemany("INSERT INTO MEDIAINFO VALUES (?, ?)", mediainfo)
+        conn.commit()
+
+    conn.close()
+
+    create_msg = f"Stand-in Gorilla DB created: {db_file}, rows: {row_count}"
+    logger.info(create_msg)
+
+
+def name_filter_guids(connection):
+    """
+    Return the stand-in GUIDs selected by the pushdown name filter, and the GUIDs
+    selected by csv_parse from the unfiltered export.
+    """
+
+    import csv_parse as csv_p
+    import oracle_export as oe
+
+    sql = "SELECT essence.guid, essence.name FROM ESSENCE WHERE ESSENCE.ISGARBAGE=0"
+
+    cursor = connection.cursor()
+    cursor.execute(oe.add_predicates(sql, csv_p.sql_name_filter("essence.name")))
+    sql_guids = {row[0] for row in cursor}
+
+    cursor = connection.cursor()
+    cursor.execute(sql)
+    py_guids = {row[0] for row in cursor if csv_p.keep_name(str(row[1]).upper())}
+
+    return sql_guids, py_guids
+
+
+def compare_name_filter(config):
+    """
+    Export the stand-in GUIDs with the pushdown name filter, and filter the unfiltered
+    export with csv_parse in Python. Returns True if both select the same GUIDs.
+    """
+
+    connection = connect(config)
+
+    try:
+        sql_guids, py_guids = name_filter_guids(connection)
+    finally:
+        connection.close()
+
+    compare_msg = f"Name filter - SQL: {len(sql_guids)} GUIDs, Python: {len(py_guids)} GUIDs, identical: {sql_guids == py_guids}"
+    logger.info(compare_msg)
+    print(compare_msg)
+
+    return sql_guids == py_guids
+
+
+if __name__ == "__main__":
+    # python oracle_standin.py <rows>
+    # Generate the stand-in DB, then time the Gorilla export serial and partitioned,
+    # and check the pushdown name filter selects the same GUIDs as csv_parse.
+    import gorilla_oracle_query as g_query
+
+    logging.basicConfig(level=logging.INFO)
+
+    config = cfg.get_config()
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    create_gorilla_db(cfg.get_setting(config, "oracle-export", "standin_db"), row_count)
+
+    max_partitions = cfg.get_setting(config, "oracle-export", "partitions", 4)
+
+    for partitions in sorted({1, max_partitions}):
+        start = time.perf_counter()
+        g_query.buildcsv(f"standin_p{partitions}", partitions=partitions)
+        elapsed = time.perf_counter() - start
+        print(f"partitions: {partitions}, rows: {row_count}, elapsed: {elapsed:.2f}s")
+
+    compare_name_filter(config)
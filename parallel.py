@@ -0,0 +1,107 @@
+#! /usr/bin/env python3
+
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import config as cfg
+
+logger = logging.getLogger(__name__)
+
+
+def get_parallel_settings(config):
+    """
+    Read the optional pipeline settings of the parallel parse and clean.
+        workers:     worker processes, 1 (default) runs in the main process, 0 uses every core
+        chunk_rows:  rows sent to a worker at a time
+    """
+
+    workers = int(cfg.get_setting(config, "pipeline", "workers", 1))
+
+    settings = {
+        "workers": workers if workers > 0 else os.cpu_count(),
+        "chunk_rows": int(cfg.get_setting(config, "pipeline", "chunk_rows", 10000)),
+    }
+
+    return settings
+
+
+def pool_context():
+    """
+    The fork context, or the platform default where fork is not available.
+    """
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+
+    return multiprocessing.get_context()
+
+
+def map_chunks(func, df, settings):
+    """
+    Split a dataframe (or series) into chunks of chunk_rows rows, run func on each chunk
+    in a process pool, and concatenate the results in the original order.
+    func must be a module level function, and return the rows of its chunk.
+    The workers are forked where the platform supports it, so they start with the state
+    of the main process (the loaded config and the warmed name cache). On a platform
+    without fork (Windows) they are spawned and start with cold caches.
+    """
+
+    workers = settings["workers"]
+    chunk_rows = settings["chunk_rows"]
+
+    if workers <= 1 or len(df) <= chunk_rows:
+        return func(df)
+
+    chunks = [df.iloc[i : i + chunk_rows] for i in range(0, len(df), chunk_rows)]
+
+    chunk_msg = f"{func.__module__}.{func.__name__}: {len(df)} rows in {len(chunks)} chunks, {workers} workers"
+    logger.info(chunk_msg)
+
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=pool_context()
+    ) as executor:
+        results = list(executor.map(func, chunks))
+
+    return pd.concat(results)
+
+
+def benchmark(parsed_file, worker_counts):
+    """
+    Time csv_clean.clean_frame on a parsed file with each worker count.
+    """
+
+    import csv_clean as csv_c
+    import intermediate as im
+
+    config = cfg.get_config()
+    df = im.read_frame(parsed_file, header=0)
+    results = []
+
+    for workers in worker_counts:
+        settings = get_parallel_settings(config)
+        settings["workers"] = int(workers)
+
+        start = time.perf_counter()
+        csv_c.clean_frame(df, settings)
+        elapsed = time.perf_counter() - start
+
+        bench_msg = f"clean benchmark - workers: {workers}, rows: {len(df)}, elapsed: {elapsed:.1f}s"
+        logger.info(bench_msg)
+        print(bench_msg)
+        results.append((workers, elapsed))
+
+    return results
+
+
+if __name__ == "__main__":
+    # python parallel.py <parsed file>
+    # Time the clean of a parsed file with 1, 2, 4 ... workers, up to the core count.
+    cores = os.cpu_count()
+    worker_counts = [2**i for i in range(cores.bit_length()) if 2**i < cores] + [cores]
+    benchmark(sys.argv[1], sorted(set(worker_counts)))
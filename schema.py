@@ -0,0 +1,224 @@
+#! /usr/bin/env python3
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+ASSETS = "assets"
+
+# The columns of the assets table in the order of the cleaned dataframe, with their declared types.
+# ROWID is the INTEGER PRIMARY KEY, an alias of the SQLite rowid, so a lookup on it is a b-tree seek.
+ASSETS_COLUMNS = [
+    ("ROWID", "INTEGER PRIMARY KEY"),
+    ("GUID", "TEXT UNIQUE"),
+    ("NAME", "TEXT"),
+    ("FILESIZE", "REAL"),
+    ("DATATAPEID", "TEXT"),
+    ("OBJECTNM", "TEXT"),
+    ("CONTENTLENGTH", "REAL"),
+    ("SOURCECREATEDT", "TEXT"),
+    ("CREATEDT", "TEXT"),
+    ("LASTMDYDT", "TEXT"),
+    ("TIMECODEIN", "TEXT"),
+    ("TIMECODEOUT", "TEXT"),
+    ("ONAIRID", "TEXT"),
+    ("RURI", "TEXT"),
+    ("TITLETYPE", "TEXT"),
+    ("FRAMERATE", "TEXT"),
+    ("CODEC", "TEXT"),
+    ("V_WIDTH", "TEXT"),
+    ("V_HEIGHT", "TEXT"),
+    ("TRAFFIC_CODE", "TEXT"),
+    ("DURATION_MS", "TEXT"),
+    ("XML_CREATED", "INTEGER DEFAULT 0"),
+    ("PROXY_COPIED", "INTEGER DEFAULT 0"),
+    ("CONTENT_TYPE", "TEXT"),
+    ("FILENAME", "TEXT"),
+    ("AO_ID", "REAL"),
+    ("AO_UUID", "TEXT"),
+    ("AO_COMMENT", "TEXT"),
+    ("AO_CATEGORY", "TEXT"),
+    ("AO_DATE_ARCHIVE", "TEXT"),
+    ("AO_LAST_READ", "TEXT"),
+    ("AO_OBJECT_SIZE", "REAL"),
+    ("OC_COMPONENT_NAME", "TEXT"),
+    ("OC_COMPONENT_IS_DELETED", "TEXT"),
+    ("ON_CATEGORY", "TEXT"),
+    ("ON_MEDIA_NAME", "TEXT"),
+    ("ON_DATE_CREATION", "TEXT"),
+    ("ON_LAST_ACCESS_TIME", "TEXT"),
+    ("CH_CHECKSUM_VALUE", "TEXT"),
+    ("CH_CHECKSUM_DATE", "TEXT"),
+    ("CY_CHECKSUM_TYPE", "TEXT"),
+    ("_merge", "TEXT"),
+]
+
+# The predicates of the pending-XML and pending-proxy queues (create_xml and get_proxy), and
+# their partial indexes. A query uses an index when its WHERE is written the same as the index.
+PENDING_XML = "XML_CREATED = 0"
+PENDING_PROXY = "TITLETYPE IS 'video' AND PROXY_COPIED = 0"
+ASSETS_INDEXES = {
+    "ix_assets_pending_xml": f"(ROWID) WHERE {PENDING_XML}",
+    "ix_assets_pending_proxy": f"(ROWID) WHERE {PENDING_PROXY}",
+}
+
+SUPPORT_TABLES = {
+    "export_watermarks": """CREATE TABLE IF NOT EXISTS export_watermarks (
+                 SOURCE TEXT PRIMARY KEY,
+                 WATERMARK TEXT,
+                 FULL_EXPORT TEXT,
+                 PENDING_WATERMARK TEXT,
+                 PENDING_FULL_EXPORT TEXT
+             )""",
+    "export_fingerprints": """CREATE TABLE IF NOT EXISTS export_fingerprints (
+                 SOURCE TEXT PRIMARY KEY,
+                 FINGERPRINT TEXT,
+                 EXPORT_FILE TEXT,
+                 PENDING_FINGERPRINT TEXT,
+                 PENDING_EXPORT_FILE TEXT
+             )""",
+    "export_checkpoints": """CREATE TABLE IF NOT EXISTS export_checkpoints (
+                 SOURCE TEXT PRIMARY KEY,
+                 EXPORT_FILE TEXT,
+                 LAST_KEY TEXT,
+                 ROWS_WRITTEN INTEGER,
+                 FILE_OFFSET INTEGER,
+                 HIGH_WATER TEXT,
+                 QUERY_HASH TEXT
+             )""",
+    "clean_fingerprints": """CREATE TABLE IF NOT EXISTS clean_fingerprints (
+                 GUID TEXT PRIMARY KEY,
+                 FINGERPRINT TEXT,
+                 RULES TEXT
+             )""",
+    "name_cache": """CREATE TABLE IF NOT EXISTS name_cache (
+                 NAME TEXT PRIMARY KEY,
+                 FIELDS TEXT,
+                 RULES TEXT,
+                 LAST_USED TEXT
+             )""",
+}
+
+
+def assets_ddl(tablename=ASSETS):
+    cols = ",\n    ".join(f'"{col}" {col_type}' for col, col_type in ASSETS_COLUMNS)
+    return f'CREATE TABLE "{tablename}" (\n    {cols}\n)'
+
+
+def table_columns(conn, tablename):
+    return [col[1] for col in conn.execute(f"""PRAGMA table_info("{tablename}")""")]
+
+
+def create_indexes(conn, tablename=ASSETS):
+    for index_name, index_sql in ASSETS_INDEXES.items():
+        conn.execute(
+            f"""CREATE INDEX IF NOT EXISTS "{index_name}" ON "{tablename}" {index_sql}"""
+        )
+
+
+def create_assets(conn, tablename=ASSETS):
+    """
+    Drop the assets table and create it empty from the declared schema, with its indexes.
+    """
+
+    conn.execute(f"""DROP TABLE IF EXISTS "{tablename}\"""")
+    conn.execute(assets_ddl(tablename))
+    create_indexes(conn, tablename)
+
+
+def unique_guids(df):
+    """
+    Drop the rows of a dataframe with a GUID already on an earlier row, GUID is UNIQUE
+    in the assets table. The first row is kept, the row a GUID lookup used to return.
+    """
+
+    duplicated = df["GUID"].notnull() & df["GUID"].duplicated()
+
+    if duplicated.any():
+        guids = df.loc[duplicated, "GUID"].unique()
+        duplicate_msg = f"{duplicated.sum()} rows dropped with a duplicate GUID, the first row of each GUID is kept: {', '.join(map(str, guids[:10]))}"
+        logger.warning(duplicate_msg)
+        df = df[~duplicated]
+
+    return df
+
+
+def migrate_support_tables(conn):
+    for ddl in SUPPORT_TABLES.values():
+        conn.execute(ddl)
+
+
+def migrate_assets(conn):
+    """
+    Rebuild an assets table created by pandas into the declared schema. Values are converted
+    to the declared column types, and only the first row of a duplicated GUID or ROWID is kept.
+    """
+
+    existing = table_columns(conn, ASSETS)
+
+    if len(existing) == 0:
+        create_assets(conn)
+        return
+
+    declared = [col for col, col_type in ASSETS_COLUMNS]
+    cols = ", ".join(
+        f'"{col}"' for col in declared if col in existing or col == "ROWID"
+    )
+    row_count = conn.execute(f"""SELECT COUNT(*) FROM {ASSETS}""").fetchone()[0]
+
+    conn.execute(assets_ddl("assets_migrate"))
+    conn.execute(f"""INSERT OR IGNORE INTO assets_migrate ({cols})
+            SELECT {cols} FROM {ASSETS} ORDER BY rowid""")
+    conn.execute(f"""DROP TABLE {ASSETS}""")
+    conn.execute(f"""ALTER TABLE assets_migrate RENAME TO {ASSETS}""")
+    create_indexes(conn)
+
+    kept = conn.execute(f"""SELECT COUNT(*) FROM {ASSETS}""").fetchone()[0]
+    dropped = [col for col in existing if col not in declared and col != "index"]
+    migrate_msg = f"{ASSETS} table migrated to the declared schema, rows: {kept}, duplicate rows dropped: {row_count - kept}, columns dropped: {dropped}"
+    logger.info(migrate_msg)
+
+
+def migrate_checkpoint_hash(conn):
+    """
+    Add the QUERY_HASH of the export query to the export checkpoints. A checkpoint
+    stored without it does not match any export and is discarded.
+    """
+
+    if "QUERY_HASH" not in table_columns(conn, "export_checkpoints"):
+        conn.execute("""ALTER TABLE export_checkpoints ADD COLUMN QUERY_HASH TEXT""")
+
+
+# Applied in order to a DB with a lower PRAGMA user_version, the version is the number applied.
+MIGRATIONS = [
+    migrate_support_tables,
+    migrate_assets,
+    migrate_checkpoint_hash,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn):
+    """
+    Bring a DB up to SCHEMA_VERSION. Each migration runs in its own transaction with
+    the user_version it sets, a failed migration leaves the DB at the previous version.
+    """
+
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+
+    for version in range(1, SCHEMA_VERSION + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                conn.rollback()
+                continue
+            MIGRATIONS[version - 1](conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        migration_msg = f"DB schema migrated to version {version}: {MIGRATIONS[version - 1].__name__}"
+        logger.info(migration_msg)
@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config as cfg
+
+# The modules read config.yaml when they are imported, point it at a scratch directory first.
+TEST_PATH = tempfile.mkdtemp(prefix="gor_diva_tests_")
+
+test_config = {
+    "paths": {
+        key: TEST_PATH + "/"
+        for key in [
+            "root_path",
+            "csv_path",
+            "db_path",
+            "xml_path",
+            "xml_checkin_path",
+            "proxy_path",
+            "proxy_storage_path",
+            "proxy_tmp_path",
+            "proxy_failed_path",
+            "tmp",
+        ]
+    },
+    "oracle-export": {"standin_db": os.path.join(TEST_PATH, "standin.db")},
+    "pipeline": {"workers": 1},
+}
+test_config["paths"]["xml_storage_paths"] = [TEST_PATH + "/"]
+
+with open(os.path.join(TEST_PATH, "config.yaml"), "w") as f:
+    yaml.safe_dump(test_config, f)
+
+cfg.CONFIG_PATH = os.path.join(TEST_PATH, "config.yaml")
@@ -0,0 +1,51 @@
+import bulk_load
+import database as db
+import schema
+
+DB_NAME = "bulk_load_test.db"
+
+
+def synchronous():
+    return db.connect(DB_NAME).execute("PRAGMA synchronous").fetchone()[0]
+
+
+def test_load_table_resets_synchronous():
+    df = bulk_load.benchmark_frame(50)
+
+    assert bulk_load.load_table(df, db_name=DB_NAME, chunk_rows=20) == 50
+    assert synchronous() == 1  # NORMAL
+    assert (
+        db.connect(DB_NAME).execute("SELECT COUNT(*) FROM assets").fetchone()[0] == 50
+    )
+
+
+def test_failed_load_leaves_the_table_and_resets_synchronous(monkeypatch):
+    bulk_load.load_table(bulk_load.benchmark_frame(10), db_name=DB_NAME)
+
+    def fail(conn, tablename=schema.ASSETS):
+        raise RuntimeError("index build failed")
+
+    monkeypatch.setattr(schema, "create_indexes", fail)
+
+    assert bulk_load.load_table(bulk_load.benchmark_frame(30), db_name=DB_NAME) is None
+    assert synchronous() == 1
+    conn = db.connect(DB_NAME)
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM assets").fetchone()[0] == 10
+
+
+def test_failed_rollback_does_not_leave_synchronous_off(monkeypatch):
+    bulk_load.load_table(bulk_load.benchmark_frame(10), db_name=DB_NAME)
+    conn = db.connect(DB_NAME)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("load failed")
+
+    monkeypatch.setattr(schema, "create_indexes", fail)
+    monkeypatch.setattr(conn, "rollback", fail)
+
+    assert bulk_load.load_table(bulk_load.benchmark_frame(30), db_name=DB_NAME) is None
+    assert synchronous() == 1
+    assert (
+        db.connect(DB_NAME).execute("SELECT COUNT(*) FROM assets").fetchone()[0] == 10
+    )
@@ -0,0 +1,52 @@
+import pytest
+
+import classify as cl
+
+
+def test_token_classifier_matches_the_regexes_on_the_corpus():
+    names = cl.corpus(20000, seed=1)
+
+    # The corpus includes names with non-ASCII characters, classified by the regex fallback.
+    assert any(not name.isascii() for name in names)
+    assert cl.compare(names) == []
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("123456_VM_TITLE", (("VM", None, None, None, None), None, False, None)),
+        ("123456_EM2_TITLE", (("EM", None, None, None, None), None, False, None)),
+        ("123456_VMX_TITLE", ((None, None, None, None, None), None, False, None)),
+        (
+            "123456_TITLE_XDCAM_HD",
+            ((None, None, None, "XDCAM", None), None, False, "XDCAM"),
+        ),
+        (
+            "123456_TITLE_DV100",
+            ((None, None, None, None, "DV100"), None, False, "DV100"),
+        ),
+        ("123456_TITLE_AVP", ((None, None, None, None, None), "AVP", False, None)),
+        (
+            "123456_TITLE_GFXPACKAGE",
+            ((None, None, None, None, None), "GFXPACKAGE", False, None),
+        ),
+        (
+            "123456_TITLE_OUTGOING_QC",
+            ((None, None, None, None, None), None, True, None),
+        ),
+        (
+            "123456_TITLE_PRORES_HQ",
+            ((None, None, None, None, None), None, False, "PRORES"),
+        ),
+        ("123456_TITLE_XAVC", ((None, None, None, None, None), None, False, "XAVC")),
+        ("123456_ÉTÉ_VM", (("VM", None, None, None, None), None, False, None)),
+        ("123456_ÉTÉ_AVP", ((None, None, None, None, None), "AVP", False, None)),
+        (
+            "123456_ÉTÉ_OUTGOING_QC",
+            ((None, None, None, None, None), None, True, None),
+        ),
+    ],
+)
+def test_known_names(name, expected):
+    assert cl.token_classify(name) == expected
+    assert cl.token_classify(name) == cl.regex_classify(name)
@@ -0,0 +1,34 @@
+import pandas as pd
+
+import csv_clean as csv_c
+
+
+def clean_without_load(monkeypatch, upserted):
+    monkeypatch.setattr(csv_c.im, "read_frame", lambda *args, **kwargs: pd.DataFrame())
+    monkeypatch.setattr(csv_c.im, "write_frame", lambda *args, **kwargs: None)
+    monkeypatch.setattr(csv_c, "clean_frame", lambda df, fingerprints=None: df)
+    monkeypatch.setattr(csv_c.db, "upsert_table", lambda tablename, df: upserted)
+
+    return csv_c.csv_clean("20260101", delta=True)
+
+
+def test_csv_clean_returns_none_when_the_upsert_fails(monkeypatch):
+    assert clean_without_load(monkeypatch, None) is None
+
+
+def test_csv_clean_returns_the_table_when_the_upsert_succeeds(monkeypatch):
+    assert clean_without_load(monkeypatch, 0)[1] == "assets"
+
+
+def test_load_frame_returns_the_bulk_load_result(monkeypatch):
+    monkeypatch.setattr(csv_c.bl, "load_table", lambda df, tablename: None)
+
+    assert csv_c.load_frame(pd.DataFrame(), "assets") is None
+
+
+def test_delta_clean_logs_the_upsert(monkeypatch, caplog):
+    with caplog.at_level("INFO", logger="csv_clean"):
+        clean_without_load(monkeypatch, 0)
+
+    assert "ROWS UPSERTED INTO assets" in caplog.text
+    assert "NEW DB TABLE CREATED" not in caplog.text
@@ -0,0 +1,43 @@
+import os
+
+import pandas as pd
+
+import csv_parse as csv_p
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "merged_names.csv")
+
+
+def iterrows_selection(df):
+    """
+    The row selection of parse_frame before it was vectorized: an iterrows loop
+    calling keep_name() on the upper case name of each row.
+    """
+
+    parsed_index = []
+
+    for index, row in df.iterrows():
+        name = str(row["NAME"]).upper()
+        if csv_p.keep_name(name):
+            parsed_index.append(index)
+
+    return df.loc[parsed_index]
+
+
+def test_parse_frame_matches_iterrows_selection():
+    df = pd.read_csv(FIXTURE)
+    expected = iterrows_selection(df)
+
+    parsed = csv_p.parse_frame(df, settings={"workers": 1, "chunk_rows": 10000})
+
+    assert list(parsed["GUID"]) == list(expected["GUID"])
+    # The fixture has names kept, names with an excluded token, and OUTGOING names.
+    assert 0 < len(parsed) < len(df)
+
+
+def test_parse_frame_matches_iterrows_selection_in_chunks():
+    df = pd.read_csv(FIXTURE)
+    expected = iterrows_selection(df)
+
+    parsed = csv_p.parse_frame(df, settings={"workers": 2, "chunk_rows": 7})
+
+    assert list(parsed["GUID"]) == list(expected["GUID"])
@@ -0,0 +1,73 @@
+import pytest
+
+import bulk_load
+import database as db
+
+
+def test_bulk_update_keeps_a_failed_batch(monkeypatch):
+    # update_columns logs the error and returns None when the batch fails.
+    monkeypatch.setattr(db, "update_columns", lambda *args, **kwargs: None)
+    updates = db.BulkUpdate("assets", chunk_rows=2)
+    updates.add(1, "XML_CREATED", 1)
+
+    with pytest.raises(db.sqlite3.DatabaseError):
+        updates.add(2, "XML_CREATED", 1)
+
+    assert updates.updates == [(1, "XML_CREATED", 1), (2, "XML_CREATED", 1)]
+    assert updates.count == 0
+
+
+def test_bulk_update_applies_the_batch(monkeypatch):
+    applied = []
+
+    def update_columns(tablename, updates, key, chunk_rows):
+        applied.extend(updates)
+        return len(updates)
+
+    monkeypatch.setattr(db, "update_columns", update_columns)
+
+    with db.BulkUpdate("assets", chunk_rows=2) as updates:
+        for rowid in range(3):
+            updates.add(rowid, "XML_CREATED", 1)
+
+    assert applied == [(rowid, "XML_CREATED", 1) for rowid in range(3)]
+    assert updates.updates == []
+    assert updates.count == 3
+
+
+def assets_rows():
+    conn = db.connect()
+    return conn.execute(
+        "SELECT ROWID, GUID, NAME, XML_CREATED FROM assets ORDER BY ROWID"
+    ).fetchall()
+
+
+@pytest.fixture
+def assets():
+    bulk_load.load_table(bulk_load.benchmark_frame(5))
+    db.update_columns("assets", [(0, "XML_CREATED", 1), (1, "XML_CREATED", 1)])
+    return assets_rows()
+
+
+def test_upsert_table_replaces_and_appends_rows(assets):
+    batch = bulk_load.benchmark_frame(2)
+    batch["GUID"] = ["GUID_1", "GUID_NEW"]
+    batch["NAME"] = ["NAME_1_CHANGED", "NAME_NEW"]
+
+    assert db.upsert_table("assets", batch) == 2
+
+    rows = assets_rows()
+    assert rows[:5] == [
+        row if row[0] != 1 else (1, "GUID_1", "NAME_1_CHANGED", 1) for row in assets
+    ]
+    assert rows[5][:3] == (5, "GUID_NEW", "NAME_NEW")
+
+
+def test_failed_upsert_leaves_the_table_unchanged(assets):
+    batch = bulk_load.benchmark_frame(2)
+    batch["GUID"] = ["GUID_1", "GUID_2"]
+    # Not a type SQLite can store, the insert fails after the delete.
+    batch["NAME"] = ["NAME_1_CHANGED", object()]
+
+    assert db.upsert_table("assets", batch) is None
+    assert assets_rows() == assets
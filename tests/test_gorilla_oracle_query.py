@@ -0,0 +1,153 @@
+import glob
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+import pytest
+
+import config as cfg
+import gorilla_oracle_query as g_query
+import oracle_export as oe
+import oracle_standin as ora_standin
+
+
+def test_check_metaxml_multibyte_over_limit():
+    # 300 characters, 900 bytes in UTF-8: under the limit in characters, over it in bytes.
+    metaxml = "<a>" + "é" * 147 + "€" * 146 + "</a>"
+    max_bytes = 500
+    assert len(metaxml) < max_bytes < len(metaxml.encode("utf-8"))
+
+    rows = [("GUID-1", "NAME", metaxml)]
+    checked = g_query.check_metaxml(rows, max_bytes, index=2)
+
+    assert checked == [("GUID-1", "NAME", None)]
+
+
+def test_check_metaxml_keeps_documents_within_limit():
+    rows = [
+        ("GUID-1", "<a>" + "é" * 100 + "</a>"),
+        ("GUID-2", "<a>ascii</a>"),
+        ("GUID-3", None),
+    ]
+
+    assert g_query.check_metaxml(rows, 500, index=1) == rows
+
+
+class CountingConnection(ora_standin.Connection):
+    closed = False
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+class CountingPool(ora_standin.SessionPool):
+    def __init__(self, db_file):
+        super().__init__(db_file)
+        self.acquired = 0
+        self.released = 0
+        self.closed = False
+
+    def acquire(self):
+        self.acquired += 1
+        return super().acquire()
+
+    def release(self, connection):
+        self.released += 1
+        super().release(connection)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def partitioned_export(monkeypatch):
+    config = cfg.get_config()
+    db_file = cfg.get_setting(config, "oracle-export", "standin_db")
+    ora_standin.create_gorilla_db(db_file, 200)
+
+    pool = CountingPool(db_file)
+    monkeypatch.setattr(g_query, "get_session_pool", lambda config, size: pool)
+
+    def export(gor_csv):
+        return g_query.export_partitions(
+            config, oe.get_export_settings(config), gor_csv, [], {}, 4, 10485760
+        )
+
+    return config, pool, export
+
+
+def test_export_partitions_concatenates_the_shards(partitioned_export):
+    config, pool, export = partitioned_export
+
+    row_count, _ = export("partitions_ok.csv")
+
+    export_path = os.path.join(config["paths"]["csv_path"], "partitions_ok.csv")
+    assert len(pd.read_csv(export_path)) == row_count > 0
+    assert pool.acquired == pool.released == 4
+    assert pool.closed
+    assert glob.glob(os.path.join(config["paths"]["csv_path"], "*_part*")) == []
+
+
+def test_failed_partition_releases_sessions_and_removes_shards(
+    partitioned_export, monkeypatch
+):
+    config, pool, export = partitioned_export
+    check_metaxml = g_query.check_metaxml
+
+    def fail_one_worker(rows, max_bytes):
+        if threading.current_thread().name.endswith("_2"):
+            raise RuntimeError("partition failed")
+        return check_metaxml(rows, max_bytes)
+
+    monkeypatch.setattr(g_query, "check_metaxml", fail_one_worker)
+
+    with pytest.raises(RuntimeError):
+        export("partitions_failed.csv")
+
+    csv_path = config["paths"]["csv_path"]
+    assert pool.acquired == pool.released == 4
+    assert pool.closed
+    assert glob.glob(os.path.join(csv_path, "partitions_failed*")) == []
+
+
+class FailingWriter:
+    def write(self, rows):
+        raise OSError("disk full")
+
+
+def test_failed_serial_export_closes_the_connection(monkeypatch):
+    config = cfg.get_config()
+    db_file = cfg.get_setting(config, "oracle-export", "standin_db")
+    ora_standin.create_gorilla_db(db_file, 20)
+    connection = CountingConnection(db_file)
+    monkeypatch.setattr(g_query, "get_connection", lambda config: connection)
+
+    with pytest.raises(OSError):
+        g_query.export_serial(
+            config, oe.get_export_settings(config), FailingWriter(), [], {}, None, 100
+        )
+
+    assert connection.closed
+
+
+def test_failed_metaxml_fetch_closes_the_connection(monkeypatch):
+    config = cfg.get_config()
+    db_file = cfg.get_setting(config, "oracle-export", "standin_db")
+    ora_standin.create_gorilla_db(db_file, 20)
+    guids = set(
+        pd.read_sql("SELECT GUID FROM ESSENCE", sqlite3.connect(db_file))["GUID"]
+    )
+    connection = CountingConnection(db_file)
+    monkeypatch.setattr(g_query, "get_connection", lambda config: connection)
+
+    def fail(rows, max_bytes, index):
+        raise ValueError("bad document")
+
+    monkeypatch.setattr(g_query, "check_metaxml", fail)
+
+    with pytest.raises(ValueError):
+        g_query.fetch_metaxml(guids)
+
+    assert connection.closed
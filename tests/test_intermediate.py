@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+import intermediate as im
+
+FIELDNAMES = ["GUID", "NAME"]
+
+
+@pytest.mark.parametrize("ext", [".parquet", ".arrow"])
+def test_failed_write_keeps_the_previous_file(tmp_path, ext):
+    path = str(tmp_path / f"export{ext}")
+
+    with im.BatchWriter(path, FIELDNAMES) as writer:
+        writer.write([("G1", "NAME_1"), ("G2", "NAME_2")])
+
+    with pytest.raises(RuntimeError):
+        with im.BatchWriter(path, FIELDNAMES, append=True) as writer:
+            writer.write([("G3", "NAME_3")])
+            raise RuntimeError("export failed")
+
+    assert im.read_frame(path)["GUID"].tolist() == ["G1", "G2"]
+    assert os.listdir(tmp_path) == [f"export{ext}"]
+
+
+@pytest.mark.parametrize("ext", [".parquet", ".arrow"])
+def test_append_adds_the_rows(tmp_path, ext):
+    path = str(tmp_path / f"export{ext}")
+
+    with im.BatchWriter(path, FIELDNAMES) as writer:
+        writer.write([("G1", "NAME_1")])
+    with im.BatchWriter(path, FIELDNAMES, append=True) as writer:
+        writer.write([("G2", "NAME_2")])
+
+    assert im.read_frame(path)["GUID"].tolist() == ["G1", "G2"]
@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+import main
+
+
+@pytest.fixture
+def build(monkeypatch):
+    commits = []
+    monkeypatch.setattr(main.oe, "get_export_mode", lambda config: "delta")
+    monkeypatch.setattr(main, "export_sources", lambda *args: ("gor.csv", "diva.csv"))
+    monkeypatch.setattr(main, "complete_delta", lambda gor_csv, diva_csv: True)
+    monkeypatch.setattr(main.mdb, "pandas_merge", lambda *args: "merged.csv")
+    monkeypatch.setattr(main.csv_p, "db_parse", lambda *args: "parsed.csv")
+    monkeypatch.setattr(main.udb, "update_db", lambda *args, **kwargs: None)
+    monkeypatch.setattr(
+        main.db, "commit_watermarks", lambda: commits.append("watermarks")
+    )
+    monkeypatch.setattr(
+        main.db, "commit_fingerprints", lambda: commits.append("fingerprints")
+    )
+    return commits
+
+
+def test_failed_load_commits_no_watermarks(build, monkeypatch):
+    monkeypatch.setattr(main.csv_c, "csv_clean", lambda date, delta: None)
+
+    main.build_db("20260101")
+
+    assert build == []
+
+
+def test_loaded_build_commits_the_watermarks(build, monkeypatch):
+    monkeypatch.setattr(
+        main.csv_c, "csv_clean", lambda date, delta: ("cleaned.csv", "assets")
+    )
+
+    main.build_db("20260101")
+
+    assert build == ["watermarks", "fingerprints"]
+
+
+def fused_build(monkeypatch, loaded):
+    monkeypatch.setattr(main.oe, "get_export_mode", lambda config: "full")
+    monkeypatch.setattr(
+        main.cfg,
+        "get_setting",
+        lambda config, section, key, default=None: (
+            True if (section, key) == ("pipeline", "fused") else default
+        ),
+    )
+    monkeypatch.setattr(
+        main.mdb, "merge_frames", lambda gor_df, diva_df: (pd.DataFrame(), {})
+    )
+    monkeypatch.setattr(main.mdb, "log_merge", lambda counts: None)
+    monkeypatch.setattr(main.csv_p, "parse_frame", lambda df: df)
+    monkeypatch.setattr(main.csv_c, "clean_frame", lambda df, fingerprints: df)
+    monkeypatch.setattr(main.im, "debug_tap", lambda *args, **kwargs: None)
+    monkeypatch.setattr(main.csv_c.bl, "load_table", lambda df, tablename: loaded)
+
+    main.build_db("20260101")
+
+
+def test_failed_fused_load_commits_no_watermarks(build, monkeypatch):
+    fused_build(monkeypatch, None)
+
+    assert build == []
+
+
+def test_loaded_fused_build_commits_the_watermarks(build, monkeypatch):
+    fused_build(monkeypatch, 0)
+
+    assert build == ["watermarks", "fingerprints"]
+
+
+def test_failed_load_keeps_the_last_fingerprint(monkeypatch):
+    exports = []
+    monkeypatch.setattr(main.oe, "get_export_mode", lambda config: "full")
+    monkeypatch.setattr(
+        main.cfg,
+        "get_setting",
+        lambda config, section, key, default=None: (
+            True if (section, key) == ("oracle-export", "skip_unchanged") else default
+        ),
+    )
+    monkeypatch.setattr(main.g_query, "fingerprint", lambda config: "gorilla-probe")
+    monkeypatch.setattr(main.d_query, "fingerprint", lambda config: "diva-probe")
+    monkeypatch.setattr(
+        main,
+        "export_sources",
+        lambda *args: exports.append(args) or ("gor.csv", "diva.csv"),
+    )
+    monkeypatch.setattr(main.mdb, "pandas_merge", lambda *args: "merged.csv")
+    monkeypatch.setattr(main.csv_p, "db_parse", lambda *args: "parsed.csv")
+    monkeypatch.setattr(main.csv_c, "csv_clean", lambda date, delta: None)
+    main.db.connect().execute("DELETE FROM export_fingerprints")
+    main.db.connect().commit()
+
+    main.build_db("20260101")
+    main.build_db("20260102")
+
+    # The probes are unchanged, but the first load failed: the second run rebuilds.
+    assert len(exports) == 2
+    assert main.db.get_fingerprint("GORILLA") is None
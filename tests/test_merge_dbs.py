@@ -0,0 +1,73 @@
+import random
+
+import pandas as pd
+
+import diva_oracle_query as d_query
+import gorilla_oracle_query as g_query
+import intermediate as im
+import merge_dbs as mdb
+
+
+def export_rows(fieldnames, guids, source):
+    return [
+        tuple(guid if col == "GUID" else f"{source}_{col}_{i}" for col in fieldnames)
+        for i, guid in enumerate(guids)
+    ]
+
+
+def write_exports(tmp_path):
+    rand = random.Random(1)
+    shared = [f"G{i:05d}" for i in range(2000)]
+    # Duplicate keys on both sides, left-only and right-only keys, and null GUIDs.
+    gor_guids = shared + shared[:50] + [f"L{i:05d}" for i in range(600)] + [None] * 3
+    div_guids = shared + shared[25:75] + [f"R{i:05d}" for i in range(400)] + [None] * 2
+    rand.shuffle(gor_guids)
+    rand.shuffle(div_guids)
+
+    gor_path = str(tmp_path / "gorilla_db_export.csv")
+    div_path = str(tmp_path / "diva_db_export.csv")
+
+    with im.BatchWriter(gor_path, g_query.fieldnames) as writer:
+        writer.write(export_rows(g_query.fieldnames, gor_guids, "GOR"))
+    with im.BatchWriter(div_path, d_query.fieldnames) as writer:
+        writer.write(export_rows(d_query.fieldnames, div_guids, "DIVA"))
+
+    return gor_path, div_path
+
+
+def sort_rows(df):
+    return df.sort_values(list(df.columns), na_position="last").reset_index(drop=True)
+
+
+def test_sorted_engine_matches_the_pandas_merge(tmp_path, monkeypatch):
+    gor_path, div_path = write_exports(tmp_path)
+    runs = []
+    write_run = mdb.write_run
+    monkeypatch.setattr(
+        mdb,
+        "write_run",
+        lambda rows, tmp_dir: runs.append(1) or write_run(rows, tmp_dir),
+    )
+
+    pandas_df, pandas_counts = mdb.merge_frames(
+        im.read_frame(gor_path), im.read_frame(div_path)
+    )
+    pandas_path = str(tmp_path / "merged_pandas.csv")
+    im.write_frame(pandas_df, pandas_path, encoding="utf-8-sig")
+
+    sorted_path = str(tmp_path / "merged_sorted.csv")
+    # memory_mb 0 sorts in chunks of the minimum 1000 rows, both exports spill to runs.
+    sorted_counts = mdb.sorted_merge(gor_path, div_path, sorted_path, 0)
+
+    assert len(runs) > 2
+    assert sorted_counts == pandas_counts
+    assert pandas_counts["both"] > 0
+    assert pandas_counts["left_only"] > 0
+    assert pandas_counts["right_only"] > 0
+
+    expected = pd.read_csv(pandas_path, encoding="utf-8-sig", dtype=str)
+    merged = pd.read_csv(sorted_path, encoding="utf-8-sig", dtype=str)
+
+    # The sorted engine writes the rows in GUID order, compare the rows in one order.
+    assert list(merged.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(sort_rows(merged), sort_rows(expected))
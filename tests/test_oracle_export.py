@@ -0,0 +1,134 @@
+import csv
+import os
+import sqlite3
+
+import pytest
+
+import config as cfg
+import database as db
+import oracle_export as oe
+import oracle_standin
+
+SQL = "SELECT K, V FROM t"
+FIELDNAMES = ["K", "V"]
+
+
+class StopExport(Exception):
+    pass
+
+
+@pytest.fixture
+def standin(tmp_path):
+    db_file = str(tmp_path / "export.db")
+    conn = sqlite3.connect(db_file)
+    conn.execute("CREATE TABLE t (K TEXT, V TEXT)")
+    conn.executemany(
+        "INSERT INTO t VALUES (?, ?)", [(f"K{i:02d}", f"V{i}") for i in range(10)]
+    )
+    conn.commit()
+    conn.close()
+
+    connections = []
+
+    def get_connection(config):
+        connection = oracle_standin.Connection(db_file)
+        connection.closed = False
+        close = connection.close
+
+        def close_connection():
+            connection.closed = True
+            close()
+
+        connection.close = close_connection
+        connections.append(connection)
+        return connection
+
+    db.clear_checkpoint("TEST")
+    yield get_connection, connections
+    db.clear_checkpoint("TEST")
+
+
+def export(get_connection, export_file, sql=SQL, watermark=None, check_rows=None):
+    config = cfg.get_config()
+    settings = dict(oe.get_export_settings(config), page_size=3)
+
+    return oe.export_resumable(
+        get_connection,
+        config,
+        settings,
+        "TEST",
+        sql,
+        {},
+        "K",
+        export_file,
+        FIELDNAMES,
+        [],
+        watermark,
+        check_rows=check_rows,
+    )
+
+
+def stop_after(pages):
+    calls = []
+
+    def check_rows(rows):
+        calls.append(rows)
+        if len(calls) > pages:
+            raise StopExport()
+        return rows
+
+    return check_rows
+
+
+def read_keys(export_file):
+    path = os.path.join(cfg.get_config()["paths"]["csv_path"], export_file)
+    with open(path, newline="") as f:
+        return [row["K"] for row in csv.DictReader(f)]
+
+
+def test_stopped_export_closes_the_connection_and_resumes(standin):
+    get_connection, connections = standin
+
+    with pytest.raises(StopExport):
+        export(get_connection, "resume_1.csv", check_rows=stop_after(2))
+
+    assert connections[-1].closed
+    assert db.get_checkpoint("TEST")["LAST_KEY"] == "K05"
+
+    export_file, row_count, _ = export(get_connection, "resume_2.csv")
+
+    assert export_file == "resume_1.csv"
+    assert row_count == 10
+    assert read_keys(export_file) == [f"K{i:02d}" for i in range(10)]
+    assert connections[-1].closed
+    assert db.get_checkpoint("TEST") is None
+
+
+@pytest.mark.parametrize(
+    "sql, watermark",
+    [(SQL + " WHERE V IS NOT NULL", None), (SQL, "2020-01-01")],
+)
+def test_checkpoint_of_another_query_or_mode_is_discarded(standin, sql, watermark):
+    get_connection, connections = standin
+
+    with pytest.raises(StopExport):
+        export(get_connection, "discard_1.csv", check_rows=stop_after(2))
+
+    export_file, row_count, _ = export(
+        get_connection, "discard_2.csv", sql=sql, watermark=watermark
+    )
+
+    assert export_file == "discard_2.csv"
+    assert row_count == 10
+    assert read_keys(export_file) == [f"K{i:02d}" for i in range(10)]
+
+
+def test_failed_probe_closes_the_connection(standin):
+    get_connection, connections = standin
+
+    fingerprint = oe.probe(
+        get_connection, cfg.get_config(), "TEST", SQL, "K", ["NO_SUCH_COLUMN"]
+    )
+
+    assert fingerprint is None
+    assert connections[-1].closed
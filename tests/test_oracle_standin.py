@@ -0,0 +1,69 @@
+import os
+import re
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import csv_parse as csv_p
+import oracle_standin as ora_standin
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "merged_names.csv")
+
+
+def standin_essence(db_file, names):
+    conn = sqlite3.connect(db_file)
+    conn.execute(
+        "CREATE TABLE ESSENCE (GUID TEXT PRIMARY KEY, NAME TEXT, ISGARBAGE INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO ESSENCE VALUES (?, ?, 0)",
+        [(f"G{i:03d}", name) for i, name in enumerate(names)],
+    )
+    conn.commit()
+    conn.close()
+    return ora_standin.Connection(db_file)
+
+
+def fixture_names():
+    names = pd.read_csv(FIXTURE)["NAME"]
+    return [None if pd.isnull(name) else name for name in names]
+
+
+def test_sql_name_filter_uses_the_ere_subset():
+    for predicate in csv_p.sql_name_filter("essence.name"):
+        pattern = re.search(r"'(.*)'", predicate).group(1)
+        ora_standin.ere_pattern(pattern)
+
+
+def test_ere_pattern_rejects_python_only_syntax():
+    with pytest.raises(ValueError):
+        ora_standin.ere_pattern(r"(?<=-|_)OUTGOING")
+    with pytest.raises(ValueError):
+        ora_standin.ere_pattern(r"\dEM")
+
+
+def test_ere_end_anchor_does_not_match_before_a_newline():
+    assert ora_standin.regexp_like("EM\n", "^EM$") == 0
+    assert ora_standin.regexp_like("EM", "^EM$") == 1
+
+
+def test_pushdown_name_filter_matches_keep_name(tmp_path):
+    connection = standin_essence(str(tmp_path / "standin.db"), fixture_names())
+
+    sql_guids, py_guids = ora_standin.name_filter_guids(connection)
+    connection.close()
+
+    assert len(py_guids) > 0
+    assert sql_guids == py_guids
+
+
+def test_pushdown_name_filter_trailing_newline_difference(tmp_path):
+    # The documented difference: keep_name() keeps a name ending in a newline, the pushdown does not.
+    connection = standin_essence(str(tmp_path / "standin.db"), ["EM\n", "EM"])
+
+    sql_guids, py_guids = ora_standin.name_filter_guids(connection)
+    connection.close()
+
+    assert py_guids == {"G000", "G001"}
+    assert sql_guids == {"G001"}
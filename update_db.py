@@ -9,17 +9,19 @@ import pandas as pd
 import config as cfg
 import crosscheck_assets as cca
 import database as db
+import intermediate as im
 import get_mediainfo as gmi
 
 logger = logging.getLogger(__name__)
 
 
-def update_db(date, tablename, clean_csv=None):
+def update_db(date, tablename, clean_csv=None, df=None):
     """
     Start by creating a backup of the exisiting DB.
     Then update the DB by comparing rows in new CSV export to rows in the existing DB.
     Add new rows from the CSV into the DB, and remove rows from the DB if they do not exist in
     the new CSV.
+    The fused pipeline passes the cleaned dataframe as df instead of a CSV.
     """
 
     config = cfg.get_config()
@@ -27,7 +29,7 @@ def update_db(date, tablename, clean_csv=None):
     csv_path = config["paths"]["csv_path"]
 
     if clean_csv is None:
-        clean_csv = date + "_" + "gor_diva_merged_cleaned.csv"
+        clean_csv = im.stage_file(date, "gor_diva_merged_cleaned", config)
     else:
         pass
 
@@ -36,6 +38,7 @@ def update_db(date, tablename, clean_csv=None):
 
     else:
         try:
+            db.checkpoint()
             shutil.copy2(
                 os.path.join(root_path, "database.db"),
                 os.path.join(root_path, "database_BKP_" + date + ".db"),
@@ -48,92 +51,87 @@ def update_db(date, tablename, clean_csv=None):
             cca.crosscheck_assets(tablename)
             os.chdir(csv_path)
 
-            with open(clean_csv, mode="r", encoding="utf-8-sig") as c_csv:
-
-                pd_reader = pd.read_csv(c_csv, header=0)
+            if df is None:
+                pd_reader = im.read_frame(clean_csv, header=0, encoding="utf-8-sig")
                 df = pd.DataFrame(pd_reader)
-
-                update_count = 0
-                update_index = []
-                drop_count = 0
-                drop_index = []
-                insert_count = 0
-                insert_index = []
-                mismatch_count = 0
-                mismatch_index = []
-                total_count = 0
-                none_count = 0
-
-                for index, row in df.iterrows():
-
-                    os.chdir(root_path)
-
-                    guid = str(row["GUID"])
-                    titletype = str(row["TITLETYPE"])
-                    datatapeid = str(row["DATATAPEID"])
-
-                    update_db_msg_01 = (
-                        f"Updating DB for (Index, GUID): ({index}, {guid})"
+            else:
+                df = df.reset_index()
+
+            update_count = 0
+            update_index = []
+            drop_count = 0
+            drop_index = []
+            insert_count = 0
+            insert_index = []
+            mismatch_count = 0
+            mismatch_index = []
+            total_count = 0
+            none_count = 0
+
+            for index, row in df.iterrows():
+
+                os.chdir(root_path)
+
+                guid = str(row["GUID"])
+                titletype = str(row["TITLETYPE"])
+                datatapeid = str(row["DATATAPEID"])
+
+                update_db_msg_01 = f"Updating DB for (Index, GUID): ({index}, {guid})"
+                logger.info(update_db_msg_01)
+                print(str(index) + "    " + guid)
+
+                db_row_id = db.fetchone_guid(
+                    guid
+                )  # fetch db row based on GUID, row ID may not match db Row ID.
+
+                if db_row_id is not None:
+                    db_row = db.select_row(db_row_id[0])
+
+                else:
+                    db_row_msg = (
+                        f"None value(s) found in db row, skipping this row. \n {db_row}"
                     )
-                    logger.info(update_db_msg_01)
-                    print(str(index) + "    " + guid)
-
-                    db_row_id = db.fetchone_guid(
-                        guid
-                    )  # fetch db row based on GUID, row ID may not match db Row ID.
-
-                    if db_row_id is not None:
-                        db_row = db.select_row(db_row_id[0])
-
-                    else:
-                        db_row_msg = f"None value(s) found in db row, skipping this row. \n {db_row}"
-                        none_count += 1
-                        continue
-
-                    db_datatapeid = db_row[4]
-                    db_aoid = db_row[24]
-                    db_titletype = db_row[14]
-
-                    if (
-                        guid == db_row[1]
-                        and db_datatapeid == "NULL"
-                        and db_aoid == "NULL"
-                    ):
-                        db.update_row("assets", index, row)
-                        update_count += 1
-                        update_index.append(index)
-
-                    if guid != db_row[1] and db.fetchone_guid(guid) is None:
-                        db.drop_row("assets", index, guid)
-                        drop_count += 1
-                        drop_index.append(index)
-
-                    if db_row is None and row["_merge"] == "both":
-                        db.insert_row(index, row)
-                        insert_count += 1
-                        insert_index.append(index)
-
-                    if titletype != db_titletype:
-                        db.update_column("assets", "TITLETYPE", titletype, index)
-                        update_count += 1
-                        update_index.append(index)
-
-                    if guid != db_row[1] and db.fetchone_guid(guid) != None:
-                        mismatch_msg = (
-                            f"Mismatch in the db update: {db_row[1]} != {guid}"
-                        )
-                        logger.error(mismatch_msg)
-                        mismatch_count += 1
-                        mismatch_index.append(index)
-                        pass
-
-                    else:
-                        nochange_msg = f"No change to {guid} at row index {index}."
-                        logger.debug(nochange_msg)
-                        # print(nochange_msg)
-                        pass
-
-                    total_count += 1
+                    none_count += 1
+                    continue
+
+                db_datatapeid = db_row[4]
+                db_aoid = db_row[24]
+                db_titletype = db_row[14]
+
+                if guid == db_row[1] and db_datatapeid == "NULL" and db_aoid == "NULL":
+                    db.update_row("assets", index, row)
+                    update_count += 1
+                    update_index.append(index)
+
+                if guid != db_row[1] and db.fetchone_guid(guid) is None:
+                    db.drop_row("assets", index, guid)
+                    drop_count += 1
+                    drop_index.append(index)
+
+                if db_row is None and row["_merge"] == "both":
+                    db.insert_row(index, row)
+                    insert_count += 1
+                    insert_index.append(index)
+
+                if titletype != db_titletype:
+                    db.update_column("assets", "TITLETYPE", titletype, index)
+                    update_count += 1
+                    update_index.append(index)
+
+                if guid != db_row[1] and db.fetchone_guid(guid) != None:
+                    mismatch_msg = f"Mismatch in the db update: {db_row[1]} != {guid}"
+                    logger.error(mismatch_msg)
+                    mismatch_count += 1
+                    mismatch_index.append(index)
+                    pass
+
+                else:
+                    nochange_msg = f"No change to {guid} at row index {index}."
+                    logger.debug(nochange_msg)
+                    # print(nochange_msg)
+                    pass
+
+                total_count += 1
 
             update_summary_msg = f"\n\
                                     Update Count:  {update_count}\n\